@@ -9,7 +9,12 @@ import fastapi_app.tools.io as io
 import fastapi_app.models as models
 from fastapi.param_functions import Query
 from fastapi import FastAPI, Request, Depends, BackgroundTasks, File, UploadFile
-from fastapi.responses import RedirectResponse, FileResponse
+from fastapi.responses import (
+    RedirectResponse,
+    FileResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
@@ -17,11 +22,23 @@ from fastapi_app.database import SessionLocal, engine
 from sqlalchemy.orm import Session, raiseload
 import sqlite3
 from fastapi_app.tools.grids import Grid
+from fastapi_app.tools.node_store import NodeStore, format_columns, LINKS_FORMAT
 from fastapi_app.tools.optimizer import Optimizer, GridOptimizer, EnergySystemOptimizer
+from fastapi_app.tools.profiling import (
+    span,
+    timed,
+    collect_timings,
+    prometheus_metrics,
+)
+from fastapi_app.tools import workers
+from fastapi_app.tools import exports
+from fastapi_app.tools import uploads
 import math
 import urllib.request
 import ssl
 import json
+import copy
+import asyncio
 import pandas as pd
 import numpy as np
 import time
@@ -36,7 +53,7 @@ import uvicorn
 from collections import defaultdict
 
 # for sending an array of data from JS to the fastAPI
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 
 # import the builtin time module
 import time
@@ -84,6 +101,35 @@ full_path_co2_emissions = os.path.join(directory_database, "co2_emissions.csv").
 )
 os.makedirs(directory_database, exist_ok=True)
 
+# index over the nodes of the database for applying changes row by row
+node_store = NodeStore(path_nodes=full_path_nodes, path_links=full_path_links)
+
+# the last optimized grid and the parameters used for designing it, which
+# allow updating the grid instead of designing it again
+previous_grid_design = {"grid": None, "parameters": None}
+
+# pre-warmed worker processes running the grid and energy system optimizations
+worker_pool = workers.WorkerPool()
+
+# exports of the projects, which are downloaded by the users
+directory_import_export = os.path.join(directory_parent, "import_export").replace(
+    "\\", "/"
+)
+
+# status of the exports written in the background, keyed by their hash
+export_jobs = {}
+
+# imports of uploaded files running in the background, keyed by their id
+import_jobs = {}
+
+# *.csv files of the tables, which can be exported separately
+export_tables = {
+    "nodes": full_path_nodes,
+    "links": full_path_links,
+    "energy_flows": full_path_energy_flows,
+    "kpis": full_path_stored_results,
+}
+
 directory_inputs = os.path.join(directory_parent, "data", "inputs").replace("\\", "/")
 full_path_timeseries = os.path.join(directory_inputs, "timeseries.csv").replace(
     "\\", "/"
@@ -100,6 +146,28 @@ json_array = List[Any]
 import_structure = Union[json_array, json_object]
 
 
+# ------------------------------ WORKER POOL ------------------------------#
+
+
+@app.on_event("startup")
+def start_worker_pool():
+    # the workers warm up in the background, the app answers in the meantime
+    worker_pool.start()
+
+
+@app.on_event("shutdown")
+def shutdown_worker_pool():
+    worker_pool.shutdown()
+
+
+@app.get("/workers/health")
+async def workers_health():
+    """
+    Number of jobs, recycles and the status of each optimization worker.
+    """
+    return worker_pool.health()
+
+
 # --------------------- REDIRECT REQUEST TO FAVICON LOG ----------------------#
 
 
@@ -116,10 +184,15 @@ async def redirect():
 
 
 @app.post("/export_data/")
-async def export_data(generate_export_file_request: models.GenerateExportFileRequest):
+async def export_data(
+    generate_export_file_request: models.GenerateExportFileRequest,
+    background_tasks: BackgroundTasks,
+):
     """
     Generates an Excel file from the database tables (*.csv files) and the
-    webapp settings. The file is stored in fastapi_app/import_export/temp.xlsx
+    webapp settings in the background. The file is stored in the folder of
+    the project in fastapi_app/import_export under the hash of its content
+    and is downloaded with `download_export_file`.
 
     Parameters
     ----------
@@ -127,38 +200,59 @@ async def export_data(generate_export_file_request: models.GenerateExportFileReq
         Basemodel request object containing the data send to the request as attributes.
     """
 
-    # read nodes and links from *.csv files
-    # then convert their type from dictionary to data frame
-    nodes = await database_read(nodes_or_links="nodes")
-    links = await database_read(nodes_or_links="links")
-    nodes_df = pd.DataFrame(nodes)
-    links_df = pd.DataFrame(links)
-
     # get all settings defined in the web app
-    settings = [element for element in generate_export_file_request]
-    settings_df = pd.DataFrame(
-        {"Setting": [x[0] for x in settings], "value": [x[1] for x in settings]}
-    ).set_index("Setting")
-
-    # create the *.xlsx file with sheets for nodes, links and settings
-    with pd.ExcelWriter(
-        full_path_import_export
-    ) as writer:  # pylint: disable=abstract-class-instantiated
-        nodes_df.to_excel(
-            excel_writer=writer,
-            sheet_name="nodes",
-            header=nodes_df.columns,
-            index=False,
-        )
-        links_df.to_excel(
-            excel_writer=writer,
-            sheet_name="links",
-            header=links_df.columns,
-            index=False,
+    settings = dict(generate_export_file_request)
+
+    # an unchanged project is not exported again. The files are hashed in a
+    # thread, so that large projects do not block the other requests.
+    export_hash = await asyncio.get_running_loop().run_in_executor(
+        None, exports.content_hash, [full_path_nodes, full_path_links], settings
+    )
+    path = exports.export_path(
+        directory_import_export, project_name(), export_hash, "xlsx"
+    )
+    if os.path.exists(path):
+        export_jobs[export_hash] = "ready"
+    elif export_jobs.get(export_hash) != "pending":
+        export_jobs[export_hash] = "pending"
+        background_tasks.add_task(
+            write_export_file, path=path, export_hash=export_hash, settings=settings
         )
-        settings_df.to_excel(excel_writer=writer, sheet_name="settings")
 
-    # TO DO: formatting of the excel file
+    return {"code": "success", "hash": export_hash, "status": export_jobs[export_hash]}
+
+
+def project_name():
+    """
+    Returns the name of the project defined in the web app.
+    """
+    if os.path.exists(full_path_stored_inputs):
+        stored_inputs = pd.read_csv(full_path_stored_inputs)
+        if stored_inputs.shape[0] > 0:
+            return stored_inputs.loc[0, "project_name"]
+    return "project"
+
+
+def write_export_file(path, export_hash, settings):
+    """
+    Streams the nodes, links and settings into the *.xlsx file of an export.
+    It runs as a background task after the response has been sent.
+    """
+    try:
+        with span("export.xlsx"):
+            exports.write_xlsx(
+                path,
+                sheets={
+                    "nodes": exports.csv_rows(full_path_nodes),
+                    "links": exports.csv_rows(full_path_links),
+                    "settings": [("Setting", "value"), *settings.items()],
+                },
+            )
+        exports.remove_old_exports(path)
+        export_jobs[export_hash] = "ready"
+    except Exception:
+        export_jobs[export_hash] = "failed"
+        raise
 
 
 @app.get(
@@ -172,21 +266,88 @@ async def export_data(generate_export_file_request: models.GenerateExportFileReq
         }
     },
 )
-async def download_export_file():
-    file_name = "temp.xlsx"
-    # Download xlsx file
-    file_path = os.path.join(directory_parent, f"import_export/{file_name}")
+async def download_export_file(export_hash: str = None):
+    # Without a hash, the latest export of the project is downloaded.
+    if export_hash is None:
+        file_path = exports.latest_export(
+            directory_import_export, project_name(), "xlsx"
+        )
+    else:
+        file_path = exports.export_path(
+            directory_import_export, project_name(), export_hash, "xlsx"
+        )
 
-    if os.path.exists(file_path):
+    if (file_path is not None) and os.path.exists(file_path):
+        file_hash = os.path.splitext(os.path.basename(file_path))[0]
         return FileResponse(
             path=file_path,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            filename="backup.xlsx",
+            media_type=exports.XLSX_MEDIA_TYPE,
+            filename=f"{exports.project_slug(project_name())}_{file_hash}.xlsx",
+            headers={"ETag": f'"{file_hash}"'},
         )
+    elif export_jobs.get(export_hash) == "pending":
+        return {"status": "pending"}
     else:
         return {"error": "File not found!"}
 
 
+@app.get("/export/{table}/{file_format}")
+async def export_table(table: str, file_format: str):
+    """
+    Exports a single table for GIS and analytics tools.
+
+    Parameters
+    ----------
+    table (str):
+        'nodes', 'links', 'energy_flows' (hourly energy flows) or 'kpis'
+        (results of the last run).
+    file_format (str):
+        'parquet' or 'arrow' (Arrow IPC file), which require the package
+        `pyarrow`, or 'geojson', which is only available for the nodes and
+        links.
+    """
+    if table not in export_tables:
+        return {"error": f"Unknown table '{table}'!"}
+    if file_format not in exports.MEDIA_TYPES:
+        return {"error": f"Unknown format '{file_format}'!"}
+    csv_path = export_tables[table]
+    if not os.path.exists(csv_path):
+        return {"error": "File not found!"}
+    file_name = f"{exports.project_slug(project_name())}_{table}.{file_format}"
+
+    # GeoJSON is streamed directly from the *.csv file
+    if file_format == "geojson":
+        if table not in ["nodes", "links"]:
+            return {"error": f"The table '{table}' has no geometries!"}
+        return StreamingResponse(
+            exports.geojson_chunks(csv_path, table),
+            media_type=exports.MEDIA_TYPES["geojson"],
+            headers={"Content-Disposition": f'attachment; filename="{file_name}"'},
+        )
+
+    if not exports.arrow_available():
+        return {"error": "Parquet and Arrow exports require the package 'pyarrow'!"}
+    export_hash = await asyncio.get_running_loop().run_in_executor(
+        None, exports.content_hash, [csv_path]
+    )
+    path = exports.export_path(
+        directory_import_export, project_name(), export_hash, file_format, table
+    )
+    if not os.path.exists(path):
+        with span(f"export.{file_format}"):
+            await asyncio.get_running_loop().run_in_executor(
+                None, exports.write_columnar, path, csv_path, file_format
+            )
+        exports.remove_old_exports(path)
+
+    return FileResponse(
+        path=path,
+        media_type=exports.MEDIA_TYPES[file_format],
+        filename=file_name,
+        headers={"ETag": f'"{export_hash}"'},
+    )
+
+
 @app.post("/import_data")
 async def import_data(import_files: import_structure = None):
 
@@ -200,7 +361,87 @@ async def import_data(import_files: import_structure = None):
     if len(links) > 0:
         database_add(add_nodes=False, add_links=True, inlet=links)
 
-    # ------------------------------ HANDLE REQUEST ------------------------------#
+
+@app.post("/import_file/{table}")
+async def import_file(
+    table: str, background_tasks: BackgroundTasks, file: UploadFile = File(...)
+):
+    """
+    Imports the nodes or links of a large *.xlsx, *.csv or Parquet file.
+
+    The uploaded file is stored on the disk and parsed in chunks by a
+    background task, which validates and inserts the rows chunk by chunk.
+    The progress is obtained from `import_progress` with the returned id.
+
+    Parameters
+    ----------
+    table (str):
+        'nodes' or 'links'.
+    file (fastapi.UploadFile):
+        uploaded file. *.xlsx files may contain the nodes and links in the
+        sheets of the same names, as in the files of `export_data`.
+    """
+    if table not in uploads.REQUIRED_COLUMNS:
+        return {"error": f"Unknown table '{table}'!"}
+    file_format = uploads.file_format(file.filename)
+    if file_format is None:
+        return {"error": "Only *.xlsx, *.csv and *.parquet files can be imported!"}
+    if file_format == "parquet" and not exports.arrow_available():
+        return {"error": "Parquet imports require the package 'pyarrow'!"}
+
+    job = uploads.ImportJob(table=table, file_name=file.filename)
+    path = os.path.join(
+        directory_import_export, "uploads", f"{job.id}.{file_format}"
+    ).replace("\\", "/")
+    io.make_folder(os.path.dirname(path))
+    with open(path, "wb") as upload:
+        while True:
+            block = await file.read(1 << 20)
+            if not block:
+                break
+            upload.write(block)
+
+    import_jobs[job.id] = job
+    background_tasks.add_task(run_import, job=job, path=path, file_format=file_format)
+    return job.progress()
+
+
+def run_import(job, path, file_format):
+    """
+    Parses, validates and inserts the rows of an uploaded file chunk by
+    chunk. It runs as a background task after the response has been sent.
+    """
+    job.status = "running"
+    try:
+        with span("import.file"):
+            job.n_rows = uploads.count_rows(path, file_format, job.table)
+            for chunk in uploads.read_chunks(path, file_format, job.table):
+                valid_rows, invalid_rows = uploads.validate_chunk(
+                    chunk, job.table, first_row=job.n_rows_read
+                )
+                if valid_rows.shape[0] > 0:
+                    database_add(
+                        add_nodes=(job.table == "nodes"),
+                        add_links=(job.table == "links"),
+                        inlet=valid_rows,
+                    )
+                job.add_chunk(chunk.shape[0], valid_rows.shape[0], invalid_rows)
+        job.status = "done"
+    except Exception as error:
+        job.error = str(error)
+        job.status = "failed"
+    finally:
+        os.remove(path)
+
+
+@app.get("/import_progress/{job_id}")
+async def import_progress(job_id: str):
+    if job_id not in import_jobs:
+        return {"error": "Import not found!"}
+    return import_jobs[job_id].progress()
+
+
+# ------------------------------ HANDLE REQUEST ------------------------------#
 
 
 @app.get("/")
@@ -258,10 +499,10 @@ async def simulation_results(request: Request):
     return templates.TemplateResponse("simulation-results.html", {"request": request})
 
 
-@app.get("/get_demand_coverage_data/")
+@app.get("/get_demand_coverage_data/", response_class=io.JSONBytesResponse)
 async def get_demand_coverage_data():
 
-    return json.loads(pd.read_csv(full_path_demand_coverage).to_json())
+    return io.JSONBytesResponse(io.read_csv_as_json(full_path_demand_coverage))
 
 
 @app.get("/database_initialization/{nodes}/{links}")
@@ -321,6 +562,8 @@ async def database_initialization(nodes, links):
         "time_grid_design",
         "time_energy_system_design",
         "time",
+        "max_voltage_drop",
+        "n_voltage_drop_violations",
     ]
     header_energy_flows = [
         "diesel_genset_production",
@@ -381,105 +624,103 @@ async def database_add_remove_manual(
     add_remove: str, add_node_request: models.AddNodeRequest
 ):
 
-    headers = pd.read_csv(full_path_nodes).columns
-    nodes = {}
-    nodes[headers[0]] = [add_node_request.latitude]
-    nodes[headers[1]] = [add_node_request.longitude]
-    nodes[headers[2]] = [add_node_request.node_type]
-    nodes[headers[3]] = [add_node_request.consumer_type]
-    nodes[headers[4]] = [add_node_request.consumer_detail]
-    nodes[headers[5]] = [add_node_request.surface_area]
-    nodes[headers[6]] = [add_node_request.peak_demand]
-    nodes[headers[7]] = [add_node_request.average_consumption]
-    nodes[headers[8]] = [add_node_request.is_connected]
-    nodes[headers[9]] = [add_node_request.how_added]
+    # the fields of the request are named after the columns of the database
+    nodes = {column: [value] for column, value in add_node_request.dict().items()}
 
     if add_remove == "remove":
-        # reading the existing CSV file of nodes, and then removing the corresponding row
-        df = pd.read_csv(full_path_nodes)
-
-        # Since a node is removed, the calculated positions for ALL poles and
-        # the power house must be first removed.
-        df = df[(df["node_type"] != "pole") & (df["node_type"] != "power-house")]
-
-        for index in df.index:
-            if (
-                round(add_node_request.latitude, 6) == df.to_dict()["latitude"][index]
-            ) and (
-                round(add_node_request.longitude, 6) == df.to_dict()["longitude"][index]
-            ):
-                df.drop(labels=index, axis=0, inplace=True)
-
-        # Remove all existing nodes and links.
-        await database_initialization(nodes=True, links=True)
-
-        # storing the nodes in the database (updating the existing CSV file)
-        df = df.reset_index(drop=True)
-        database_add(add_nodes=True, add_links=False, inlet=df.to_dict())
+        # find the row of the clicked consumer using the coordinate index of
+        # the database, and remove it with the links attached to it. Unlike
+        # before, only the poles of its cluster are removed, and the other
+        # poles and the power house are kept (see `NodeStore`).
+        node_store.remove(
+            latitude=add_node_request.latitude,
+            longitude=add_node_request.longitude,
+        )
     else:
         database_add(add_nodes=True, add_links=False, inlet=nodes)
 
 
-# add new nodes/links to the database
-def database_add(add_nodes: bool, add_links: bool, inlet: dict):
+@app.post("/database_add_nodes")
+async def database_add_nodes(add_nodes_request: models.AddNodesRequest):
+    """
+    Adds many nodes given as columns at once, e.g. by scripts.
 
-    # updating csv files based on the added nodes
-    if add_nodes:
-        nodes = inlet
-        # newly added nodes
-        df = pd.DataFrame.from_dict(nodes).round(decimals=6)
-
-        # the existing database
-        if os.path.exists(full_path_nodes):
-            df_existing = pd.read_csv(full_path_nodes)
-
-            # Remove all existing poles and the power house.
-            df_existing = df_existing[
-                (df_existing["node_type"] != "pole")
-                & (df_existing["node_type"] != "power-house")
-            ]
-        else:
-            df_existing = pd.DataFrame()
+    The nodes are validated in one pass (see `uploads.validate_chunk`) and
+    inserted into the database with a single write. The demands of consumers
+    without peak demand are estimated from the surface areas of their
+    buildings. Consumers without both of them are invalid.
 
-            # Aappend the existing database with the new nodes and remove
-        # duplicates (only when both lat and lon are identical).
-        df_total = df_existing.append(df).drop_duplicates(
-            subset=["latitude", "longitude", "node_type"], inplace=False
+    Parameters
+    ----------
+    add_nodes_request (fastapi_app.models.AddNodesRequest):
+        columns of the nodes.
+
+    Output
+    ------
+    (dict): number of inserted, updated and invalid nodes, and the first
+        invalid nodes (counted from 1) with their errors.
+    """
+    nodes = pd.DataFrame(
+        {
+            column: values
+            for column, values in add_nodes_request.dict().items()
+            if values is not None
+        }
+    )
+    n_nodes = nodes.shape[0]
+    nodes, invalid_rows = uploads.validate_chunk(nodes, "nodes")
+    # the valid nodes keep their order, so their rows are the remaining ones
+    rows = np.setdiff1d(
+        np.arange(1, n_nodes + 1), [invalid["row"] for invalid in invalid_rows]
+    )
+
+    is_consumer = (nodes["node_type"] == "consumer").to_numpy()
+    is_estimated = (
+        is_consumer & nodes["peak_demand"].isna() & nodes["surface_area"].notna()
+    ).to_numpy()
+    if is_estimated.any():
+        peak_demands, average_consumptions = estimate_demands(
+            nodes.loc[is_estimated, "surface_area"]
         )
+        nodes.loc[is_estimated, "peak_demand"] = peak_demands
+        nodes.loc[is_estimated, "average_consumption"] = average_consumptions
+
+    # the demand of consumers without peak demand and surface area is unknown
+    is_invalid = is_consumer & nodes["peak_demand"].isna().to_numpy()
+    invalid_rows = sorted(
+        invalid_rows
+        + [
+            {"row": int(row), "error": "'peak_demand' or 'surface_area' is missing"}
+            for row in rows[is_invalid]
+        ],
+        key=lambda invalid: invalid["row"],
+    )
+    nodes = nodes[~is_invalid].reset_index(drop=True)
 
-        # storing the nodes in the database (updating the existing CSV file).
-        df_total = df_total.reset_index(drop=True)
+    with span("database.add"):
+        summary = node_store.upsert(nodes=nodes)
 
-        # If consumers are added to the database or removed from it, all
-        # already existing links and all existing poles must be removed.
-        if df["node_type"].str.contains("consumer").sum() > 0:
-            # Remove existing links.
-            if os.path.exists(full_path_links):
-                df_links = pd.read_csv(full_path_links)
-                df_links.drop(labels=df_links.index, axis=0, inplace=True)
-                df_links.to_csv(full_path_links, index=False, header=df_links.head)
+    return {
+        **summary,
+        "invalid": len(invalid_rows),
+        "invalid_rows": invalid_rows[: uploads.MAX_REPORTED_ERRORS],
+    }
 
-        # defining the precision of data
-        df_total.latitude = df_total.latitude.map(lambda x: "%.6f" % x)
-        df_total.longitude = df_total.longitude.map(lambda x: "%.6f" % x)
-        df_total.surface_area = df_total.surface_area.map(lambda x: "%.2f" % x)
-        df_total.peak_demand = df_total.peak_demand.map(lambda x: "%.3f" % x)
-        df_total.average_consumption = df_total.average_consumption.map(
-            lambda x: "%.3f" % x
-        )
 
-        # finally adding the refined dataframe (if it is not empty) to the existing csv file
-        if len(df_total.index) != 0:
-            df_total.to_csv(full_path_nodes, index=False, header=df_existing.head)
+# add new nodes/links to the database
+@timed("database.add")
+def database_add(add_nodes: bool, add_links: bool, inlet: dict):
+
+    # updating csv files based on the added nodes
+    # only the new and changed nodes are written to the database, and only
+    # the links attached to replaced nodes are removed (see `NodeStore`)
+    if add_nodes:
+        node_store.upsert(nodes=inlet)
 
     if add_links:
         links = inlet
         # defining the precision of data
-        df = pd.DataFrame.from_dict(links)
-        df.lat_from = df.lat_from.map(lambda x: "%.6f" % x)
-        df.lon_from = df.lon_from.map(lambda x: "%.6f" % x)
-        df.lat_to = df.lat_to.map(lambda x: "%.6f" % x)
-        df.lon_to = df.lon_to.map(lambda x: "%.6f" % x)
+        df = format_columns(pd.DataFrame.from_dict(links), LINKS_FORMAT)
 
         # adding the links to the existing csv file
         if len(df.index) != 0:
@@ -492,16 +733,15 @@ def database_add(add_nodes: bool, add_links: bool, inlet: dict):
             )
 
 
-@app.get("/database_to_js/{nodes_or_links}")
+@app.get("/database_to_js/{nodes_or_links}", response_class=io.JSONBytesResponse)
 async def database_read(nodes_or_links: str):
 
     # importing nodes and links from the csv files to the map
+    # the encoded payload is reused as long as the csv file is not changed
     if nodes_or_links == "nodes":
-        nodes_list = json.loads(pd.read_csv(full_path_nodes).to_json())
-        return nodes_list
+        return io.JSONBytesResponse(io.read_csv_as_json(full_path_nodes))
     else:
-        links_list = json.loads(pd.read_csv(full_path_links).to_json())
-        return links_list
+        return io.JSONBytesResponse(io.read_csv_as_json(full_path_links))
 
 
 @app.get("/load_results/")
@@ -751,22 +991,22 @@ async def get_data_for_sankey_diagram():
     return sankey_data
 
 
-@app.get("/get_data_for_energy_flows/")
+@app.get("/get_data_for_energy_flows/", response_class=io.JSONBytesResponse)
 async def get_data_for_energy_flows():
 
-    return json.loads(pd.read_csv(full_path_energy_flows).to_json())
+    return io.JSONBytesResponse(io.read_csv_as_json(full_path_energy_flows))
 
 
-@app.get("/get_data_for_duration_curves/")
+@app.get("/get_data_for_duration_curves/", response_class=io.JSONBytesResponse)
 async def get_data_for_duration_curves():
 
-    return json.loads(pd.read_csv(full_path_duration_curves).to_json())
+    return io.JSONBytesResponse(io.read_csv_as_json(full_path_duration_curves))
 
 
-@app.get("/get_co2_emissions_data/")
+@app.get("/get_co2_emissions_data/", response_class=io.JSONBytesResponse)
 async def get_co2_emissions_data():
 
-    return json.loads(pd.read_csv(full_path_co2_emissions).to_json())
+    return io.JSONBytesResponse(io.read_csv_as_json(full_path_co2_emissions))
 
 
 @app.post("/database_add_remove_automatic/{add_remove}")
@@ -838,64 +1078,111 @@ async def database_add_remove_automatic(
         database_add(add_nodes=True, add_links=False, inlet=nodes)
 
     else:
-        # reading the existing CSV file of nodes, and then removing the corresponding row
-        df = pd.read_csv(full_path_nodes)
-        number_of_nodes = df.shape[0]
-        for index in range(number_of_nodes):
+        # reading the existing CSV file of nodes, and then removing the rows
+        # of all nodes inside the boundaries (and the links attached to them)
+        df = node_store.read()
+        rows_to_remove = [
+            row
+            for row, point_coordinates in enumerate(
+                zip(df["latitude"].to_numpy(), df["longitude"].to_numpy())
+            )
             if bi.is_point_in_boundaries(
-                point_coordinates=(
-                    df.to_dict()["latitude"][index],
-                    df.to_dict()["longitude"][index],
-                ),
+                point_coordinates=point_coordinates,
                 boundaries=boundary_coordinates,
-            ):
-                df.drop(labels=index, axis=0, inplace=True)
+            )
+        ]
+        node_store.remove_rows(rows_to_remove)
 
-        # removing all nodes and links
-        await database_initialization(nodes=True, links=True)
 
-        # storing the nodes in the database (updating the existing CSV file)
-        df = df.reset_index(drop=True)
-        database_add(add_nodes=True, add_links=False, inlet=df.to_dict())
+# peak demand per surface area of the buildings in each of the five demand
+# profiles, from very low to very high demands [kW/m²]
+PEAK_DEMAND_PER_AREA = np.array([0.01, 0.02, 0.03, 0.04, 0.05])
 
 
-def demand_estimation(nodes, update_total_demand):
+def demand_profiles(values, reference_values=None):
+    """
+    Assigns values (e.g., surface areas or peak demands) to one of the five
+    demand profiles, from very low (0) to very high (4), by their share of
+    the maximum value.
+
+    Parameters
+    ----------
+    values (array-like):
+        values of the nodes.
+    reference_values (array-like): optional
+        values whose maximum is used, if it is not the maximum of the given
+        values. Missing values are ignored.
+
+    Output
+    ------
+    (numpy.ndarray): index of the demand profile of each value.
+    """
+    values = np.asarray(values, dtype=float)
+    if reference_values is None:
+        reference_values = values
+    reference_values = np.asarray(reference_values, dtype=float)
+    reference_values = reference_values[~np.isnan(reference_values)]
+    max_value = reference_values.max() if reference_values.size > 0 else np.nan
+    return np.select(
+        [
+            values <= 0.2 * max_value,
+            values < 0.4 * max_value,
+            values < 0.6 * max_value,
+            values < 0.8 * max_value,
+        ],
+        [0, 1, 2, 3],
+        default=4,
+    )
 
-    # after collecting all surface areas, based on a simple assumption, the peak demand will be obtained
-    max_surface_area = max(nodes["surface_area"])
+
+def estimate_demands(surface_areas):
+    """
+    Estimates the peak demand and the average consumption of consumers from
+    the surface areas of their buildings.
+
+    Parameters
+    ----------
+    surface_areas (array-like):
+        surface areas of the buildings [m²].
+
+    Output
+    ------
+    (tuple): arrays of the peak demands and the average consumptions.
+    """
+    surface_areas = np.asarray(surface_areas, dtype=float)
 
     # normalized demands is a CSV file with 5 columns representing the very low to very high demand profiles
     normalized_demands = pd.read_csv(full_path_demands, delimiter=";", header=None)
 
+    peak_demands = PEAK_DEMAND_PER_AREA[demand_profiles(surface_areas)] * surface_areas
+    annual_demands = normalized_demands.iloc[:, :5].sum().to_numpy()
+    average_consumptions = annual_demands[demand_profiles(peak_demands)] * peak_demands
+
+    return peak_demands, average_consumptions
+
+
+@timed("demand_estimation")
+def demand_estimation(nodes, update_total_demand):
+
     if update_total_demand:
-        # calculate the total peak demand for each of the five demand profiles to make the final demand profile
-        peak_very_low_demand = 0
-        peak_low_demand = 0
-        peak_medium_demand = 0
-        peak_high_demand = 0
-        peak_very_high_demand = 0
-
-        for area in nodes[nodes["is_connected"] == True]["surface_area"]:
-            if area <= 0.2 * max_surface_area:
-                peak_very_low_demand += 0.01 * area
-            elif area < 0.4 * max_surface_area:
-                peak_low_demand += 0.02 * area
-            elif area < 0.6 * max_surface_area:
-                peak_medium_demand += 0.03 * area
-            elif area < 0.8 * max_surface_area:
-                peak_high_demand += 0.04 * area
-            else:
-                peak_very_high_demand += 0.05 * area
+        # normalized demands is a CSV file with 5 columns representing the very low to very high demand profiles
+        normalized_demands = pd.read_csv(
+            full_path_demands, delimiter=";", header=None
+        )
 
-        # create the total demand profile of the selected buildings
-        total_demand = (
-            normalized_demands.iloc[:, 0] * peak_very_low_demand
-            + normalized_demands.iloc[:, 1] * peak_low_demand
-            + normalized_demands.iloc[:, 2] * peak_medium_demand
-            + normalized_demands.iloc[:, 3] * peak_high_demand
-            + normalized_demands.iloc[:, 4] * peak_very_high_demand
+        # calculate the total peak demand for each of the five demand profiles
+        # to make the final demand profile, based on the surface areas relative
+        # to the largest building
+        surface_areas = nodes["surface_area"].to_numpy(dtype=float)
+        areas = surface_areas[(nodes["is_connected"] == True).to_numpy()]
+        profiles = demand_profiles(areas, reference_values=surface_areas)
+        peak_demands = np.bincount(
+            profiles, weights=PEAK_DEMAND_PER_AREA[profiles] * areas, minlength=5
         )
 
+        # create the total demand profile of the selected buildings
+        total_demand = normalized_demands.iloc[:, :5] @ peak_demands
+
         # load timeseries data
         timeseries = pd.read_csv(full_path_timeseries)
         # replace the demand column in the timeseries file with the total demand calculated here
@@ -903,57 +1190,66 @@ def demand_estimation(nodes, update_total_demand):
         # update the CSV file
         timeseries.to_csv(full_path_timeseries, index=False)
     else:
-        for area in nodes["surface_area"]:
-            if area <= 0.2 * max_surface_area:
-                nodes["peak_demand"].append(0.01 * area)
-            elif area < 0.4 * max_surface_area:
-                nodes["peak_demand"].append(0.02 * area)
-            elif area < 0.6 * max_surface_area:
-                nodes["peak_demand"].append(0.03 * area)
-            elif area < 0.8 * max_surface_area:
-                nodes["peak_demand"].append(0.04 * area)
-            else:
-                nodes["peak_demand"].append(0.05 * area)
-
-        max_peak_demand = max(nodes["peak_demand"])
-        counter = 0
-        for peak_demand in nodes["peak_demand"]:
-            if peak_demand <= 0.2 * max_peak_demand:
-                nodes["average_consumption"].append(
-                    normalized_demands.iloc[:, 0].sum() * nodes["peak_demand"][counter]
-                )
-            elif peak_demand < 0.4 * max_peak_demand:
-                nodes["average_consumption"].append(
-                    normalized_demands.iloc[:, 1].sum() * nodes["peak_demand"][counter]
-                )
-            elif peak_demand < 0.6 * max_peak_demand:
-                nodes["average_consumption"].append(
-                    normalized_demands.iloc[:, 2].sum() * nodes["peak_demand"][counter]
-                )
-            elif peak_demand < 0.8 * max_peak_demand:
-                nodes["average_consumption"].append(
-                    normalized_demands.iloc[:, 3].sum() * nodes["peak_demand"][counter]
-                )
-            else:
-                nodes["average_consumption"].append(
-                    normalized_demands.iloc[:, 4].sum() * nodes["peak_demand"][counter]
-                )
+        peak_demands, average_consumptions = estimate_demands(nodes["surface_area"])
+        nodes["peak_demand"] = peak_demands.tolist()
+        nodes["average_consumption"] = average_consumptions.tolist()
 
-            counter += 1
+        # it is assumed that all nodes are parts of the mini-grid
+        # later, when the shs candidates are obtained, the corresponding
+        # values will be changed to 'False'
+        nodes["is_connected"] = [True] * len(peak_demands)
 
-            # it is assumed that all nodes are parts of the mini-grid
-            # later, when the shs candidates are obtained, the corresponding
-            # values will be changed to 'False'
-            nodes["is_connected"].append(True)
-
-            # the node is selected automatically after drawing boundaries
-            nodes["how_added"].append("automatic")
+        # the node is selected automatically after drawing boundaries
+        nodes["how_added"] = ["automatic"] * len(peak_demands)
 
         return nodes
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Wall time, number of calls and peak memory of the stages of the
+    optimization, and the peak memory of the process, in the Prometheus
+    text format.
+    """
+    return PlainTextResponse(
+        prometheus_metrics(), media_type="text/plain; version=0.0.4"
+    )
+
+
 @app.post("/optimize_grid/")
-async def optimize_grid():
+async def optimize_grid(
+    incremental: bool = False,
+    assignment: str = Query("constrained", regex="^(constrained|greedy)$"),
+    voltage_drop_repair: bool = False,
+    annealing_chains: int = Query(0, ge=0),
+    max_segment_size: Optional[int] = Query(None, ge=1),
+    timings: bool = False,
+):
+    # The timings of all stages are only returned if requested.
+    with collect_timings() as stage_timings:
+        with span("optimize_grid"):
+            result = await design_grid_of_nodes(
+                incremental=incremental,
+                assignment=assignment,
+                voltage_drop_repair=voltage_drop_repair,
+                annealing_chains=annealing_chains,
+                max_segment_size=max_segment_size,
+            )
+
+    if timings:
+        result["timings"] = stage_timings
+
+    return result
+
+
+async def design_grid_of_nodes(
+    incremental: bool,
+    assignment: str,
+    voltage_drop_repair: bool,
+    annealing_chains: int,
+    max_segment_size: Optional[int],
+):
 
     # Grab Currrent Time Before Running the Code
     start_execution_time = time.monotonic()
@@ -967,13 +1263,14 @@ async def optimize_grid():
         project_lifetime=df.loc[0, "project_lifetime"],
         wacc=df.loc[0, "interest_rate"] / 100,
         tax=0,
+        assignment=assignment,
+        annealing_chains=annealing_chains,
+        max_segment_size=max_segment_size,
     )
 
-    # get nodes from the database (CSV file) as a dictionary
-    # then convert it again to a panda dataframe for simplicity
-    # TODO: check the format of nodes from the database_read()
-    nodes = await database_read(nodes_or_links="nodes")
-    nodes = pd.DataFrame.from_dict(nodes)
+    # get nodes from the database (CSV file) as a panda dataframe
+    with span("database.read_nodes"):
+        nodes = pd.read_csv(full_path_nodes)
 
     # if there is no element in the nodes, optimization will be terminated
     if len(nodes) == 0:
@@ -1049,7 +1346,7 @@ async def optimize_grid():
     end_datetime = start_datetime + timedelta(days=int(opt.n_days))
 
     # First, the demand for the entire year is read from the CSV file.
-    demand_full_year = pd.read_csv(filepath_or_buffer=full_path_timeseries)
+    demand_full_year = io.read_timeseries(full_path_timeseries)
     demand_full_year.index = pd.date_range(
         start=start_datetime, periods=len(demand_full_year), freq="H"
     )
@@ -1092,133 +1389,137 @@ async def optimize_grid():
         / 365
     )
 
-    grid = Grid(
-        epc_distribution_cable=epc_distribution_cable,
-        epc_connection_cable=epc_connection_cable,
-        epc_connection=epc_connection,
-        epc_pole=epc_pole,
-        pole_max_connection=df.loc[0, "pole_max_n_connections"],
-    )
-
-    # make sure that the new grid object is empty before adding nodes to it
-    grid.clear_nodes()
-    grid.clear_all_links()
-
-    # exclude solar-home-systems and poles from the grid optimization
-    for node_index in nodes.index:
-        if (
-            (nodes.is_connected[node_index])
-            and (not nodes.node_type[node_index] == "pole")
-            and (not nodes.node_type[node_index] == "power-house")
-        ):
-
-            # add all consumers which are not served by solar-home-systems
-            grid.add_node(
-                label=str(node_index),
-                longitude=nodes.longitude[node_index],
-                latitude=nodes.latitude[node_index],
-                node_type=nodes.node_type[node_index],
-                is_connected=nodes.is_connected[node_index],
-                peak_demand=nodes.peak_demand[node_index],
-                average_consumption=nodes.average_consumption[node_index],
-                surface_area=nodes.surface_area[node_index],
-            )
-
-    # convert all (long,lat) coordinates to (x,y) coordinates and update
-    # the Grid object, which is necessary for the GridOptimizer
-    grid.convert_lonlat_xy()
-
-    # in case the grid contains 'poles' from the previous optimization
-    # they must be removed, becasue the grid_optimizer will calculate
-    # new locations for poles considering the newly added nodes
-    grid.clear_poles()
-
-    # Find the location of the power house which corresponds to the centroid
-    # load of the village
-    grid.get_load_centroid()
-
-    # Calculate all distanced from the load centroid
-    grid.get_nodes_distances_from_load_centroid()
-
-    # Find the number of SHS consumers (temporarily)
-    shs_share = 0
-    n_total_consumers = grid.nodes.shape[0]
-    n_shs_consumers = int(np.ceil(shs_share * n_total_consumers))
-    n_mg_consumers = n_total_consumers - n_shs_consumers
-
-    # Sort nodes based on their distance to the load center.
-    grid.nodes.sort_values("distance_to_load_center", ascending=False, inplace=True)
-
-    # Convert the first `n_shs_consumer` nodes into candidates for SHS.
-    grid.nodes.at[grid.nodes.index[0:n_shs_consumers], "is_connected"] = False
+    connection_cable_max_length = df.loc[0, "connection_cable_max_length"]
+    distribution_cable_max_length = df.loc[0, "distribution_cable_max_length"]
 
-    # Sort nodes again based on their index label. Here, since the index is
-    # string, sorting the nodes without changing the type of index would result
-    # in a case, that '10' comes before '2'.
-    grid.nodes.sort_index(key=lambda x: x.astype("int64"), inplace=True)
+    # The previous grid can only be updated, if it was designed using the
+    # same parameters.
+    design_parameters = {
+        "epc_distribution_cable": epc_distribution_cable,
+        "epc_connection_cable": epc_connection_cable,
+        "epc_connection": epc_connection,
+        "epc_pole": epc_pole,
+        "pole_max_connection": df.loc[0, "pole_max_n_connections"],
+        "connection_cable_max_length": connection_cable_max_length,
+        "distribution_cable_max_length": distribution_cable_max_length,
+        "assignment": assignment,
+        "voltage_drop_repair": voltage_drop_repair,
+        "annealing_chains": annealing_chains,
+        "max_segment_size": max_segment_size,
+    }
 
-    # Create the demand profile for the energy system optimization based on the
-    # number of mini-grid consumers.
-    demand_estimation(nodes=grid.nodes, update_total_demand=True)
+    is_updated = False
+    voltage_drop_repair_summary = None
+    if incremental and (previous_grid_design["parameters"] == design_parameters):
+        # Only add and remove the consumers that changed since the last
+        # optimization. If the changes are too large or the grid gets too
+        # expensive, the grid is designed from scratch.
+        grid = copy.deepcopy(previous_grid_design["grid"])
+        added_nodes, removed_nodes = grid.find_consumer_delta(
+            nodes=nodes[
+                (nodes["is_connected"] == True)
+                & (~nodes["node_type"].isin(["pole", "power-house"]))
+            ]
+        )
+        opt, grid, is_updated, voltage_drop_repair_summary = await worker_pool.run(
+            workers.update_grid,
+            opt=opt,
+            grid=grid,
+            added_nodes=added_nodes,
+            removed_nodes=removed_nodes,
+            connection_cable_max_length=connection_cable_max_length,
+            distribution_cable_max_length=distribution_cable_max_length,
+            voltage_drop_repair=voltage_drop_repair,
+        )
 
-    # calculate the minimum number of poles based on the
-    # maximum number of connectins at each pole
-    if grid.pole_max_connection == 0:
-        min_number_of_poles = 1
+    if is_updated:
+        n_shs_consumers = grid.consumers()[
+            grid.consumers()["is_connected"] == False
+        ].shape[0]
+        demand_estimation(nodes=grid.nodes, update_total_demand=True)
     else:
-        min_number_of_poles = int(np.ceil(n_mg_consumers / (grid.pole_max_connection)))
-
-    # ---------- MAX DISTANCE BETWEEN POLES AND CONSUMERS ----------
-    connection_cable_max_length = df.loc[0, "connection_cable_max_length"]
-
-    # First, the appropriate number of poles should be selected, to meet
-    # the constraint on the maximum distance between consumers and poles.
-    while True:
-        # Initial number of poles.
-        number_of_poles = opt.find_opt_number_of_poles(
-            grid=grid, min_n_clusters=min_number_of_poles
+        grid = Grid(
+            epc_distribution_cable=epc_distribution_cable,
+            epc_connection_cable=epc_connection_cable,
+            epc_connection=epc_connection,
+            epc_pole=epc_pole,
+            pole_max_connection=df.loc[0, "pole_max_n_connections"],
+            ref_node=np.zeros(2),
         )
 
-        # Find those connections with constraint violation.
-        constraints_violation = grid.links[grid.links["link_type"] == "connection"]
-        constraints_violation = constraints_violation[
-            constraints_violation["length"] > connection_cable_max_length
-        ]
+        # make sure that the new grid object is empty before adding nodes to it
+        grid.clear_nodes()
+        grid.clear_all_links()
 
-        # Increase the number of poles if necessary.
-        if constraints_violation.shape[0] > 0:
-            min_number_of_poles += 1
-        else:
-            break
+        # exclude solar-home-systems and poles from the grid optimization
+        for node_index in nodes.index:
+            if (
+                (nodes.is_connected[node_index])
+                and (not nodes.node_type[node_index] == "pole")
+                and (not nodes.node_type[node_index] == "power-house")
+            ):
 
-    # ----------------- MAX DISTANCE BETWEEN POLES -----------------
-    distribution_cable_max_length = df.loc[0, "distribution_cable_max_length"]
+                # add all consumers which are not served by solar-home-systems
+                grid.add_node(
+                    label=str(node_index),
+                    longitude=nodes.longitude[node_index],
+                    latitude=nodes.latitude[node_index],
+                    node_type=nodes.node_type[node_index],
+                    is_connected=nodes.is_connected[node_index],
+                    peak_demand=nodes.peak_demand[node_index],
+                    average_consumption=nodes.average_consumption[node_index],
+                    surface_area=nodes.surface_area[node_index],
+                )
 
-    # Find the connection links in the network with lengths greater than the
-    # maximum allowed length for `connection` cables, specified by the user.
-    long_links = grid.find_index_longest_distribution_link(
-        max_distance_dist_links=distribution_cable_max_length,
-    )
+        # convert all (long,lat) coordinates to (x,y) coordinates and update
+        # the Grid object, which is necessary for the GridOptimizer
+        grid.convert_lonlat_xy()
 
-    # Add poles to the identified long `distribution` links, so that the
-    # distance between all poles remains below the maximum allowed distance.
-    grid.add_fixed_poles_on_long_links(
-        long_links=long_links,
-        max_allowed_distance=distribution_cable_max_length,
-    )
+        # in case the grid contains 'poles' from the previous optimization
+        # they must be removed, becasue the grid_optimizer will calculate
+        # new locations for poles considering the newly added nodes
+        grid.clear_poles()
+
+        # Find the location of the power house which corresponds to the
+        # centroid load of the village
+        grid.get_load_centroid()
 
-    # Update the (lon,lat) coordinates based on the newly inserted poles
-    # which only have (x,y) coordinates.
-    grid.convert_lonlat_xy(inverse=True)
+        # Calculate all distanced from the load centroid
+        grid.get_nodes_distances_from_load_centroid()
 
-    # Connect all poles together using the minimum spanning tree algorithm.
-    opt.connect_grid_poles(grid, long_links=long_links)
+        # Find the number of SHS consumers (temporarily)
+        shs_share = 0
+        n_total_consumers = grid.nodes.shape[0]
+        n_shs_consumers = int(np.ceil(shs_share * n_total_consumers))
 
-    # Calculate distances of all poles from the load centroid.
-    grid.get_poles_distances_from_load_centroid()
+        # Sort nodes based on their distance to the load center.
+        grid.nodes.sort_values(
+            "distance_to_load_center", ascending=False, inplace=True
+        )
 
-    # Find the location of the power house.
-    grid.select_location_of_power_house()
+        # Convert the first `n_shs_consumer` nodes into candidates for SHS.
+        grid.nodes.loc[grid.nodes.index[0:n_shs_consumers], "is_connected"] = False
+
+        # Sort nodes again based on their index label. Here, since the index
+        # is string, sorting the nodes without changing the type of index would
+        # result in a case, that '10' comes before '2'.
+        grid.nodes.sort_index(key=lambda x: x.astype("int64"), inplace=True)
+
+        # Create the demand profile for the energy system optimization based on
+        # the number of mini-grid consumers.
+        demand_estimation(nodes=grid.nodes, update_total_demand=True)
+
+        # Find the number of poles, their location and all links of the grid,
+        # and upgrade cables or add feeders until the voltage drop is within
+        # limits, if requested.
+        opt, grid, voltage_drop_repair_summary = await worker_pool.run(
+            workers.design_grid,
+            opt=opt,
+            grid=grid,
+            connection_cable_max_length=connection_cable_max_length,
+            distribution_cable_max_length=distribution_cable_max_length,
+            voltage_drop_repair=voltage_drop_repair,
+        )
 
     # Calculate the cost of SHS.
     peak_demand_shs_consumers = grid.nodes[grid.nodes["is_connected"] == False].loc[
@@ -1236,6 +1537,7 @@ async def optimize_grid():
             "x",
             "y",
             "cluster_label",
+            "segment",
             "type_fixed",
             "n_connection_links",
             "n_distribution_links",
@@ -1262,6 +1564,7 @@ async def optimize_grid():
             "total_power",
             "from_node",
             "to_node",
+            "section_area",
         ],
         axis=1,
         inplace=True,
@@ -1270,6 +1573,20 @@ async def optimize_grid():
     # store the list of poles in the "node" database
     database_add(add_nodes=False, add_links=True, inlet=links.to_dict())
 
+    # changes of consumers only invalidate the poles and links of their clusters
+    node_store.set_clusters(grid.nodes)
+
+    # Check the voltage drop between the power house and all nodes.
+    voltage_drop = grid.get_voltage_drop_at_nodes()
+    voltage_drop_violations = voltage_drop[
+        voltage_drop["voltage drop fraction [%]"] > grid.max_voltage_drop
+    ]
+    max_voltage_drop = (
+        float(voltage_drop["voltage drop fraction [%]"].max())
+        if voltage_drop.shape[0] > 0
+        else 0.0
+    )
+
     # Grab Currrent Time After Running the Code
     end_execution_time = time.monotonic()
 
@@ -1293,20 +1610,39 @@ async def optimize_grid():
     df.loc[0, "n_connection_links"] = int(
         grid.links[grid.links["link_type"] == "connection"].shape[0]
     )
+    df.loc[0, "max_voltage_drop"] = max_voltage_drop
+    df.loc[0, "n_voltage_drop_violations"] = voltage_drop_violations.shape[0]
+
+    with span("database.write_results"):
+        df.to_csv(
+            full_path_stored_results,
+            mode="a",
+            header=False,
+            index=False,
+            float_format="%.0f",
+        )
 
-    df.to_csv(
-        full_path_stored_results,
-        mode="a",
-        header=False,
-        index=False,
-        float_format="%.0f",
-    )
+    # The capacities of an updated grid are already known.
+    if not is_updated:
+        grid.find_capacity_of_each_link()
 
-    grid.find_n_links_connected_to_each_pole()
+    grid.distribute_grid_cost_among_consumers()
 
-    grid.find_capacity_of_each_link()
+    # Keep the grid for the next optimization.
+    previous_grid_design["grid"] = grid
+    previous_grid_design["parameters"] = design_parameters
 
-    grid.distribute_grid_cost_among_consumers()
+    return {
+        "code": "success",
+        "assignment_gap": opt.assignment_gap,
+        "annealing": opt.annealing_result,
+        "voltage_drop": {
+            "max_voltage_drop": max_voltage_drop,
+            "allowed_voltage_drop": grid.max_voltage_drop,
+            "violations": list(voltage_drop_violations.index),
+            "repair": voltage_drop_repair_summary,
+        },
+    }
 
 
 @app.post("/optimize_energy_system/")
@@ -1334,7 +1670,9 @@ async def optimize_energy_system(
         rectifier=optimize_energy_system_request.rectifier,
         shortage=optimize_energy_system_request.shortage,
     )
-    ensys_opt.optimize_energy_system()
+    ensys_opt = await worker_pool.run(
+        workers.optimize_energy_system, ensys_opt=ensys_opt
+    )
 
     # Grab Currrent Time After Running the Code
     end_execution_time = time.monotonic()
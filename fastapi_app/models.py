@@ -1,8 +1,8 @@
 from sqlalchemy import Boolean, Column, Integer, String, Numeric
 # from sqlalchemy.orm import relationship
-from pydantic import BaseModel
+from pydantic import BaseModel, root_validator
 from fastapi_app.database import Base
-from typing import List, Dict, Union
+from typing import List, Dict, Optional, Union
 
 # Models
 
@@ -66,6 +66,37 @@ class AddNodeRequest(BaseModel):
     how_added: str
 
 
+class AddNodesRequest(BaseModel):
+    """
+    Nodes given as columns, which are added at once. Only the coordinates
+    are required. Missing values are reported as invalid nodes or replaced
+    by the default values of the file imports (see `uploads.validate_chunk`).
+    The demands of consumers without peak demand are estimated from the
+    surface areas of their buildings.
+    """
+
+    latitude: List[Optional[float]]
+    longitude: List[Optional[float]]
+    node_type: Optional[List[Optional[str]]] = None
+    consumer_type: Optional[List[Optional[str]]] = None
+    consumer_detail: Optional[List[Optional[str]]] = None
+    surface_area: Optional[List[Optional[float]]] = None
+    peak_demand: Optional[List[Optional[float]]] = None
+    average_consumption: Optional[List[Optional[float]]] = None
+    is_connected: Optional[List[Optional[bool]]] = None
+    how_added: Optional[List[Optional[str]]] = None
+
+    @root_validator(skip_on_failure=True)
+    def columns_have_same_length(cls, values):
+        n_nodes = len(values["latitude"])
+        for column, column_values in values.items():
+            if column_values is not None and len(column_values) != n_nodes:
+                raise ValueError(
+                    f"'{column}' has {len(column_values)} values instead of {n_nodes}"
+                )
+        return values
+
+
 class SavePreviousDataRequest(BaseModel):
     page_setup: Dict[str, str]
     grid_design: Dict[str, str]
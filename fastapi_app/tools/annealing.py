@@ -0,0 +1,342 @@
+import numpy as np
+
+# moves of the annealing and their probabilities: shifting a pole, moving a
+# consumer to a neighbouring pole, and swapping two consumers of
+# neighbouring poles
+MOVES = ["shift", "flip", "swap"]
+MOVE_PROBABILITIES = [0.5, 0.3, 0.2]
+
+
+def distribution_link_cost(
+    length, epc_distribution_cable, epc_pole, distribution_cable_max_length
+):
+    """
+    Calculates the cost of `distribution` links, including the fixed poles
+    which are placed on links longer than the maximum allowed length.
+
+    Parameters
+    ----------
+    length (float or numpy.ndarray):
+        length of the links [m].
+    epc_distribution_cable (float):
+        equivalent periodic cost of the `distribution` cable [$/m].
+    epc_pole (float):
+        equivalent periodic cost of a pole [$].
+    distribution_cable_max_length (float):
+        maximum allowed length of the `distribution` cables [m].
+
+    Output
+    ------
+    (float or numpy.ndarray): cost of the links.
+    """
+    n_fixed_poles = np.maximum(
+        np.ceil(length / distribution_cable_max_length) - 1, 0
+    )
+    return epc_distribution_cable * length + epc_pole * n_fixed_poles
+
+
+def pole_layout_cost(
+    consumers,
+    poles,
+    labels,
+    tree,
+    epc_connection_cable,
+    epc_distribution_cable,
+    epc_pole,
+    distribution_cable_max_length,
+):
+    """
+    Calculates the cost of a layout of poles, i.e., the cost of all poles,
+    the `connection` cables and the `distribution` cables of the tree
+    between the poles.
+
+    Parameters
+    ----------
+    consumers (numpy.ndarray):
+        (x,y) coordinates of the consumers.
+    poles (numpy.ndarray):
+        (x,y) coordinates of the poles.
+    labels (numpy.ndarray):
+        index of the pole assigned to each consumer.
+    tree (scipy.sparse.spmatrix):
+        links between the poles.
+    epc_connection_cable, epc_distribution_cable, epc_pole (float):
+        equivalent periodic costs of the cables [$/m] and the poles [$].
+    distribution_cable_max_length (float):
+        maximum allowed length of the `distribution` cables [m].
+
+    Output
+    ------
+    (float): cost of the layout.
+    """
+    tree = tree.tocoo()
+    connection_length = np.sqrt(((consumers - poles[labels]) ** 2).sum(axis=1))
+    distribution_length = np.sqrt(
+        ((poles[tree.row] - poles[tree.col]) ** 2).sum(axis=1)
+    )
+
+    return float(
+        epc_pole * poles.shape[0]
+        + epc_connection_cable * connection_length.sum()
+        + distribution_link_cost(
+            distribution_length,
+            epc_distribution_cable,
+            epc_pole,
+            distribution_cable_max_length,
+        ).sum()
+    )
+
+
+def anneal_poles(
+    consumers,
+    poles,
+    labels,
+    capacity,
+    create_tree,
+    epc_connection_cable,
+    epc_distribution_cable,
+    epc_pole,
+    connection_cable_max_length,
+    distribution_cable_max_length,
+    n_iterations=20000,
+    initial_temperature=None,
+    final_temperature_ratio=1e-3,
+    refresh_interval=500,
+    trace_interval=100,
+    seed=0,
+):
+    """
+    Improves the positions of the poles and the assignment of consumers to
+    poles using simulated annealing.
+
+    The cost of each move is evaluated only for the consumers and the tree
+    links of the changed poles, while the links between the poles are kept.
+    The tree is rebuilt from the new pole positions every `refresh_interval`
+    iterations, when the cost is calculated again for the entire layout.
+    The best layout is kept after every accepted move which lowers the cost
+    below the best one so far.
+
+    Parameters
+    ----------
+    consumers (numpy.ndarray):
+        (x,y) coordinates of the consumers.
+    poles (numpy.ndarray):
+        initial (x,y) coordinates of the poles.
+    labels (numpy.ndarray):
+        initial index of the pole assigned to each consumer.
+    capacity (int):
+        maximum number of consumers of each pole (0 means no limit).
+    create_tree (callable):
+        returns the sparse matrix of the minimum spanning tree between the
+        given (x,y) coordinates.
+    epc_connection_cable, epc_distribution_cable, epc_pole (float):
+        equivalent periodic costs of the cables [$/m] and the poles [$].
+    connection_cable_max_length (float):
+        maximum allowed length of the `connection` cables [m].
+    distribution_cable_max_length (float):
+        maximum allowed length of the `distribution` cables [m].
+    n_iterations (int):
+        number of proposed moves.
+    initial_temperature (float):
+        initial temperature. If not given, it is chosen so that an average
+        uphill move is accepted with a probability of 50%.
+    final_temperature_ratio (float):
+        ratio between the final and the initial temperature of the
+        geometric cooling schedule.
+    refresh_interval (int):
+        number of iterations after which the tree is rebuilt.
+    trace_interval (int):
+        number of iterations between two entries of the convergence trace.
+    seed (int):
+        seed of the random number generator of the chain.
+
+    Output
+    ------
+    (dict): coordinates of the poles ('poles') and labels of the consumers
+        ('labels') of the best layout, its cost ('cost'), the cost of the
+        initial layout ('initial_cost') and the convergence trace ('trace')
+        as [iteration, temperature, current cost, best cost] entries.
+    """
+    rng = np.random.default_rng(seed)
+    poles = np.array(poles, dtype=float)
+    labels = np.array(labels, dtype=int)
+    n_consumers = consumers.shape[0]
+    n_poles = poles.shape[0]
+    if capacity == 0:
+        capacity = n_consumers
+
+    members = [list(np.flatnonzero(labels == pole)) for pole in range(n_poles)]
+    connection_length = np.sqrt(((consumers - poles[labels]) ** 2).sum(axis=1))
+
+    def link_cost(length):
+        return distribution_link_cost(
+            length, epc_distribution_cable, epc_pole, distribution_cable_max_length
+        )
+
+    def build_tree():
+        tree = create_tree(poles)
+        neighbours = [[] for _ in range(n_poles)]
+        tree = tree.tocoo()
+        for pole_from, pole_to in zip(tree.row, tree.col):
+            neighbours[pole_from].append(pole_to)
+            neighbours[pole_to].append(pole_from)
+        cost = pole_layout_cost(
+            consumers,
+            poles,
+            labels,
+            tree,
+            epc_connection_cable,
+            epc_distribution_cable,
+            epc_pole,
+            distribution_cable_max_length,
+        )
+        return [np.array(pole_neighbours) for pole_neighbours in neighbours], cost
+
+    def snapshot(cost):
+        return {"poles": poles.copy(), "labels": labels.copy(), "cost": cost}
+
+    def propose(move, step):
+        """
+        Returns the change of the cost for a random move and a function that
+        applies the move, or None if the move is not feasible.
+        """
+        if move == "shift":
+            pole = rng.integers(n_poles)
+            new_position = poles[pole] + rng.normal(scale=step, size=2)
+            pole_members = members[pole]
+            new_length = np.sqrt(
+                ((consumers[pole_members] - new_position) ** 2).sum(axis=1)
+            )
+            if (len(pole_members) > 0) and (
+                new_length.max() > connection_cable_max_length
+            ):
+                return None
+            pole_neighbours = neighbours[pole]
+            delta = epc_connection_cable * (
+                new_length.sum() - connection_length[pole_members].sum()
+            )
+            if len(pole_neighbours) > 0:
+                delta += (
+                    link_cost(
+                        np.sqrt(
+                            ((poles[pole_neighbours] - new_position) ** 2).sum(axis=1)
+                        )
+                    ).sum()
+                    - link_cost(
+                        np.sqrt(
+                            ((poles[pole_neighbours] - poles[pole]) ** 2).sum(axis=1)
+                        )
+                    ).sum()
+                )
+
+            def apply():
+                poles[pole] = new_position
+                connection_length[pole_members] = new_length
+
+            return delta, apply
+
+        consumer = rng.integers(n_consumers)
+        pole = labels[consumer]
+        if len(neighbours[pole]) == 0:
+            return None
+        other_pole = rng.choice(neighbours[pole])
+        new_length = np.sqrt(((consumers[consumer] - poles[other_pole]) ** 2).sum())
+        if new_length > connection_cable_max_length:
+            return None
+
+        if move == "flip":
+            # Poles keep at least one consumer, so that the number of poles
+            # does not change.
+            if (len(members[pole]) <= 1) or (len(members[other_pole]) >= capacity):
+                return None
+            delta = epc_connection_cable * (new_length - connection_length[consumer])
+
+            def apply():
+                members[pole].remove(consumer)
+                members[other_pole].append(consumer)
+                labels[consumer] = other_pole
+                connection_length[consumer] = new_length
+
+            return delta, apply
+
+        if len(members[other_pole]) == 0:
+            return None
+        other_consumer = members[other_pole][rng.integers(len(members[other_pole]))]
+        other_length = np.sqrt(((consumers[other_consumer] - poles[pole]) ** 2).sum())
+        if other_length > connection_cable_max_length:
+            return None
+        delta = epc_connection_cable * (
+            new_length
+            + other_length
+            - connection_length[consumer]
+            - connection_length[other_consumer]
+        )
+
+        def apply():
+            members[pole].remove(consumer)
+            members[other_pole].remove(other_consumer)
+            members[pole].append(other_consumer)
+            members[other_pole].append(consumer)
+            labels[consumer] = other_pole
+            labels[other_consumer] = pole
+            connection_length[consumer] = new_length
+            connection_length[other_consumer] = other_length
+
+        return delta, apply
+
+    neighbours, cost = build_tree()
+    initial_cost = cost
+    best = snapshot(cost)
+    max_step = connection_cable_max_length / 2
+
+    # The initial temperature accepts an average uphill move with a
+    # probability of 50%.
+    if initial_temperature is None:
+        uphill = []
+        for _ in range(200):
+            proposal = propose(rng.choice(MOVES, p=MOVE_PROBABILITIES), max_step)
+            if (proposal is not None) and (proposal[0] > 0):
+                uphill.append(proposal[0])
+        initial_temperature = np.mean(uphill) / np.log(2) if len(uphill) > 0 else 1.0
+
+    trace = []
+    moves = rng.choice(MOVES, size=n_iterations, p=MOVE_PROBABILITIES)
+    for iteration in range(n_iterations):
+        share = iteration / n_iterations
+        temperature = initial_temperature * final_temperature_ratio**share
+        step = max(max_step * temperature / initial_temperature, 0.5)
+
+        proposal = propose(moves[iteration], step)
+        if proposal is not None:
+            delta, apply = proposal
+            if (delta <= 0) or (rng.random() < np.exp(-delta / temperature)):
+                apply()
+                cost += delta
+                if cost < best["cost"]:
+                    best = snapshot(cost)
+
+        if (iteration + 1) % refresh_interval == 0:
+            neighbours, cost = build_tree()
+            if cost < best["cost"]:
+                best = snapshot(cost)
+
+        if ((iteration + 1) % refresh_interval == 0) or (
+            (iteration + 1) % trace_interval == 0
+        ):
+            trace.append([iteration + 1, float(temperature), float(cost), best["cost"]])
+
+    # The best layout is evaluated again with the tree of its own poles.
+    best["cost"] = pole_layout_cost(
+        consumers,
+        best["poles"],
+        best["labels"],
+        create_tree(best["poles"]),
+        epc_connection_cable,
+        epc_distribution_cable,
+        epc_pole,
+        distribution_cable_max_length,
+    )
+    best["initial_cost"] = initial_cost
+    best["trace"] = trace
+
+    return best
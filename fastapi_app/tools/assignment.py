@@ -0,0 +1,349 @@
+import heapq
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
+
+# number of nearest poles considered for each consumer
+N_NEIGHBOURS = 8
+
+# maximum size of the cost matrix (consumers x connection slots) for which
+# the exact assignment is computed
+MAX_EXACT_SIZE = 4e6
+
+
+def assignment_cost(consumers, poles, labels):
+    """
+    Calculates the total length of all connections between consumers and
+    their assigned poles.
+
+    Parameters
+    ----------
+    consumers (numpy.ndarray):
+        (x,y) coordinates of the consumers.
+    poles (numpy.ndarray):
+        (x,y) coordinates of the poles.
+    labels (numpy.ndarray):
+        index of the pole assigned to each consumer.
+
+    Output
+    ------
+    (float): sum of the distances between consumers and poles.
+    """
+    return float(np.sqrt(((consumers - poles[labels]) ** 2).sum(axis=1)).sum())
+
+
+def regret_assignment(consumers, poles, capacity, n_neighbours=N_NEIGHBOURS):
+    """
+    Assigns each consumer to a pole without exceeding the capacity of the
+    poles using a regret-based greedy heuristic.
+
+    Consumers are assigned in order of their regret, i.e., the additional
+    distance they would have to cover if their nearest pole with a free
+    connection was not available anymore. Only the nearest poles are
+    considered, and the neighbourhood is enlarged for consumers whose
+    nearest poles are all full.
+
+    Parameters
+    ----------
+    consumers (numpy.ndarray):
+        (x,y) coordinates of the consumers.
+    poles (numpy.ndarray):
+        (x,y) coordinates of the poles.
+    capacity (int or numpy.ndarray):
+        maximum number of consumers for all or for each pole.
+    n_neighbours (int):
+        number of nearest poles initially considered for each consumer.
+
+    Output
+    ------
+    (numpy.ndarray): index of the pole assigned to each consumer.
+    """
+    n_consumers = consumers.shape[0]
+    n_poles = poles.shape[0]
+    free = np.broadcast_to(capacity, (n_poles,)).astype(int).copy()
+    if free.sum() < n_consumers:
+        raise ValueError(
+            f"the poles can only serve {free.sum()} of {n_consumers} consumers"
+        )
+
+    tree = cKDTree(poles)
+    k = min(n_neighbours, n_poles)
+    distances, neighbours = tree.query(consumers, k=k)
+    distances = distances.reshape(n_consumers, k)
+    neighbours = neighbours.reshape(n_consumers, k)
+    candidates = [None] * n_consumers
+
+    def regret(consumer):
+        """
+        Returns the regret and the nearest pole with free connections.
+        """
+        if candidates[consumer] is None:
+            candidates[consumer] = (distances[consumer], neighbours[consumer])
+        consumer_distances, consumer_poles = candidates[consumer]
+        is_free = free[consumer_poles] > 0
+
+        # Enlarge the neighbourhood if less than two poles are free.
+        while (is_free.sum() < 2) and (len(consumer_poles) < n_poles):
+            consumer_distances, consumer_poles = tree.query(
+                consumers[consumer], k=min(2 * len(consumer_poles), n_poles)
+            )
+            candidates[consumer] = (consumer_distances, consumer_poles)
+            is_free = free[consumer_poles] > 0
+
+        free_distances = consumer_distances[is_free]
+        if len(free_distances) < 2:
+            return np.inf, consumer_poles[is_free][0]
+        return free_distances[1] - free_distances[0], consumer_poles[is_free][0]
+
+    heap = []
+    for consumer in range(n_consumers):
+        consumer_regret, pole = regret(consumer)
+        heap.append((-consumer_regret, consumer, pole))
+    heapq.heapify(heap)
+
+    labels = np.full(n_consumers, -1)
+    while len(heap) > 0:
+        _, consumer, pole = heapq.heappop(heap)
+
+        # If the preferred pole is full in the meantime, the regret of the
+        # consumer is updated and the consumer is queued again.
+        if free[pole] == 0:
+            consumer_regret, pole = regret(consumer)
+            heapq.heappush(heap, (-consumer_regret, consumer, pole))
+            continue
+
+        labels[consumer] = pole
+        free[pole] -= 1
+
+    return labels
+
+
+def swap_repair(
+    consumers, poles, labels, capacity, n_neighbours=N_NEIGHBOURS, max_rounds=10
+):
+    """
+    Improves an assignment of consumers to poles by moving consumers to
+    closer poles with free connections, or by swapping them with a consumer
+    of a closer pole.
+
+    Parameters
+    ----------
+    consumers (numpy.ndarray):
+        (x,y) coordinates of the consumers.
+    poles (numpy.ndarray):
+        (x,y) coordinates of the poles.
+    labels (numpy.ndarray):
+        index of the pole assigned to each consumer, which is improved in
+        place.
+    capacity (int or numpy.ndarray):
+        maximum number of consumers for all or for each pole.
+    n_neighbours (int):
+        number of nearest poles considered for each consumer.
+    max_rounds (int):
+        maximum number of passes over all consumers.
+
+    Output
+    ------
+    (numpy.ndarray): improved index of the pole assigned to each consumer.
+    """
+    n_poles = poles.shape[0]
+    capacity = np.broadcast_to(capacity, (n_poles,))
+    k = min(n_neighbours, n_poles)
+    distances, neighbours = cKDTree(poles).query(consumers, k=k)
+    distances = distances.reshape(-1, k)
+    neighbours = neighbours.reshape(-1, k)
+
+    load = np.bincount(labels, minlength=n_poles)
+    members = [set() for _ in range(n_poles)]
+    for consumer, pole in enumerate(labels):
+        members[pole].add(consumer)
+
+    def distance(consumer, pole):
+        return np.sqrt(((consumers[consumer] - poles[pole]) ** 2).sum(axis=-1))
+
+    for _ in range(max_rounds):
+        improved = False
+        for consumer in range(consumers.shape[0]):
+            current = labels[consumer]
+            current_distance = distance(consumer, current)
+            for pole, pole_distance in zip(neighbours[consumer], distances[consumer]):
+                # The neighbours are sorted by distance, so that no closer
+                # pole can be found anymore.
+                if pole_distance >= current_distance - 1e-9:
+                    break
+
+                if load[pole] < capacity[pole]:
+                    partner = None
+                else:
+                    # Swap with the consumer of the closer pole, which gives
+                    # the largest reduction of the total length.
+                    others = np.fromiter(members[pole], dtype=int)
+                    gain = (
+                        current_distance
+                        + distance(others, pole)
+                        - pole_distance
+                        - distance(others, current)
+                    )
+                    if gain.max() <= 1e-9:
+                        continue
+                    partner = others[np.argmax(gain)]
+
+                members[current].remove(consumer)
+                members[pole].add(consumer)
+                labels[consumer] = pole
+                if partner is None:
+                    load[current] -= 1
+                    load[pole] += 1
+                else:
+                    members[pole].remove(partner)
+                    members[current].add(partner)
+                    labels[partner] = current
+                improved = True
+                break
+
+        if not improved:
+            break
+
+    return labels
+
+
+def greedy_assignment(consumers, poles, capacity):
+    """
+    Assigns consumers to capacitated poles using the regret-based greedy
+    heuristic followed by the swap repair.
+
+    Parameters
+    ----------
+    consumers (numpy.ndarray):
+        (x,y) coordinates of the consumers.
+    poles (numpy.ndarray):
+        (x,y) coordinates of the poles.
+    capacity (int or numpy.ndarray):
+        maximum number of consumers for all or for each pole.
+
+    Output
+    ------
+    (numpy.ndarray): index of the pole assigned to each consumer.
+    """
+    labels = regret_assignment(consumers, poles, capacity)
+    return swap_repair(consumers, poles, labels, capacity)
+
+
+def exact_assignment(consumers, poles, capacity):
+    """
+    Finds the assignment of consumers to capacitated poles with the minimum
+    total connection length, by solving a linear sum assignment problem with
+    one column for each connection slot of the poles.
+
+    Parameters
+    ----------
+    consumers (numpy.ndarray):
+        (x,y) coordinates of the consumers.
+    poles (numpy.ndarray):
+        (x,y) coordinates of the poles.
+    capacity (int or numpy.ndarray):
+        maximum number of consumers for all or for each pole.
+
+    Output
+    ------
+    (numpy.ndarray): index of the pole assigned to each consumer.
+    """
+    n_poles = poles.shape[0]
+    slots = np.repeat(
+        np.arange(n_poles),
+        np.minimum(np.broadcast_to(capacity, (n_poles,)), consumers.shape[0]),
+    )
+    if consumers.shape[0] * len(slots) > MAX_EXACT_SIZE:
+        raise ValueError("the assignment problem is too large to be solved exactly")
+
+    rows, cols = linear_sum_assignment(cdist(consumers, poles)[:, slots])
+    labels = np.full(consumers.shape[0], -1)
+    labels[rows] = slots[cols]
+
+    return labels
+
+
+def assignment_gap(consumers, poles, capacity, labels):
+    """
+    Compares an assignment with the exact solution, or with a lower bound
+    if the problem is too large to be solved exactly. The lower bound is the
+    total distance of all consumers to their nearest pole, ignoring the
+    capacity of the poles.
+
+    Parameters
+    ----------
+    consumers (numpy.ndarray):
+        (x,y) coordinates of the consumers.
+    poles (numpy.ndarray):
+        (x,y) coordinates of the poles.
+    capacity (int or numpy.ndarray):
+        maximum number of consumers for all or for each pole.
+    labels (numpy.ndarray):
+        index of the pole assigned to each consumer.
+
+    Output
+    ------
+    (dict): objective of the assignment, the reference value, the type of
+        the reference ('exact' or 'lower_bound') and the relative gap.
+    """
+    objective = assignment_cost(consumers, poles, labels)
+    try:
+        reference = assignment_cost(
+            consumers, poles, exact_assignment(consumers, poles, capacity)
+        )
+        reference_type = "exact"
+    except ValueError:
+        reference = float(cKDTree(poles).query(consumers, k=1)[0].sum())
+        reference_type = "lower_bound"
+
+    return {
+        "objective": objective,
+        "reference": reference,
+        "reference_type": reference_type,
+        "gap": (objective - reference) / reference if reference > 0 else 0.0,
+    }
+
+
+def capacitated_kmeans(consumers, centers, capacity, max_iter=30, tol=1e-4):
+    """
+    k-means clustering with a maximum size for each cluster, which uses the
+    greedy assignment instead of a min-cost-flow problem in each iteration.
+
+    Parameters
+    ----------
+    consumers (numpy.ndarray):
+        (x,y) coordinates of the consumers.
+    centers (numpy.ndarray):
+        initial (x,y) coordinates of the cluster centers.
+    capacity (int or numpy.ndarray):
+        maximum number of consumers in all or in each cluster.
+    max_iter (int):
+        maximum number of iterations.
+    tol (float):
+        maximum movement of the centers [m] for the clustering to converge.
+
+    Output
+    ------
+    (numpy.ndarray, numpy.ndarray): coordinates of the cluster centers and
+        the cluster label of each consumer.
+    """
+    centers = np.array(centers, dtype=float)
+    for _ in range(max_iter):
+        labels = greedy_assignment(consumers, centers, capacity)
+
+        # Empty clusters keep their previous center.
+        size = np.bincount(labels, minlength=centers.shape[0])
+        new_centers = centers.copy()
+        for axis in range(centers.shape[1]):
+            sums = np.bincount(
+                labels, weights=consumers[:, axis], minlength=centers.shape[0]
+            )
+            new_centers[size > 0, axis] = sums[size > 0] / size[size > 0]
+
+        shift = np.sqrt(((new_centers - centers) ** 2).sum(axis=1)).max()
+        centers = new_centers
+        if shift <= tol:
+            break
+
+    return centers, greedy_assignment(consumers, centers, capacity)
@@ -0,0 +1,321 @@
+"""
+Export of the database tables (*.csv files) into *.xlsx, Parquet, Arrow IPC
+and GeoJSON files.
+
+The rows are streamed from the *.csv files in chunks into the writers, so
+that the memory does not grow with the size of the project. Each export is
+stored in a folder of its project under the hash of its content, so that
+an unchanged project is not exported again and a download always returns a
+complete file.
+
+The Parquet and Arrow IPC files are written by `pyarrow`, which is listed
+in the requirements, but the other formats are exported without it. Its
+*.csv reader converts the files into record batches, which are written as
+they are without creating DataFrames.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import uuid
+
+import numpy as np
+import orjson
+import pandas as pd
+
+from fastapi_app.tools.io import make_folder
+from fastapi_app.tools.lazy import LazyModule
+
+openpyxl = LazyModule("openpyxl")
+pa = LazyModule("pyarrow")
+pa_csv = LazyModule("pyarrow.csv")
+pa_ipc = LazyModule("pyarrow.ipc")
+pa_parquet = LazyModule("pyarrow.parquet")
+
+# number of rows read from the *.csv files at once
+CHUNK_SIZE = 10000
+
+# number of exports kept in the folder of each project
+N_KEPT_EXPORTS = 3
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# media types of the columnar and geographic exports
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+    "geojson": "application/geo+json",
+}
+
+# size of the blocks read by the *.csv reader of pyarrow [bytes]. The types
+# of the columns are inferred from the first block.
+ARROW_BLOCK_SIZE = 1 << 22
+
+
+# --------------------------- PATHS --------------------------- #
+
+
+def project_slug(project_name):
+    """
+    Converts the name of a project into a name which can be used in paths.
+    """
+    slug = re.sub(r"[^a-z0-9]+", "-", str(project_name).lower()).strip("-")
+    return slug or "project"
+
+
+def content_hash(paths, settings=None):
+    """
+    Hashes the content of the given files and settings, which determine the
+    content of an export.
+
+    Parameters
+    ----------
+    paths (list):
+        paths of the exported files. Missing files are hashed as empty.
+    settings (dict):
+        JSON serializable settings, which are exported as well.
+
+    Output
+    ------
+    (str): the first 16 hexadecimal digits of the SHA-256 hash.
+    """
+    sha256 = hashlib.sha256()
+    for path in paths:
+        sha256.update(os.path.basename(path).encode())
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    sha256.update(block)
+        sha256.update(b"\0")
+    sha256.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return sha256.hexdigest()[:16]
+
+
+def export_path(folder, project_name, export_hash, extension, table=None):
+    """
+    Returns the path of an export in the folder of its project. Exports of
+    single tables are stored in a subfolder named after the table.
+    """
+    project_folder = os.path.join(folder, project_slug(project_name))
+    if table is not None:
+        project_folder = os.path.join(project_folder, table)
+    return os.path.join(project_folder, f"{export_hash}.{extension}").replace(
+        "\\", "/"
+    )
+
+
+def latest_export(folder, project_name, extension):
+    """
+    Returns the path of the latest complete export of a project, or None if
+    there is none.
+    """
+    project_folder = os.path.join(folder, project_slug(project_name))
+    if not os.path.isdir(project_folder):
+        return None
+    exports = [
+        os.path.join(project_folder, file_name).replace("\\", "/")
+        for file_name in os.listdir(project_folder)
+        if file_name.endswith(f".{extension}")
+    ]
+    return max(exports, key=os.path.getmtime, default=None)
+
+
+def remove_old_exports(path, n_kept=N_KEPT_EXPORTS):
+    """
+    Removes all but the latest exports with the same extension in the folder
+    of the given export.
+    """
+    folder = os.path.dirname(path)
+    extension = os.path.splitext(path)[1]
+    exports = sorted(
+        (
+            os.path.join(folder, file_name)
+            for file_name in os.listdir(folder)
+            if file_name.endswith(extension)
+        ),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for old_export in exports[n_kept:]:
+        os.remove(old_export)
+
+
+# -------------------------- READING -------------------------- #
+
+
+def read_csv_chunks(path, chunk_size=CHUNK_SIZE):
+    """
+    Reads a *.csv file in chunks of rows.
+
+    Output
+    ------
+    (generator): DataFrames with at most `chunk_size` rows. Nothing is
+        yielded if the file is missing or has no header.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def csv_rows(path, chunk_size=CHUNK_SIZE):
+    """
+    Streams the header and the rows of a *.csv file.
+
+    Output
+    ------
+    (generator): the column names as the first tuple and the values of one
+        row with missing values as None as the following tuples.
+    """
+    is_first_chunk = True
+    for chunk in read_csv_chunks(path, chunk_size):
+        if is_first_chunk:
+            yield tuple(chunk.columns)
+            is_first_chunk = False
+        values = chunk.to_numpy(dtype=object)
+        values[pd.isna(values)] = None
+        for row in values:
+            yield tuple(
+                value.item() if isinstance(value, np.generic) else value
+                for value in row
+            )
+
+
+# -------------------------- WRITING -------------------------- #
+
+
+def write_xlsx(path, sheets):
+    """
+    Writes rows into an *.xlsx file with constant memory, using the
+    write-only mode of openpyxl. The file only appears at the given path
+    after it has been written completely.
+
+    Parameters
+    ----------
+    path (str):
+        path of the *.xlsx file.
+    sheets (dict):
+        names of the sheets as keys and iterables of rows as values.
+    """
+    make_folder(os.path.dirname(path))
+    workbook = openpyxl.Workbook(write_only=True)
+    for sheet_name, rows in sheets.items():
+        sheet = workbook.create_sheet(title=sheet_name)
+        for row in rows:
+            sheet.append(row)
+
+    temporary_path = f"{path}.tmp"
+    workbook.save(temporary_path)
+    os.replace(temporary_path, path)
+
+
+# --------------------- COLUMNAR FORMATS --------------------- #
+
+
+def arrow_available():
+    """
+    Checks if `pyarrow` is installed without importing it.
+    """
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def arrow_batches(path):
+    """
+    Opens a streaming reader of a *.csv file, which yields record batches.
+    """
+    return pa_csv.open_csv(
+        path, read_options=pa_csv.ReadOptions(block_size=ARROW_BLOCK_SIZE)
+    )
+
+
+def write_columnar(path, csv_path, file_format):
+    """
+    Converts a *.csv file into a Parquet or Arrow IPC file batch by batch.
+    The file only appears at the given path after it has been written
+    completely.
+
+    Parameters
+    ----------
+    path (str):
+        path of the exported file.
+    csv_path (str):
+        path of the *.csv file.
+    file_format (str):
+        'parquet' or 'arrow'.
+    """
+    if file_format not in ["parquet", "arrow"]:
+        raise ValueError(f"unknown columnar format '{file_format}'")
+
+    def write_batches(batches, schema):
+        if file_format == "parquet":
+            writer = pa_parquet.ParquetWriter(temporary_path, schema)
+        else:
+            writer = pa_ipc.new_file(temporary_path, schema)
+        with writer:
+            for batch in batches:
+                writer.write_batch(batch)
+
+    make_folder(os.path.dirname(path))
+    # the same table may be exported by several requests at once
+    temporary_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        reader = arrow_batches(csv_path)
+        write_batches(reader, reader.schema)
+    except pa.ArrowInvalid:
+        # the types inferred from the first block do not fit the following
+        # ones (e.g. a column which is empty at first), so the types are
+        # inferred from the whole file
+        table = pa_csv.read_csv(csv_path)
+        write_batches(table.to_batches(), table.schema)
+    os.replace(temporary_path, path)
+
+
+# ------------------------- GEOJSON ------------------------- #
+
+
+def geojson_geometries(chunk, table):
+    """
+    Returns the GeoJSON geometries of the nodes (points) or links (lines)
+    in a chunk of their *.csv file.
+    """
+    if table == "nodes":
+        coordinates = chunk[["longitude", "latitude"]].to_numpy().tolist()
+        return [
+            {"type": "Point", "coordinates": coordinate}
+            for coordinate in coordinates
+        ]
+    if table == "links":
+        coordinates = chunk[["lon_from", "lat_from", "lon_to", "lat_to"]].to_numpy()
+        return [
+            {"type": "LineString", "coordinates": [row[:2], row[2:]]}
+            for row in coordinates.tolist()
+        ]
+    raise ValueError(f"the table '{table}' has no geometries")
+
+
+def geojson_chunks(path, table, chunk_size=CHUNK_SIZE):
+    """
+    Streams the nodes or links of a *.csv file as a GeoJSON feature
+    collection. All columns are written as properties of the features.
+
+    Output
+    ------
+    (generator): encoded parts of the GeoJSON file.
+    """
+    yield b'{"type":"FeatureCollection","features":['
+    separator = b""
+    for chunk in read_csv_chunks(path, chunk_size):
+        geometries = geojson_geometries(chunk, table)
+        # `orjson` writes NaN as null
+        properties = chunk.to_dict(orient="records")
+        features = b",".join(
+            orjson.dumps(
+                {"type": "Feature", "geometry": geometry, "properties": row},
+                option=orjson.OPT_SERIALIZE_NUMPY,
+            )
+            for geometry, row in zip(geometries, properties)
+        )
+        if features:
+            yield separator + features
+            separator = b","
+    yield b"]}"
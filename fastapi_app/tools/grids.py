@@ -1,11 +1,33 @@
 from operator import inv, length_hint
-from turtle import distance
 import numpy as np
 import pandas as pd
 from fastapi_app.tools.io import make_folder
 from configparser import ConfigParser
+import functools
 import os
-from pyproj import Proj
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import breadth_first_order
+from fastapi_app.tools.node_store import coordinate_keys
+from fastapi_app.tools.profiling import timed
+from fastapi_app.tools.lazy import LazyModule
+from fastapi_app.tools.snapshots import read_snapshot, write_snapshot
+
+# pyproj is only imported when coordinates are first projected
+pyproj = LazyModule("pyproj")
+
+
+@functools.lru_cache(maxsize=None)
+def utm_projection():
+    """
+    Returns the projection of (longitude, latitude) coordinates into the
+    (x, y) plane coordinates of the grids, which is only created once per
+    process.
+    """
+    return pyproj.Proj(proj="utm", zone=32, ellps="WGS84", preserve_units=False)
+
+
+# standard cross-section areas of the cables [mm²]
+CABLE_SECTIONS = [1.5, 2.5, 4, 6, 10, 16, 25, 35, 50, 70, 95, 120]
 
 
 class Grid:
@@ -72,6 +94,10 @@ class Grid:
     voltage: float
         the nominal (minimum) voltage that must be delivered to each consumer [V].
 
+    max_voltage_drop: float
+        the maximum allowed voltage drop between the power house and each
+        consumer, as a share of the nominal voltage [%].
+
     cables: :class:`pandas.core.frame.DataFrame`
         a panda dataframe including the following characteristics of
         the 'distribution' and 'connection' cables:
@@ -101,6 +127,7 @@ class Grid:
                 "how_added": pd.Series([], dtype=str),
                 "type_fixed": pd.Series([], dtype=bool),
                 "cluster_label": pd.Series([], dtype=np.dtype(int)),
+                "segment": pd.Series([], dtype=str),
                 "n_connection_links": pd.Series([], dtype=np.dtype(str)),
                 "n_distribution_links": pd.Series([], dtype=np.dtype(int)),
                 "parent": pd.Series([], dtype=np.dtype(str)),
@@ -125,6 +152,7 @@ class Grid:
                 "total_power": pd.Series([], dtype=int),
                 "from_node": pd.Series([], dtype=str),
                 "to_node": pd.Series([], dtype=str),
+                "section_area": pd.Series([], dtype=np.dtype(float)),
             }
         ).set_index("label"),
         epc_distribution_cable=2,  # per meter
@@ -134,6 +162,7 @@ class Grid:
         pole_max_connection=0,
         max_current=10,  # [A]
         voltage=230,  # [V]
+        max_voltage_drop=10,  # [%]
         grid_mst=pd.DataFrame({}, dtype=np.dtype(float)),
         cables=pd.DataFrame(
             {
@@ -152,6 +181,7 @@ class Grid:
         self.pole_max_connection = pole_max_connection
         self.max_current = max_current
         self.voltage = voltage
+        self.max_voltage_drop = max_voltage_drop
         self.cables = cables
         self.grid_mst = grid_mst
         self.epc_distribution_cable = epc_distribution_cable  # per meter
@@ -267,72 +297,137 @@ class Grid:
         # else:
         #     return ""
 
+    @timed("grid.add_fixed_poles_on_long_links")
     def add_fixed_poles_on_long_links(
         self,
         long_links,
         max_allowed_distance,
     ):
+        """
+        Places fixed poles on the given links, so that the distance between
+        the poles along the links does not exceed the maximum allowed
+        distance.
 
-        for long_link in long_links:
-            # Get start and end coordinates of the long link.
-            x_from = self.links.x_from[long_link]
-            x_to = self.links.x_to[long_link]
-            y_from = self.links.y_from[long_link]
-            y_to = self.links.y_to[long_link]
+        Parameters
+        ----------
+        long_links: list
+            labels of the links longer than the maximum allowed distance
+        max_allowed_distance: float
+            maximum allowed distance between two poles [m]
 
-            # Calculate the number of additional poles required.
-            n_required_poles = int(
-                np.ceil(self.links.length[long_link] / max_allowed_distance) - 1
-            )
+        Notes
+        -----
+        In adding the poles, the `how_added` attribute is the label of the
+        long link, to distinguish them from the poles which are already
+        `connected` to the grid. The poles in this stage are only placed on
+        the line, and will be connected to the other poles using another
+        function.
+        """
+        links = self.links.loc[list(long_links)]
+        self.add_fixed_poles_on_lines(
+            start=links[["x_from", "y_from"]].values,
+            end=links[["x_to", "y_to"]].values,
+            max_allowed_distance=max_allowed_distance,
+            how_added=links.index.values,
+        )
 
-            # Get the index of the last pole in the grid. The new pole's index
-            # will start from this index.
-            last_pole = self.poles().index[-1]
-            # Split the pole's index using `-` as the separator, because poles
-            # are labeled in `p-x` format. x represents the index number, which
-            # must be an integer.
-            index_last_pole = int(last_pole.split("-")[1])
-
-            # Calculate the slope of the line, connecting the start and end
-            # points of the long link.
-            slope = (y_to - y_from) / (x_to - x_from)
-
-            # Calculate the final length of the smaller links after splitting
-            # the long links into smaller parts.
-            length_smaller_links = self.links.length[long_link] / (n_required_poles + 1)
-
-            # Add all poles between the start and end points of the long link.
-            for i in range(1, n_required_poles + 1):
-                x = x_from + np.sign(
-                    x_to - x_from
-                ) * i * length_smaller_links * np.sqrt(1 / (1 + slope**2))
-                y = y_from + np.sign(y_to - y_from) * i * length_smaller_links * abs(
-                    slope
-                ) * np.sqrt(1 / (1 + slope**2))
-
-                pole_label = f"p-{i+index_last_pole}"
-
-                # In adding the pole, the `how_added` attribute is considerd
-                # `long-distance-init`, which means the pole is added because
-                # of long distance in a distribution link.
-                # The reason for using the `long_link` part is to distinguish
-                # it with the poles which are already `connected` to the grid.
-                # The poles in this stage are only placed on the line, and will
-                # be connected to the other poles using another function.
-                # The `cluster_label` is given as 1000, to avoid inclusion in
-                # other clusters.
-                self.add_node(
-                    label=pole_label,
-                    x=x,
-                    y=y,
-                    node_type="pole",
-                    consumer_type="n.a.",
-                    consumer_detail="n.a.",
-                    is_connected=True,
-                    how_added=long_link,
-                    type_fixed=True,
-                    cluster_label=1000,
-                )
+    def add_fixed_poles_on_lines(self, start, end, max_allowed_distance, how_added):
+        """
+        Places the minimum number of equally spaced fixed poles between the
+        start and end points of each line, so that the distance between two
+        consecutive points on the line does not exceed the maximum allowed
+        distance.
+
+        Parameters
+        ----------
+        start: numpy.ndarray
+            (x,y) coordinates of the start points of the lines
+        end: numpy.ndarray
+            (x,y) coordinates of the end points of the lines
+        max_allowed_distance: float
+            maximum allowed distance between two poles [m]
+        how_added: str or array-like
+            `how_added` tag of the poles of all lines or of each line
+
+        Returns
+        -------
+        labels: numpy.ndarray
+            labels of the added poles, ordered by line and from the start
+            to the end of each line
+        n_added_poles: numpy.ndarray
+            number of poles added on each line
+
+        Notes
+        -----
+        The poles only get (x,y) coordinates, and the `cluster_label` is
+        given as 1000, to avoid inclusion in other clusters.
+        """
+        start = np.asarray(start, dtype=float).reshape(-1, 2)
+        end = np.asarray(end, dtype=float).reshape(-1, 2)
+        n_lines = start.shape[0]
+        length = np.sqrt(((end - start) ** 2).sum(axis=1))
+        n_added_poles = np.maximum(
+            np.ceil(length / max_allowed_distance).astype(int) - 1, 0
+        )
+
+        # Line of each new pole and its position on the line (1, 2, ...),
+        # which gives its share of the distance between start and end.
+        line = np.repeat(np.arange(n_lines), n_added_poles)
+        position = (
+            np.arange(len(line))
+            - np.repeat(np.cumsum(n_added_poles) - n_added_poles, n_added_poles)
+            + 1
+        )
+        share = (position / (n_added_poles[line] + 1))[:, np.newaxis]
+        coordinates = start[line] + share * (end[line] - start[line])
+
+        next_pole = self.get_next_pole_id()
+        labels = np.array(
+            [f"p-{i}" for i in range(next_pole, next_pole + len(line))], dtype=object
+        )
+        poles = pd.DataFrame(
+            {
+                "latitude": 0.0,
+                "longitude": 0.0,
+                "x": coordinates[:, 0],
+                "y": coordinates[:, 1],
+                "node_type": "pole",
+                "consumer_type": "n.a.",
+                "consumer_detail": "n.a.",
+                "surface_area": 0.0,
+                "peak_demand": 0.0,
+                "average_consumption": 0.0,
+                "distance_to_load_center": 0.0,
+                "is_connected": True,
+                "how_added": np.broadcast_to(
+                    np.asarray(how_added, dtype=object), (n_lines,)
+                )[line],
+                "type_fixed": True,
+                "cluster_label": 1000,
+                "segment": "0",
+                "n_connection_links": "0",
+                "n_distribution_links": 0,
+                "parent": "unknown",
+                "distribution_cost": 0.0,
+            },
+            index=pd.Index(labels, name=self.nodes.index.name),
+        )
+        if len(labels) > 0:
+            self.nodes = pd.concat([self.nodes, poles[self.nodes.columns]])
+
+        return labels, n_added_poles
+
+    def get_next_pole_id(self):
+        """
+        Returns the number following the largest number of all poles labeled
+        in the `p-x` format, from which the labels of new poles are counted.
+        """
+        poles = self.poles()
+        if poles.shape[0] == 0:
+            return 0
+        pole_ids = poles.index.astype(str).str.extract(r"^p-(\d+)$", expand=False)
+        pole_ids = pole_ids.dropna()
+        return int(pole_ids.astype(int).max()) + 1 if len(pole_ids) > 0 else 0
 
     def add_node(
         self,
@@ -352,6 +447,7 @@ class Grid:
         how_added="automatic",
         type_fixed=False,
         cluster_label=0,
+        segment="0",
         n_connection_links="0",
         n_distribution_links=0,
         parent="unknown",
@@ -380,6 +476,7 @@ class Grid:
         self.nodes.at[label, "how_added"] = how_added
         self.nodes.at[label, "type_fixed"] = type_fixed
         self.nodes.at[label, "cluster_label"] = cluster_label
+        self.nodes.at[label, "segment"] = segment
         self.nodes.at[label, "n_connection_links"] = n_connection_links
         self.nodes.at[label, "n_distribution_links"] = n_distribution_links
         self.nodes.at[label, "parent"] = parent
@@ -433,6 +530,52 @@ class Grid:
             | (self.nodes["node_type"] == "power-house")
         ]
 
+    def find_consumer_delta(self, nodes):
+        """
+        Compares the consumers of the grid with a set of consumers from the
+        database using their rounded coordinates.
+
+        The demand of the consumers existing in both sets is updated with the
+        values given in `nodes`.
+
+        Parameters
+        ----------
+        nodes: :class:`pandas.core.frame.DataFrame`
+            consumers which must be served by the grid, including at least
+            'latitude', 'longitude', 'peak_demand', 'average_consumption' and
+            'surface_area' columns
+
+        Returns
+        -------
+        added_nodes: :class:`pandas.core.frame.DataFrame`
+            rows of `nodes` which are not yet part of the grid
+        removed_nodes: list
+            labels of the grid consumers which are not in `nodes` anymore
+        """
+        consumers = self.consumers()
+        grid_keys = coordinate_keys(consumers["latitude"], consumers["longitude"])
+        node_keys = coordinate_keys(nodes["latitude"], nodes["longitude"])
+        node_position = {key: position for position, key in enumerate(node_keys)}
+
+        grid_labels = dict(zip(grid_keys, consumers.index))
+
+        removed_nodes = [
+            label
+            for label, key in zip(consumers.index, grid_keys)
+            if key not in node_position
+        ]
+        added_nodes = nodes[[key not in grid_labels for key in node_keys]]
+
+        # Update the demand of the consumers that are kept in the grid.
+        matched = [key for key in node_keys if key in grid_labels]
+        if len(matched) > 0:
+            labels = [grid_labels[key] for key in matched]
+            positions = [node_position[key] for key in matched]
+            for column in ["peak_demand", "average_consumption", "surface_area"]:
+                self.nodes.loc[labels, column] = nodes[column].values[positions]
+
+        return added_nodes, removed_nodes
+
     def distance_between_nodes(self, label_node_1: str, label_node_2: str):
         """
         Returns the distance between two nodes of the grid
@@ -477,23 +620,13 @@ class Grid:
         """
         Removes all links from the grid.
         """
-        self.links = self.get_links().drop(
-            [label for label in self.get_links().index], axis=0
-        )
+        self.links = self.links.iloc[0:0]
 
     def clear_links(self, link_type):
         """
         Removes all link types given by the user from the grid.
         """
-        self.links = self.get_links().drop(
-            [
-                label
-                for label in self.get_links()[
-                    self.get_links()["link_type"] == link_type
-                ].index
-            ],
-            axis=0,
-        )
+        self.links = self.links[self.links["link_type"] != link_type]
 
     def remove_link(self, index):
         """
@@ -551,9 +684,156 @@ class Grid:
         self.links.at[label, "length"] = length
         self.links.at[label, "n_consumers"] = 0
         self.links.at[label, "total_power"] = 0
-        self.links.at[label, "from_node"] = ""
-        self.links.at[label, "to_node"] = ""
+        self.links.at[label, "from_node"] = label_node_from
+        self.links.at[label, "to_node"] = label_node_to
+
+    def add_links_bulk(self, label_node_from, label_node_to, link_type=None):
+        """
+        Adds many links at once between the given pairs of nodes and
+        calculates their lengths.
+
+        Parameters
+        ----------
+        label_node_from: array-like
+            labels of the first nodes
+        label_node_to: array-like
+            labels of the second nodes
+        link_type: str (optional)
+            type of all links ('connection' or 'distribution'). If not given,
+            links between two poles are 'distribution' links and all other
+            links are 'connection' links.
+
+        Notes
+        -----
+        As in `add_links`, the labels of two connected poles are sorted, and
+        existing links with the same label are replaced.
+        """
+        label_node_from = np.asarray(label_node_from, dtype=object)
+        label_node_to = np.asarray(label_node_to, dtype=object)
+
+        if link_type is None:
+            is_distribution = (
+                self.nodes["node_type"].reindex(label_node_from).values == "pole"
+            ) & (self.nodes["node_type"].reindex(label_node_to).values == "pole")
+        else:
+            is_distribution = np.full(len(label_node_from), link_type == "distribution")
+
+        # convention: if two poles are getting connected, the begining will be
+        # the one with lower number
+        is_swapped = is_distribution & (label_node_from > label_node_to)
+        label_node_from, label_node_to = (
+            np.where(is_swapped, label_node_to, label_node_from),
+            np.where(is_swapped, label_node_from, label_node_to),
+        )
+
+        nodes_from = self.nodes.loc[label_node_from]
+        nodes_to = self.nodes.loc[label_node_to]
+        links = pd.DataFrame(
+            {
+                "lat_from": nodes_from["latitude"].values,
+                "lon_from": nodes_from["longitude"].values,
+                "lat_to": nodes_to["latitude"].values,
+                "lon_to": nodes_to["longitude"].values,
+                "x_from": nodes_from["x"].values,
+                "y_from": nodes_from["y"].values,
+                "x_to": nodes_to["x"].values,
+                "y_to": nodes_to["y"].values,
+                "link_type": np.where(is_distribution, "distribution", "connection"),
+                "length": np.sqrt(
+                    (nodes_from["x"].values - nodes_to["x"].values) ** 2
+                    + (nodes_from["y"].values - nodes_to["y"].values) ** 2
+                ),
+                "n_consumers": 0,
+                "total_power": 0,
+                "from_node": label_node_from,
+                "to_node": label_node_to,
+            },
+            index=pd.Index(
+                [f"({a}, {b})" for a, b in zip(label_node_from, label_node_to)],
+                name="label",
+                dtype=object,
+            ),
+        )
+
+        self.links = pd.concat(
+            [self.links[~self.links.index.isin(links.index)], links]
+        )
+
+    def set_link_ends(self):
+        """
+        Fills the `from_node` and `to_node` columns of links which were not
+        created by `add_links` or `add_links_bulk`, e.g., links imported from
+        the database, by splitting their labels into two parts.
+        """
+        is_missing = (
+            self.links["from_node"].isna()
+            | self.links["to_node"].isna()
+            | (self.links["from_node"] == "")
+            | (self.links["to_node"] == "")
+        )
+        if not is_missing.any():
+            return
+
+        link_ends = self.links.index[is_missing].str.extract(r"\((.*), (.*)\)")
+        self.links.loc[is_missing, "from_node"] = link_ends[0].values
+        self.links.loc[is_missing, "to_node"] = link_ends[1].values
+
+    def update_link_geometry(self, node_labels):
+        """
+        Recalculates the coordinates and the length of all links attached to
+        the given nodes, e.g., after the nodes were moved.
+
+        Parameters
+        ----------
+        node_labels: list
+            labels of the nodes whose links must be updated
+        """
+        self.set_link_ends()
+        links = self.links[
+            self.links["from_node"].isin(node_labels)
+            | self.links["to_node"].isin(node_labels)
+        ]
+        if links.shape[0] == 0:
+            return
+
+        nodes_from = self.nodes.loc[links["from_node"]]
+        nodes_to = self.nodes.loc[links["to_node"]]
+        self.links.loc[links.index, "lat_from"] = nodes_from["latitude"].values
+        self.links.loc[links.index, "lon_from"] = nodes_from["longitude"].values
+        self.links.loc[links.index, "lat_to"] = nodes_to["latitude"].values
+        self.links.loc[links.index, "lon_to"] = nodes_to["longitude"].values
+        self.links.loc[links.index, "x_from"] = nodes_from["x"].values
+        self.links.loc[links.index, "y_from"] = nodes_from["y"].values
+        self.links.loc[links.index, "x_to"] = nodes_to["x"].values
+        self.links.loc[links.index, "y_to"] = nodes_to["y"].values
+        self.links.loc[links.index, "length"] = np.sqrt(
+            (nodes_from["x"].values - nodes_to["x"].values) ** 2
+            + (nodes_from["y"].values - nodes_to["y"].values) ** 2
+        )
+
+    def update_capacity_along_path(self, pole_label, n_consumers):
+        """
+        Adds a number of consumers to all `distribution` links on the path
+        between a pole and the power house.
 
+        Parameters
+        ----------
+        pole_label: str
+            label of the pole where the number of consumers has changed
+        n_consumers: int
+            number of added (positive) or removed (negative) consumers
+        """
+        child = pole_label
+        parent = self.nodes.parent.loc[child]
+        while parent not in ["none", "unknown"]:
+            link = f"({child}, {parent})"
+            if link not in self.links.index:
+                link = f"({parent}, {child})"
+            self.links.at[link, "n_consumers"] += n_consumers
+            child = parent
+            parent = self.nodes.parent.loc[child]
+
+    @timed("grid.distribute_grid_cost_among_consumers")
     def distribute_grid_cost_among_consumers(self):
         """
         Distribute the total cost of the gird including the cost of poles,
@@ -562,74 +842,77 @@ class Grid:
         power house.
         """
 
+        # The parents of all nodes and the number of consumers served by each
+        # link are obtained from `find_capacity_of_each_link`.
+        self.set_link_ends()
         consumers = self.nodes[self.nodes["node_type"] == "consumer"]
         connection_links = self.links[self.links["link_type"] == "connection"]
         distribution_links = self.links[self.links["link_type"] == "distribution"]
 
-        for consumer_index in consumers.index:
-            # First, find the connection link, and then add its costs to the
-            # total cost of the consumer.
-            chosen_link = connection_links[
-                connection_links["to_node"] == consumer_index
-            ]
-            length = chosen_link["length"][0]
-            cost = self.epc_connection_cable * length + self.epc_connection
-
-            # Child is the pole that serves the consumer, which is itself a
-            # child for another pole.
-            child = self.nodes.parent.loc[consumer_index]
-            while True:
-                parent = self.poles().parent.loc[child]
-
-                # If we reach the powerhouse, the searching for parent must be
-                # stopped.
-                if parent == "none":
-                    break
-
-                parent_child_link_1 = "(" + parent + ", " + child + ")"
-                parent_child_link_2 = "(" + child + ", " + parent + ")"
-                if parent_child_link_1 in distribution_links.index:
-                    parent_child_link = parent_child_link_1
-                else:
-                    parent_child_link = parent_child_link_2
-
-                length = distribution_links.length.loc[parent_child_link]
-                n_consumers = distribution_links.n_consumers.loc[parent_child_link]
-
-                cost += (
-                    self.epc_distribution_cable * length + self.epc_pole
-                ) / n_consumers
-
-                child = parent
-
-            # TODO: Once the demand estimation is done and real demand profiles
-            # are used instead of dummy profiles, the cost of the distribution
-            # grid in cent/kWh for each consumer should be updated.
-
-            # Specific cost per kWh for each consumer is calculeted. It must be
-            # noted that this cost if not a REAL cost, but it is a ficticious
-            # cost that must be added to the specific cost of electricity
-            # produced by the energy system to obtain the TOTAL cost of
-            # electrification for each consumer. If it is cheaper than the SHS,
-            # the consumer will stay connected to the mini-grid. Otherwise, it
-            # needs to be disconnected and be served by a SHS.
-            specific_cost = (
-                cost / self.nodes.average_consumption.loc[consumer_index] * 100
-            )
-            self.nodes.distribution_cost.loc[consumer_index] = specific_cost
+        # Each `distribution` link is attributed to the pole behind it, seen
+        # from the power house, together with its cost per served consumer.
+        poles = self.poles()
+        n_poles = poles.shape[0]
+        parent = poles.index.get_indexer(poles["parent"])
+        link_from = poles.index.get_indexer(distribution_links["from_node"])
+        link_to = poles.index.get_indexer(distribution_links["to_node"])
+        child = np.where(parent[link_from] == link_to, link_from, link_to)
+        link_cost = np.zeros(n_poles)
+        link_cost[child] = (
+            self.epc_distribution_cable * distribution_links["length"].values
+            + self.epc_pole
+        ) / distribution_links["n_consumers"].values
+
+        # The cost of the route from the power house to each pole is summed
+        # up in breadth-first order, so that the parent of a pole is always
+        # visited before the pole itself. Poles which are not reached from
+        # the power house have no route.
+        is_child = parent >= 0
+        tree = csr_matrix(
+            (np.ones(is_child.sum()), (parent[is_child], np.flatnonzero(is_child))),
+            shape=(n_poles, n_poles),
+        )
+        route_cost = np.full(n_poles, np.nan)
+        for root in np.flatnonzero(poles["parent"].values == "none"):
+            order = breadth_first_order(tree, i_start=root, return_predecessors=False)
+            route_cost[root] = 0
+            for position in order[1:]:
+                route_cost[position] = (
+                    route_cost[parent[position]] + link_cost[position]
+                )
 
-            # The number of connection links connected to each consumer is only
-            # one. But for poles, it can be more.
-            self.nodes.n_connection_links.loc[consumer_index] = 1
+        # The cost of each consumer includes its connection link and the
+        # route from its pole to the power house.
+        # TODO: Once the demand estimation is done and real demand profiles
+        # are used instead of dummy profiles, the cost of the distribution
+        # grid in cent/kWh for each consumer should be updated.
+        connection_length = (
+            pd.Series(
+                connection_links["length"].values, index=connection_links["to_node"]
+            )
+            .groupby(level=0)
+            .first()
+            .reindex(consumers.index)
+        )
+        pole_of_consumer = poles.index.get_indexer(consumers["parent"])
+        cost = (
+            self.epc_connection_cable * connection_length.values
+            + self.epc_connection
+            + np.where(pole_of_consumer >= 0, route_cost[pole_of_consumer], np.nan)
+        )
 
-            # The parent of each consumer is the pole connected to that
-            # consumer which is the cluster centroid obtained from the k-means
-            # clustering method.
-            self.nodes.parent.loc[consumer_index] = self.poles()[
-                self.poles()["cluster_label"]
-                == self.nodes.cluster_label.loc[consumer_index]
-            ].index[0]
+        # Specific cost per kWh for each consumer is calculeted. It must be
+        # noted that this cost if not a REAL cost, but it is a ficticious
+        # cost that must be added to the specific cost of electricity
+        # produced by the energy system to obtain the TOTAL cost of
+        # electrification for each consumer. If it is cheaper than the SHS,
+        # the consumer will stay connected to the mini-grid. Otherwise, it
+        # needs to be disconnected and be served by a SHS.
+        self.nodes.loc[consumers.index, "distribution_cost"] = (
+            cost / consumers["average_consumption"].values * 100
+        )
 
+    @timed("grid.find_capacity_of_each_link")
     def find_capacity_of_each_link(self):
         """
         This function calculates the number of consumers that are served by
@@ -637,141 +920,111 @@ class Grid:
 
         This is important to distribute the cost of grid layout between all
         consumers in a fair way.
-        """
-
-        # The label of all links are split into two parts: `from_node` and
-        # `to_node`, which makes it easier to work with this DataFrame.
-        for link in self.links.index:
-            self.links.from_node.loc[link] = link.split(", ")[0].split("(")[1]
-            self.links.to_node.loc[link] = link.split(", ")[1].split(")")[0]
 
-        # Exclude the power-house.
-        poles_indices = self.poles()[self.poles()["node_type"] != "power-house"].index
-        power_house_index = self.nodes[self.nodes["node_type"] == "power-house"].index
-        self.nodes.parent.loc[power_house_index] = "none"
+        Notes
+        -----
+        The distribution network is a tree rooted at the power house. It is
+        traversed once in breadth-first order to obtain the parent of each
+        pole, and the number of consumers below each pole is accumulated in
+        reverse order, so that each `distribution` link carries the consumers
+        of the subtree behind it.
+        """
 
-        # Then, select all `distribution` links in the network.
-        links = self.links[self.links["link_type"] == "distribution"]
+        # The number of links connected to each pole are updated first.
+        self.find_n_links_connected_to_each_pole()
 
-        # Initialize the dictionary representing the known capacities among all
-        # links in the network.
-        # It is considered that the capacity of all links are umknown.
-        n_known_capacity = {}
-        difference_unknown_known = {}
-        for pole_index in poles_indices:
-            n_known_capacity[pole_index] = 0
-
-            # As long as all elements of these dictionaty are 1, the calculation
-            # must continue.
-            difference_unknown_known[
-                pole_index
-            ] = self.poles().n_distribution_links.loc[pole_index]
-
-        # Keep calculating until the capacity of all links are known.
-        while True:
-            poles_with_one_unknown = {
-                k: v for k, v in difference_unknown_known.items() if v == 1
-            }
+        poles = self.poles()
+        power_house_index = poles.index[poles["node_type"] == "power-house"]
+        self.nodes.loc[poles.index, "parent"] = "unknown"
+        self.links.loc[:, "n_consumers"] = 0
+        if len(power_house_index) == 0:
+            return
 
-            if poles_with_one_unknown == {}:
-                break
+        # The number of consumers directly connected to each pole.
+        consumers = self.nodes[self.nodes["node_type"] == "consumer"]
+        n_connections = poles["n_connection_links"].astype(float).values
 
-            # Each link consists of two poles, which are named `pole 1` and
-            # `pole 2` here.
-            # To process a link, first `pole_1` is chosen from the dictionary
-            # containing all poles with only one unknown connection.
-            for pole_1 in poles_with_one_unknown:
+        # Build the adjacency matrix of the `distribution` network and run a
+        # breadth-first search starting from the power house.
+        links = self.links[self.links["link_type"] == "distribution"]
+        pole_position = pd.Series(np.arange(poles.shape[0]), index=poles.index)
+        rows = pole_position.reindex(links["from_node"]).values
+        cols = pole_position.reindex(links["to_node"]).values
+        adjacency = csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(poles.shape[0],) * 2
+        )
+        order, predecessors = breadth_first_order(
+            adjacency,
+            i_start=pole_position[power_house_index[0]],
+            directed=False,
+            return_predecessors=True,
+        )
 
-                # Select all links that include `pole_1` in either side.
-                links_with_pole_1 = links[
-                    (links["from_node"] == pole_1) | (links["to_node"] == pole_1)
-                ]
+        # Accumulate the number of consumers from the leaves to the root.
+        n_served = n_connections.astype(float)
+        for position in order[:0:-1]:
+            n_served[predecessors[position]] += n_served[position]
 
-                # In case, there are more than one link in the system
-                # containing `pole_1`, the number of consumers in the child
-                # link should be added to the parent link.
-                if links_with_pole_1.shape[0] > 1:
-                    # Total number of connected consumers to all children links
-                    # must be added to the parent link.
-                    n_connected_consumers_children = links_with_pole_1.n_consumers.sum()
-                else:
-                    n_connected_consumers_children = 0
-
-                for link in links_with_pole_1.index:
-                    # If the number of served consumers in a link is equal to 0,
-                    # it means that the link still has its initial state and
-                    # must be calculated.
-                    if links.n_consumers.loc[link] == 0:
-                        # The second end of the link, which is another pole in
-                        # the network now has one known connected link.
-                        # So, its value in the dictionary should be updated.
-                        if pole_1 == links.from_node.loc[link]:
-                            pole_2 = links.to_node.loc[link]
-                        else:
-                            pole_2 = links.from_node.loc[link]
-
-                        n_known_capacity[pole_1] += 1
-                        difference_unknown_known[pole_1] -= n_known_capacity[pole_1]
-                        if pole_2 != power_house_index[0]:
-                            n_known_capacity[pole_2] += 1
-                            difference_unknown_known[pole_2] -= n_known_capacity[pole_2]
-
-                            self.nodes.parent.loc[pole_1] = pole_2
-                        else:
-                            self.nodes.parent.loc[pole_1] = power_house_index[0]
-
-                        n_connected_consumers = self.poles().n_connection_links.loc[
-                            pole_1
-                        ]
-                        self.links.n_consumers.loc[link] += n_connected_consumers
-                        self.links.n_consumers.loc[
-                            link
-                        ] += n_connected_consumers_children
-
-                    # Re-create `links` to implement the last changes in the
-                    # original object.
-                    links = self.links[self.links["link_type"] == "distribution"]
+        reached = order[1:]
+        self.nodes.loc[poles.index[reached], "parent"] = poles.index[
+            predecessors[reached]
+        ]
+        self.nodes.loc[power_house_index, "parent"] = "none"
+
+        # The link between a pole and its parent serves all consumers in the
+        # subtree of that pole.
+        child = np.where(
+            predecessors[rows] == cols,
+            rows,
+            cols,
+        )
+        self.links.loc[links.index, "n_consumers"] = n_served[child]
 
-        consumers = self.nodes[self.nodes["node_type"] == "consumer"]
-        for consumer_index in consumers.index:
-            self.nodes.n_connection_links.loc[consumer_index] = 1
-            self.nodes.parent.loc[consumer_index] = self.poles()[
-                self.poles()["cluster_label"]
-                == self.nodes.cluster_label.loc[consumer_index]
-            ].index[0]
+        self.nodes.loc[consumers.index, "n_connection_links"] = 1
+        pole_of_cluster = pd.Series(
+            poles.index[(poles["type_fixed"] == False).values],
+            index=poles["cluster_label"][poles["type_fixed"] == False].values,
+        )
+        self.nodes.loc[consumers.index, "parent"] = pole_of_cluster.reindex(
+            consumers["cluster_label"].values
+        ).values
 
     def find_n_links_connected_to_each_pole(self):
         """
         Finds the number of both `distribution` and `connection` links that are
         connected to each pole in the network.
-        """
 
-        # Then, select all `distribution` links in the network.
-        links_indices = self.links[self.links["link_type"] == "distribution"].index
-
-        # Initialize the dictionary containing all `distribution` links and
-        # obtain the final number of `connection` links attached to each pole.
-        n_distribution_links = {}
-        for pole_index in self.poles().index:
-            n_distribution_links[pole_index] = 0
+        Notes
+        -----
+        The number of `connection` links of a pole is the number of consumers
+        in its cluster. Both numbers are counted at once over the integer
+        positions of the link ends and stored in the `n_connection_links` and
+        `n_distribution_links` columns of the poles, from where the capacity
+        calculation reads them.
+        """
+        self.set_link_ends()
 
-            cluster_label = self.nodes.cluster_label.loc[pole_index]
-            n_connections = self.nodes[
-                (self.nodes["cluster_label"] == cluster_label)
-                & (self.nodes["node_type"] == "consumer")
-            ].shape[0]
-            self.nodes.n_connection_links.loc[pole_index] = n_connections
+        n_nodes = self.nodes.shape[0]
+        is_distribution = (self.links["link_type"] == "distribution").values
+        ends = np.concatenate(
+            [
+                self.nodes.index.get_indexer(self.links["from_node"]),
+                self.nodes.index.get_indexer(self.links["to_node"]),
+            ]
+        )
+        is_distribution = np.concatenate([is_distribution, is_distribution])
+        is_valid = ends >= 0
 
-        # Find the number of `distribution` links attached to each pole.
-        for link_index in links_indices:
-            for pole_index in self.poles().index:
-                if pole_index in link_index:
-                    n_distribution_links[pole_index] += 1
+        n_distribution_links = np.bincount(
+            ends[is_valid & is_distribution], minlength=n_nodes
+        )
+        n_connection_links = np.bincount(
+            ends[is_valid & ~is_distribution], minlength=n_nodes
+        )
 
-        # Add the number of `distribution` links connected to each pole in the
-        # grid object.
-        for pole, n_links in n_distribution_links.items():
-            self.nodes.n_distribution_links.loc[pole] = n_links
+        is_pole = self.nodes["node_type"].isin(["pole", "power-house"]).values
+        self.nodes.loc[is_pole, "n_distribution_links"] = n_distribution_links[is_pole]
+        self.nodes.loc[is_pole, "n_connection_links"] = n_connection_links[is_pole]
 
     def total_length_distribution_cable(self):
         """
@@ -798,6 +1051,7 @@ class Grid:
 
     # -------------------- OPERATIONS -------------------- #
 
+    @timed("grid.convert_lonlat_xy")
     def convert_lonlat_xy(self, inverse: bool = False):
         """
         +++ ok +++
@@ -813,7 +1067,7 @@ class Grid:
             + true: x,y --> lon/lat
         """
 
-        p = Proj(proj="utm", zone=32, ellps="WGS84", preserve_units=False)
+        p = utm_projection()
 
         # if inverse=true, this is the case when the (x,y) coordinates of the obtained
         # poles (from the optimization) are converted into (lon,lat)
@@ -851,8 +1105,31 @@ class Grid:
             self.nodes.x -= self.ref_node[0]
             self.nodes.y -= self.ref_node[1]
 
+    def project_lonlat_xy(self, longitudes, latitudes):
+        """
+        Converts (longitude, latitude) coordinates into the (x, y) plane
+        coordinates of the grid without changing the reference node, so that
+        new nodes can be added to an existing grid.
+
+        Parameters
+        ----------
+        longitudes, latitudes (array-like):
+            coordinates of the nodes
+
+        Returns
+        -------
+        x, y: numpy.ndarray
+            (x, y) coordinates relative to the reference node of the grid
+        """
+        p = utm_projection()
+        x, y = p(
+            np.asarray(longitudes, dtype=float), np.asarray(latitudes, dtype=float)
+        )
+        return x - self.ref_node[0], y - self.ref_node[1]
+
     # -------------------- COSTS ------------------------ #
 
+    @timed("grid.cost")
     def cost(self):
         """
         Computes the cost of the grid taking into account the number
@@ -876,11 +1153,24 @@ class Grid:
         if (n_poles == 0) or (n_links == 0):
             return np.infty
 
+        # Cables with a larger cross-section than the default one of their
+        # type are priced in proportion to their cross-section area.
+        cables = self.cables.set_index("cable_type")
+        section_factor = (
+            self.get_link_section_area()
+            / cables["section_area"].reindex(self.links["link_type"]).values
+        )
+        weighted_length = self.links["length"].values * section_factor
+
         # calculate the total length of the cable used between poles [m]
-        total_length_distribution_cable = self.total_length_distribution_cable()
+        total_length_distribution_cable = weighted_length[
+            (self.links["link_type"] == "distribution").values
+        ].sum()
 
         # calculate the total length of the `connection` cable between poles and consumers
-        total_length_connection_cable = self.total_length_connection_cable()
+        total_length_connection_cable = weighted_length[
+            (self.links["link_type"] == "connection").values
+        ].sum()
 
         grid_cost = (
             n_poles * self.epc_pole
@@ -1497,13 +1787,87 @@ class Grid:
 
     # ----------------- COMPUTE DISTANCE BETWEEN NODES -----------------#
 
+    def sum_link_values_from_power_house(self, link_values):
+        """
+        Sums up values of the links along the route from the power house to
+        each node of the grid.
+
+        Parameters
+        ----------
+        link_values: numpy.ndarray
+            values of each link in the order of the links DataFrame, with one
+            column for each value to be summed up
+
+        Returns
+        -------
+        route_values: numpy.ndarray
+            sum of the values of all links between each node and its power
+            house, in the order of the nodes DataFrame
+        power_house: numpy.ndarray
+            position of the power house feeding each node, or -1 if the node
+            is not connected to any power house
+
+        Notes
+        -----
+        The links are stored in a sparse adjacency matrix whose values are
+        the positions of the links plus one. Starting from each power house,
+        the grid is explored level by level, so that all nodes at the same
+        distance from the power house are handled in one array operation and
+        no recursion is needed for long feeders.
+        """
+        self.set_link_ends()
+        link_values = np.asarray(link_values, dtype=float).reshape(
+            self.links.shape[0], -1
+        )
+        n_nodes = self.nodes.shape[0]
+        link_from = self.nodes.index.get_indexer(self.links["from_node"])
+        link_to = self.nodes.index.get_indexer(self.links["to_node"])
+        links = np.flatnonzero((link_from >= 0) & (link_to >= 0))
+        adjacency = csr_matrix(
+            (
+                np.concatenate([links, links]) + 1,
+                (
+                    np.concatenate([link_from[links], link_to[links]]),
+                    np.concatenate([link_to[links], link_from[links]]),
+                ),
+            ),
+            shape=(n_nodes, n_nodes),
+        )
+
+        route_values = np.full((n_nodes, link_values.shape[1]), np.nan)
+        power_house = np.full(n_nodes, -1)
+        for root in np.flatnonzero((self.nodes["node_type"] == "power-house").values):
+            if power_house[root] >= 0:
+                continue
+            route_values[root] = 0
+            power_house[root] = root
+            frontier = np.array([root])
+            while len(frontier) > 0:
+                # Positions of the neighbours of all frontier nodes in the
+                # `indices` and `data` arrays of the adjacency matrix.
+                start = adjacency.indptr[frontier]
+                n_neighbours = adjacency.indptr[frontier + 1] - start
+                positions = np.repeat(
+                    start - np.cumsum(n_neighbours) + n_neighbours, n_neighbours
+                ) + np.arange(n_neighbours.sum())
+                neighbours = adjacency.indices[positions]
+
+                is_new = power_house[neighbours] < 0
+                child, first = np.unique(neighbours[is_new], return_index=True)
+                parent = np.repeat(frontier, n_neighbours)[is_new][first]
+                link = adjacency.data[positions][is_new][first].astype(int) - 1
+
+                route_values[child] = route_values[parent] + link_values[link]
+                power_house[child] = root
+                frontier = child
+
+        return route_values, power_house
+
     def get_cable_distance_from_consumers_to_powerhub(self):
         """
         This method computes the cable distance separating each node
-        from its powerhub. It recursively uses the method
-        measure_distance_for_next_node() to explore the tree starting from
-        the powerhub and following each tree branch until all nodes are
-        reached.
+        from its power house, following the links of the tree starting from
+        the power house until all nodes are reached.
 
         Returns
         ------
@@ -1512,148 +1876,75 @@ class Grid:
             nodes in the grid and the total length of distribution and
             connection cable separating it from its respective powerhub.
         """
+        is_distribution = (self.links["link_type"] == "distribution").values
+        length = self.links["length"].values.astype(float)
+        route_length, power_house = self.sum_link_values_from_power_house(
+            np.column_stack(
+                [length * is_distribution, length * ~is_distribution]
+            )
+        )
 
-        # Create dataframe with distribution and connection cable length
+        is_reached = power_house >= 0
         distance_df = pd.DataFrame(
             {
-                "label": [],
-                "distribution cable [m]": [],
-                "connection cable [m]": [],
-                "powerhub label": [],
-            }
+                "distribution cable [m]": route_length[is_reached, 0],
+                "connection cable [m]": route_length[is_reached, 1],
+                "powerhub label": self.nodes.index[power_house[is_reached]],
+            },
+            index=self.nodes.index[is_reached],
         )
-        distance_df = distance_df.set_index("label")
-        # For every powerhub, compute cable length to nodes from the segment
-        for index_powerhub in self.get_nodes()[
-            self.get_nodes()["node_type"] == "powerhub"
-        ].index:
+        distance_df.index.name = "label"
 
-            distance_df.loc[index_powerhub] = [0, 0, index_powerhub]
-
-            # this list gathers the index of all nodes that are directly
-            # connected with a link to the powerhub
-            node_next_neighbours = []
-            # add all nodes connected to the pole to the list
-            for next_node in self.get_links()[
-                (self.get_links()["from"] == index_powerhub)
-            ]["to"]:
-                if (
-                    next_node not in node_next_neighbours
-                    and next_node not in distance_df.index
-                ):
-                    node_next_neighbours.append(next_node)
-            for next_node in self.get_links()[
-                (self.get_links()["to"] == index_powerhub)
-            ]["from"]:
-                if (
-                    next_node not in node_next_neighbours
-                    and next_node not in distance_df.index
-                ):
-                    node_next_neighbours.append(next_node)
-            # Call measure_distance_for_next_node for all branches
-            for node in node_next_neighbours:
-                self.measure_distance_for_next_node(
-                    index_powerhub, node, distance_df, index_powerhub
-                )
         return distance_df
 
-    def measure_distance_for_next_node(
-        self, node_n_minus_1, node_n, distance_df, index_powerhub
-    ):
+    # -------------------- GRID PERFORMANCE ---------------------- #
+
+    def get_link_section_area(self):
         """
-        This method is used to measure the cable distance between each nodes
-        and the powerhub. It is designed to be recursively called to explore
-        all the branches of the tree taking the powerhub as the starting point
-        and exploring every branch and sub-branches until the distance to every
-        node has been computed. It takes advantage that the network is a tree,
-        it is thus possible to explore the branches without considering each
-        node more than once.
-        Parameters
-        ----------
-        node_n_minus_1: str
-            index corresponding to the node at the base of the branch leading
-            to the "node_n" (which is the node whose distance to powerhub
-            has to be computed).
-        node_n: str
-            index corresponding to the node whose distance to powerhub has to
-            be computed.
-        distance_df: :class:`pandas.core.frame.DataFrame`
-            dictionnary containing the distance to the powerhub of all nodes
-            that where already computed using the function.
-        """
-
-        # find out what the link index of the link between nodes node_n_minus_1
-        # and node_n is. Since nodes are undirected, we need to look for the
-        # link from node_n_minus_1 to node_n and from node_n and node_n_minus_1
-        if (
-            self.get_links()[
-                (self.get_links()["from"] == node_n_minus_1)
-                & (self.get_links()["to"] == str(node_n))
-            ].shape[0]
-            == 1
-        ):
-            index_link_between_nodes = self.get_links()[
-                (self.get_links()["from"] == node_n_minus_1)
-                & (self.get_links()["to"] == str(node_n))
-            ].index[0]
+        Returns the cross-section area of the cable of each link, which is
+        the one in the `section_area` column of the links if it is given, or
+        otherwise the one of its cable type in the `cables` DataFrame.
 
-        elif (
-            self.get_links()[
-                (self.get_links()["from"] == node_n)
-                & (self.get_links()["to"] == node_n_minus_1)
-            ].shape[0]
-            == 1
-        ):
-            index_link_between_nodes = self.get_links()[
-                (self.get_links()["from"] == node_n)
-                & (self.get_links()["to"] == node_n_minus_1)
-            ].index[0]
-
-        # check what type the link is to know distiguish of the cable types
-        # in the datafram
-        if self.get_links()["type"][index_link_between_nodes] == "distribution":
-            distance_df.loc[node_n] = [
-                distance_df["distribution cable [m]"][node_n_minus_1]
-                + self.distance_between_nodes(node_n_minus_1, node_n),
-                0,
-                index_powerhub,
-            ]
-        elif self.get_links()["type"][index_link_between_nodes] == "connection":
-            distance_df.loc[node_n] = [
-                distance_df["distribution cable [m]"][node_n_minus_1],
-                self.distance_between_nodes(node_n_minus_1, node_n),
-                index_powerhub,
-            ]
+        Returns
+        ------
+        numpy.ndarray
+            cross-section area of each link in the order of the links
+            DataFrame [mm²]
+        """
+        cables = self.cables.set_index("cable_type")
+        section_area = cables["section_area"].reindex(self.links["link_type"]).values
+        if "section_area" in self.links.columns:
+            section_area = np.where(
+                self.links["section_area"].isna(),
+                section_area,
+                self.links["section_area"].values,
+            ).astype(float)
 
-        # Call function for all the nodes that were not measured yet
-        node_next_neighbours = []
-        for node_next_neighbour in self.get_links()[
-            (self.get_links()["from"] == node_n)
-        ]["to"]:
-            if (
-                node_next_neighbour not in node_next_neighbours
-                and node_next_neighbour not in distance_df.index
-            ):
-                node_next_neighbours.append(node_next_neighbour)
-        for node_next_neighbour in self.get_links()[(self.get_links()["to"] == node_n)][
-            "from"
-        ]:
-            if (
-                node_next_neighbour not in node_next_neighbours
-                and node_next_neighbour not in distance_df.index
-            ):
-                node_next_neighbours.append(node_next_neighbour)
-        for next_neighbour in node_next_neighbours:
-            self.measure_distance_for_next_node(
-                node_n, next_neighbour, distance_df, index_powerhub
-            )
+        return section_area
 
-    # -------------------- GRID PERFORMANCE ---------------------- #
+    def get_link_resistance(self):
+        """
+        Calculates the electrical resistance of the go and return conductors
+        of each link, using the cross-section area of its cable and the
+        resistivity of its cable type in the `cables` DataFrame.
+
+        Returns
+        ------
+        numpy.ndarray
+            resistance of each link in the order of the links DataFrame [Ω]
+        """
+        cables = self.cables.set_index("cable_type")
+        resistivity = cables["resistivity"].reindex(self.links["link_type"]).values
+
+        return (
+            resistivity * 2 * self.links["length"].values / self.get_link_section_area()
+        )
 
+    @timed("grid.get_voltage_drop_at_nodes")
     def get_voltage_drop_at_nodes(self):
         """
         This method computes the voltage drop at each node using the
-        parameters defined in config_grid.cfg under [power flow].
+        characteristics of the cables given in the `cables` attribute.
 
         Returns
         ------
@@ -1668,27 +1959,38 @@ class Grid:
             The cable resistance R_i is computed as follow
             R_i =  rho_i * 2* d_i / (i_cable_section)
             where i represent the cable type, rho the cable electric
-            resistivity (self.distribution_cable_resistivity),
-            d the cable distance and i_cable_section the section of the cable.
+            resistivity, d the cable distance and i_cable_section the section
+            of the cable.
             The voltage drop is computed using Ohm's law
             U = R * I where U is the tension (here corresponding to the
             voltage drop), R the resistance and I the current.
         """
-        voltage_drop_df = self.get_cable_distance_from_consumers_to_powerhub()
-
-        voltage_drop_df["distribution cable resistance [Ω]"] = (
-            self.distribution_cable_resistivity
-            * 2
-            * voltage_drop_df["distribution cable [m]"]
-            / self.distribution_cable_section
+        is_distribution = (self.links["link_type"] == "distribution").values
+        length = self.links["length"].values.astype(float)
+        resistance = self.get_link_resistance()
+        route_values, power_house = self.sum_link_values_from_power_house(
+            np.column_stack(
+                [
+                    length * is_distribution,
+                    length * ~is_distribution,
+                    resistance * is_distribution,
+                    resistance * ~is_distribution,
+                ]
+            )
         )
 
-        voltage_drop_df["connection cable resistance [Ω]"] = (
-            self.connection_cable_resistivity
-            * 2
-            * voltage_drop_df["connection cable [m]"]
-            / self.connection_cable_section
+        is_reached = power_house >= 0
+        voltage_drop_df = pd.DataFrame(
+            {
+                "distribution cable [m]": route_values[is_reached, 0],
+                "connection cable [m]": route_values[is_reached, 1],
+                "powerhub label": self.nodes.index[power_house[is_reached]],
+                "distribution cable resistance [Ω]": route_values[is_reached, 2],
+                "connection cable resistance [Ω]": route_values[is_reached, 3],
+            },
+            index=self.nodes.index[is_reached],
         )
+        voltage_drop_df.index.name = "label"
 
         voltage_drop_df["voltage drop [V]"] = (
             voltage_drop_df["distribution cable resistance [Ω]"] * self.max_current
@@ -1756,6 +2058,18 @@ class Grid:
             ),
         )
 
+    def export_snapshot(self, folder):
+        """
+        Method calling the export_grid_snapshot function to save a binary
+        snapshot of the grid, which is read by import_grid_snapshot.
+
+        Parameters
+        ----------
+        folder: str
+            Path of the snapshot, which is replaced if it exists.
+        """
+        export_grid_snapshot(self, folder)
+
 
 # - FUNCTIONS RELATED TO EXPORTING AND IMPORTING GRIDS FROM EXTERNAL FILE --#
 
@@ -1827,7 +2141,7 @@ def export_grid(
     make_folder(full_path)
 
     # Export nodes dataframe into csv file
-    grid.get_nodes().to_csv(full_path + "/nodes.csv")
+    grid.nodes.to_csv(full_path + "/nodes.csv")
 
     # Export links dataframe into csv file
     grid.get_links().to_csv(full_path + "/links.csv")
@@ -1838,7 +2152,7 @@ def export_grid(
     config["attributes"] = {
         key: (value, type(value))
         for key, value in grid.__dict__.items()
-        if key not in ["_Grid__nodes", "_Grid__links"]
+        if key not in ["nodes", "links"]
     }
 
     with open(f"{full_path}/grid_attributes.cfg", "w") as f:
@@ -1923,3 +2237,46 @@ def import_grid(folder):
         setattr(grid, key, value)
 
     return grid
+
+
+def export_grid_snapshot(grid, folder):
+    """
+    Export all attributes of the grid as a versioned binary snapshot (see
+    `fastapi_app.tools.snapshots`), which restores them including their
+    dtypes and is faster to write and read than the *.csv and *.cfg files
+    written by export_grid.
+
+    Parameters
+    ----------
+    grid: :class:`~grids.Grid`
+        Grid object.
+    folder: str
+        Path of the snapshot, which is replaced if it exists.
+    """
+    write_snapshot(folder, attributes=vars(grid))
+
+
+def import_grid_snapshot(folder, mmap_mode="r"):
+    """
+    Import a grid that was previously exported using the
+    export_grid_snapshot function.
+
+    Parameters
+    ----------
+    folder: str
+        Path of the snapshot.
+    mmap_mode: str or None
+        Mode in which the arrays of the snapshot are memory-mapped while
+        they are read (see `numpy.load`).
+
+    Returns
+    -------
+        Copy of the exported Grid, including the dtypes of all columns.
+    """
+    attributes, _ = read_snapshot(folder, mmap_mode=mmap_mode)
+
+    grid = Grid()
+    for key, value in attributes.items():
+        setattr(grid, key, value)
+
+    return grid
@@ -1,6 +1,16 @@
 import pandas as pd
 import numpy as np
 import os
+import orjson
+from starlette.responses import Response
+
+# encoded JSON payloads of the *.csv files, keyed by the file path and
+# holding the file version the payload was encoded from
+_json_payload_cache = {}
+
+# time series read from the *.csv files, keyed by the file path and holding
+# the file version they were read from
+_timeseries_cache = {}
 
 
 def create_empty_nodes_df():
@@ -79,3 +89,114 @@ def make_folder(folder):
                 path += x + '/'
             if not os.path.exists(path[0:-1]):
                 os.mkdir(path[0:-1])
+
+
+# ------------------ JSON SERIALIZATION OF *.CSV FILES ------------------ #
+
+
+class JSONBytesResponse(Response):
+    """
+    Response returning an already encoded JSON payload as it is, so that
+    FastAPI does not serialize the content once more.
+    """
+    media_type = 'application/json'
+
+    def render(self, content):
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def file_version(path):
+    """
+    Returns the version of a file, which changes whenever the file is
+    written.
+
+    Parameters
+    ----------
+    path: str
+        Path of the file.
+
+    Output
+    ------
+    (tuple): modification time (in ns) and size of the file.
+    """
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def encode_columns(columns, n_rows):
+    """
+    Encodes columnar data into JSON bytes in the same layout as
+    `pandas.DataFrame.to_json()`, i.e. {column: {"row": value}}.
+
+    Parameters
+    ----------
+    columns: dict
+        Column names as keys and arrays (or lists) of values.
+    n_rows: int
+        Number of rows of all columns.
+
+    Output
+    ------
+    (bytes): encoded JSON payload.
+    """
+    row_keys = [str(row) for row in range(n_rows)]
+    return orjson.dumps(
+        {
+            column: dict(zip(row_keys, np.asarray(values).tolist()))
+            for column, values in columns.items()
+        }
+    )
+
+
+def read_csv_as_json(path):
+    """
+    Reads a *.csv file and returns its content as encoded JSON bytes.
+
+    The payload is cached per file version, so that the file is parsed and
+    encoded only once after each write.
+
+    Parameters
+    ----------
+    path: str
+        Path of the *.csv file.
+
+    Output
+    ------
+    (bytes): encoded JSON payload, see `encode_columns`.
+    """
+    version = file_version(path)
+    cached = _json_payload_cache.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    df = pd.read_csv(path)
+    payload = encode_columns(
+        {column: df[column].to_numpy() for column in df.columns},
+        n_rows=df.shape[0],
+    )
+    _json_payload_cache[path] = (version, payload)
+    return payload
+
+
+def read_timeseries(path):
+    """
+    Reads a time series (e.g. the demand and solar potential) from a *.csv
+    file, which is only parsed again after the file has been written.
+
+    Parameters
+    ----------
+    path: str
+        Path of the file.
+
+    Output
+    ------
+    (pandas.DataFrame): copy of the time series, which can be modified.
+    """
+    version = file_version(path)
+    cached = _timeseries_cache.get(path)
+    if cached is None or cached[0] != version:
+        cached = (version, pd.read_csv(path))
+        _timeseries_cache[path] = cached
+    return cached[1].copy()
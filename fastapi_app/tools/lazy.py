@@ -0,0 +1,35 @@
+"""
+Facades of heavy modules, which are only imported on first use.
+
+Importing the optimization and geo libraries (oemof.solph, pyomo, sklearn,
+k_means_constrained, networkx, pyproj) takes several seconds, although most
+requests never use them. The modules of the app therefore refer to them
+through a `LazyModule`, so that the API and the workers start quickly.
+"""
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stands in for a module, which is imported when one of its attributes is
+    accessed for the first time.
+
+    Parameters
+    ----------
+    name (str):
+        absolute name of the module, e.g. 'oemof.solph'.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+
+    def __getattr__(self, attribute):
+        module = importlib.import_module(self.__name__)
+        # the attributes are copied, so that later accesses do not pass
+        # through this method anymore
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        return f"<lazy module '{self.__name__}'>"
@@ -0,0 +1,591 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from fastapi_app.tools.io import file_version
+
+# number of decimals used for storing the coordinates in the *.csv files
+COORDINATE_DECIMALS = 6
+
+# precision of the numerical columns of the nodes in the *.csv file
+NODES_FORMAT = {
+    "latitude": "%.6f",
+    "longitude": "%.6f",
+    "surface_area": "%.2f",
+    "peak_demand": "%.3f",
+    "average_consumption": "%.3f",
+}
+
+LINKS_FORMAT = {
+    "lat_from": "%.6f",
+    "lon_from": "%.6f",
+    "lat_to": "%.6f",
+    "lon_to": "%.6f",
+}
+
+# maximum distance in degrees between a clicked location and a stored node
+# for the node to be found, if the coordinates do not match exactly
+DEFAULT_TOLERANCE = 1e-5
+
+# node types obtained from the grid optimization
+GRID_NODE_TYPES = ["pole", "power-house"]
+
+# node types added by the users, which are removed by clicking on the map
+CONSUMER_NODE_TYPES = ["consumer"]
+
+
+def format_columns(df, column_formats):
+    """
+    Converts the given numerical columns of a DataFrame into strings with a
+    fixed precision before writing them into a *.csv file.
+
+    Parameters
+    ----------
+    df (pandas.DataFrame):
+        DataFrame to be formatted.
+    column_formats (dict):
+        Column names as keys and the corresponding format strings as values.
+
+    Output
+    ------
+    (pandas.DataFrame): formatted copy of the DataFrame.
+    """
+    df = df.copy()
+    for column, column_format in column_formats.items():
+        if column in df.columns and df.shape[0] > 0:
+            df[column] = np.char.mod(column_format, df[column].to_numpy(dtype=float))
+    return df
+
+
+def coordinate_keys(latitudes, longitudes, node_types=None):
+    """
+    Creates the keys of the coordinate index from arrays of coordinates.
+
+    Parameters
+    ----------
+    latitudes, longitudes (array-like):
+        Coordinates of the nodes.
+    node_types (array-like): optional
+        Types of the nodes. If not given, the keys only contain coordinates.
+
+    Output
+    ------
+    (list): keys as tuples of the rounded coordinates (and node types).
+    """
+    latitudes = np.round(np.asarray(latitudes, dtype=float), COORDINATE_DECIMALS)
+    longitudes = np.round(np.asarray(longitudes, dtype=float), COORDINATE_DECIMALS)
+    if node_types is None:
+        return list(zip(latitudes.tolist(), longitudes.tolist()))
+    return list(zip(latitudes.tolist(), longitudes.tolist(), list(node_types)))
+
+
+def coordinate_codes(latitudes, longitudes):
+    """
+    Encodes rounded coordinates as complex numbers, so that arrays of
+    coordinates can be compared with `numpy.isin`.
+    """
+    latitudes = np.round(np.asarray(latitudes, dtype=float), COORDINATE_DECIMALS)
+    longitudes = np.round(np.asarray(longitudes, dtype=float), COORDINATE_DECIMALS)
+    return latitudes + 1j * longitudes
+
+
+class NodeStore:
+    """
+    Keeps a hash index over the nodes stored in the `nodes.csv` file, so
+    that changes of the nodes only touch the affected rows.
+
+    The index maps the rounded (latitude, longitude, node_type) of each node
+    to its row in the *.csv file. New nodes are appended to the file, and
+    the whole file is only rewritten when existing rows are modified.
+    Single nodes are removed by deleting their line from the file. Whenever
+    the file is changed by another function (e.g., by
+    `database_initialization`), the index is rebuilt from the file.
+
+    The store also knows the clusters of the last grid design, which are set
+    by `set_clusters`. Whenever consumers are added, changed or removed, only
+    the poles of their clusters and the links attached to these poles are
+    removed, so that the rest of the design is kept. Without a known design
+    (e.g., after a restart of the app), all poles and links are removed.
+
+    Nodes can also be found by their coordinates only. If there is no exact
+    match of the rounded coordinates, the nearest node within a tolerance is
+    obtained from a k-d tree, which is built on first use after each change.
+
+    Attributes
+    ----------
+    path_nodes: str
+        path of the *.csv file containing the nodes.
+
+    path_links: str
+        path of the *.csv file containing the links.
+
+    index: dict
+        (latitude, longitude, node_type) as keys and row numbers as values.
+
+    coordinate_index: dict
+        (latitude, longitude) as keys and row numbers as values.
+
+    keys: list
+        (latitude, longitude, node_type) of each row in the *.csv file.
+
+    columns: list
+        header of the *.csv file containing the nodes.
+
+    clusters: dict or None
+        (latitude, longitude) of the consumers and poles of the last grid
+        design as keys and their cluster labels as values, or None if the
+        design is not known.
+    """
+
+    def __init__(self, path_nodes, path_links):
+        self.path_nodes = path_nodes
+        self.path_links = path_links
+        self.index = {}
+        self.coordinate_index = {}
+        self.keys = []
+        # k-d trees of the coordinates and the rows of the nodes in them,
+        # keyed by the node types of the nodes
+        self.trees = {}
+        self.columns = []
+        self.n_rows = 0
+        self.n_grid_nodes = 0
+        self.version = None
+        self.clusters = None
+        self.consumer_tree = None
+        self.consumer_clusters = None
+
+    # -------------------- INDEX -------------------- #
+
+    def refresh(self):
+        """
+        Rebuilds the index if the *.csv file has been changed since the last
+        time it was read or written by the store.
+        """
+        if not os.path.exists(self.path_nodes):
+            self.index, self.coordinate_index, self.keys = {}, {}, []
+            self.trees, self.columns, self.n_rows = {}, [], 0
+            self.n_grid_nodes = 0
+            self.version = None
+            self.clusters = None
+        elif file_version(self.path_nodes) != self.version:
+            self.build_index(pd.read_csv(self.path_nodes))
+            self.version = file_version(self.path_nodes)
+            self.clusters = None
+
+    def build_index(self, df):
+        """
+        Creates the index from all nodes of a DataFrame, whose rows are in the
+        same order as in the *.csv file.
+        """
+        self.keys = coordinate_keys(df["latitude"], df["longitude"], df["node_type"])
+        self.index = {key: row for row, key in enumerate(self.keys)}
+        self.coordinate_index = {key[:2]: row for row, key in enumerate(self.keys)}
+        self.trees = {}
+        self.columns = list(df.columns)
+        self.n_rows = df.shape[0]
+        self.n_grid_nodes = int(df["node_type"].isin(GRID_NODE_TYPES).sum())
+
+    def read(self):
+        """
+        Returns all nodes as a DataFrame.
+        """
+        self.refresh()
+        if self.version is None:
+            return pd.DataFrame()
+        return pd.read_csv(self.path_nodes)
+
+    def has_grid_nodes(self):
+        """
+        Returns True if the database contains poles or the power house.
+        """
+        self.refresh()
+        return self.n_grid_nodes > 0
+
+    def find(
+        self, latitude, longitude, tolerance=DEFAULT_TOLERANCE, node_types=None
+    ):
+        """
+        Returns the row of the node at the given coordinates.
+
+        The rounded coordinates are first looked up in the hash index. If
+        there is no exact match, the nearest node is searched using a k-d tree
+        and is only returned if it is closer than the tolerance.
+
+        Parameters
+        ----------
+        latitude, longitude (float):
+            Coordinates of the node.
+        tolerance (float): optional
+            Maximum distance (in degree) to the nearest node.
+        node_types (list): optional
+            Types of the nodes to be searched. By default, nodes of all types
+            are searched.
+
+        Output
+        ------
+        (int or None): row of the node in the *.csv file, or None if no node
+        is found.
+        """
+        self.refresh()
+        key = coordinate_keys([latitude], [longitude])[0]
+        if node_types is None:
+            if key in self.coordinate_index:
+                return self.coordinate_index[key]
+        else:
+            # co-located nodes of other types are skipped
+            for node_type in node_types:
+                if key + (node_type,) in self.index:
+                    return self.index[key + (node_type,)]
+
+        tree_key = None if node_types is None else tuple(sorted(node_types))
+        if tree_key not in self.trees:
+            rows = np.array(
+                [
+                    row
+                    for row, node_key in enumerate(self.keys)
+                    if node_types is None or node_key[2] in node_types
+                ],
+                dtype=int,
+            )
+            coordinates = np.array([self.keys[row][:2] for row in rows])
+            tree = cKDTree(coordinates) if rows.size > 0 else None
+            self.trees[tree_key] = (tree, rows)
+        tree, rows = self.trees[tree_key]
+        if tree is None:
+            return None
+        distance, position = tree.query(key, distance_upper_bound=tolerance)
+        if np.isinf(distance):
+            return None
+        return int(rows[position])
+
+    # -------------------- WRITE -------------------- #
+
+    def write(self, df):
+        """
+        Writes all nodes into the *.csv file and rebuilds the index.
+        """
+        df = df.reset_index(drop=True)
+        format_columns(df, NODES_FORMAT).to_csv(self.path_nodes, index=False)
+        self.build_index(df)
+        self.version = file_version(self.path_nodes)
+
+    def append(self, df):
+        """
+        Appends new nodes to the end of the *.csv file and adds them to the
+        index without reading the existing nodes.
+        """
+        df = df.reindex(columns=self.columns)
+        format_columns(df, NODES_FORMAT).to_csv(
+            self.path_nodes, mode="a", header=False, index=False
+        )
+        keys = coordinate_keys(df["latitude"], df["longitude"], df["node_type"])
+        for row, key in enumerate(keys, start=self.n_rows):
+            self.index[key] = row
+            self.coordinate_index[key[:2]] = row
+        self.keys.extend(keys)
+        self.trees = {}
+        self.n_rows += df.shape[0]
+        self.n_grid_nodes += int(df["node_type"].isin(GRID_NODE_TYPES).sum())
+        self.version = file_version(self.path_nodes)
+
+    def upsert(self, nodes):
+        """
+        Inserts new nodes into the database and updates the existing ones.
+
+        Nodes are identified by their rounded coordinates and their type.
+        Nodes that do not exist yet are appended to the *.csv file. Only if
+        existing nodes change, or new poles replace the poles and the power
+        house of a previous grid design, the file is rewritten.
+
+        A node with the same coordinates and type as an existing one updates
+        the values of the existing row, while duplicates among the given
+        nodes are ignored. The poles and links of the clusters of inserted
+        and changed consumers are removed (see `invalidate_clusters`).
+
+        Parameters
+        ----------
+        nodes (dict or pandas.DataFrame):
+            Nodes to be inserted or updated, with the same columns as the
+            `nodes.csv` file.
+
+        Output
+        ------
+        (dict):
+            number of `inserted`, `updated` and `removed` nodes, where the
+            removed nodes are the replaced or invalidated poles of a previous
+            grid design.
+        """
+        df = pd.DataFrame.from_dict(nodes).round(decimals=COORDINATE_DECIMALS)
+        summary = {"inserted": 0, "updated": 0, "removed": 0}
+        if df.shape[0] == 0:
+            return summary
+
+        # Duplicates among the new nodes are ignored (only when lat, lon and
+        # type are identical).
+        df = df.drop_duplicates(
+            subset=["latitude", "longitude", "node_type"], inplace=False
+        ).reset_index(drop=True)
+
+        self.refresh()
+        if self.version is None or self.n_rows == 0:
+            columns = self.columns + [c for c in df.columns if c not in self.columns]
+            self.write(df.reindex(columns=columns))
+            summary["inserted"] = df.shape[0]
+            return summary
+
+        keys = coordinate_keys(df["latitude"], df["longitude"], df["node_type"])
+        rows = np.array([self.index.get(key, -1) for key in keys])
+        is_new = rows < 0
+        replace_grid_nodes = (
+            df["node_type"].isin(GRID_NODE_TYPES).any() and self.n_grid_nodes > 0
+        )
+        new_columns = [column for column in df.columns if column not in self.columns]
+
+        if is_new.all() and not replace_grid_nodes and not new_columns:
+            self.append(df)
+            summary["inserted"] = df.shape[0]
+            summary["removed"] = self.invalidate_clusters(df)
+            return summary
+
+        # Existing rows change, so the whole file must be rewritten.
+        df_existing = pd.read_csv(self.path_nodes)
+        removed = pd.Series(False, index=df_existing.index)
+
+        # The poles and the power house of a previous grid design are
+        # replaced by the new ones.
+        if replace_grid_nodes:
+            removed |= df_existing["node_type"].isin(GRID_NODE_TYPES)
+            is_new |= df["node_type"].isin(GRID_NODE_TYPES).to_numpy()
+
+        updates = df[~is_new]
+        is_changed = np.zeros(updates.shape[0], dtype=bool)
+        if updates.shape[0] > 0:
+            update_rows = rows[~is_new]
+            columns = [c for c in updates.columns if c in df_existing.columns]
+            old_values = df_existing.loc[update_rows, columns].reset_index(drop=True)
+            new_values = updates[columns].reset_index(drop=True)
+            # Values are compared with the precision they are stored with.
+            is_changed = (
+                (
+                    format_columns(old_values, NODES_FORMAT).astype(str)
+                    != format_columns(new_values, NODES_FORMAT).astype(str)
+                )
+                .any(axis=1)
+                .to_numpy()
+            )
+            df_existing.loc[update_rows, columns] = new_values.to_numpy()
+
+        if not (removed.any() or is_new.any() or is_changed.any() or new_columns):
+            return summary
+
+        self.invalidate_links(df_existing[removed])
+        df_total = pd.concat([df_existing[~removed], df[is_new]], ignore_index=True)
+        self.write(df_total)
+        summary["inserted"] = int(is_new.sum())
+        summary["updated"] = int(is_changed.sum())
+        summary["removed"] = int(removed.sum())
+        if replace_grid_nodes:
+            # the clusters of the new poles are set after they are stored
+            self.clusters = None
+        else:
+            changed_nodes = pd.concat([df[is_new], updates[is_changed]])
+            summary["removed"] += self.invalidate_clusters(changed_nodes)
+        return summary
+
+    def remove(self, latitude, longitude, tolerance=DEFAULT_TOLERANCE):
+        """
+        Removes the consumer at the given coordinates from the database, as
+        well as the links attached to it. Poles and the power house are never
+        removed by their coordinates, since they may lie next to a consumer.
+
+        Parameters
+        ----------
+        latitude, longitude (float):
+            Coordinates of the node to be removed.
+        tolerance (float): optional
+            Maximum distance (in degree) to the nearest node, see `find`.
+
+        Output
+        ------
+        (int): number of removed nodes (0 or 1).
+        """
+        row = self.find(
+            latitude, longitude, tolerance=tolerance, node_types=CONSUMER_NODE_TYPES
+        )
+        if row is None:
+            return 0
+        return self.remove_rows([row])
+
+    def remove_rows(self, rows):
+        """
+        Removes the nodes in the given rows of the *.csv file, by deleting
+        only their lines without parsing the rest of the file. The links
+        attached to the removed nodes are removed too.
+
+        The lines of the file are still copied and the rows of the index
+        after the first removed node are shifted, so that the costs grow
+        linearly with the number of nodes. Since the file is never parsed,
+        this stays well below the time of a request for the settlements the
+        app is used for, and keeps the file free of tombstones.
+
+        Parameters
+        ----------
+        rows (list):
+            Rows of the nodes in the *.csv file (the header excluded).
+
+        Output
+        ------
+        (int): number of removed nodes.
+        """
+        self.refresh()
+        rows = sorted(set(int(row) for row in rows))
+        if len(rows) == 0:
+            return 0
+
+        with open(self.path_nodes, "r", newline="") as f:
+            lines = f.readlines()
+        # The first line is the header.
+        for row in reversed(rows):
+            del lines[row + 1]
+        with open(self.path_nodes, "w", newline="") as f:
+            f.writelines(lines)
+
+        removed_keys = [self.keys[row] for row in rows]
+        for row in reversed(rows):
+            del self.keys[row]
+        for key in removed_keys:
+            self.index.pop(key, None)
+            self.coordinate_index.pop(key[:2], None)
+        # Only the rows after the first removed node are shifted.
+        for row in range(rows[0], len(self.keys)):
+            self.index[self.keys[row]] = row
+            self.coordinate_index[self.keys[row][:2]] = row
+        self.trees = {}
+        self.n_rows = len(self.keys)
+        self.n_grid_nodes -= sum(key[2] in GRID_NODE_TYPES for key in removed_keys)
+        self.version = file_version(self.path_nodes)
+
+        removed_nodes = pd.DataFrame(
+            removed_keys, columns=["latitude", "longitude", "node_type"]
+        )
+        self.invalidate_links(removed_nodes)
+        self.invalidate_clusters(removed_nodes)
+        return len(rows)
+
+    # -------------------- LINKS -------------------- #
+
+    def invalidate_links(self, removed_nodes):
+        """
+        Removes only those links from the `links.csv` file, which are attached
+        to the removed nodes. All other links of the grid are kept.
+
+        Parameters
+        ----------
+        removed_nodes (pandas.DataFrame):
+            Nodes that are removed from the database.
+
+        Output
+        ------
+        (int): number of removed links.
+        """
+        if removed_nodes.shape[0] == 0 or not os.path.exists(self.path_links):
+            return 0
+
+        links = pd.read_csv(self.path_links)
+        if links.shape[0] == 0:
+            return 0
+
+        removed_codes = coordinate_codes(
+            removed_nodes["latitude"], removed_nodes["longitude"]
+        )
+        is_invalid = np.isin(
+            coordinate_codes(links["lat_from"], links["lon_from"]), removed_codes
+        ) | np.isin(coordinate_codes(links["lat_to"], links["lon_to"]), removed_codes)
+
+        if is_invalid.any():
+            format_columns(links[~is_invalid], LINKS_FORMAT).to_csv(
+                self.path_links, index=False
+            )
+        return int(is_invalid.sum())
+
+    # ------------------ GRID DESIGN ------------------ #
+
+    def set_clusters(self, nodes):
+        """
+        Stores the clusters of the consumers and poles of a new grid design.
+
+        Parameters
+        ----------
+        nodes (pandas.DataFrame):
+            consumers and poles of the grid with their `latitude`,
+            `longitude`, `node_type`, `is_connected` and `cluster_label`.
+        """
+        self.refresh()
+        # consumers with a solar home system do not belong to any cluster
+        nodes = nodes[nodes["is_connected"] == True]
+        keys = coordinate_keys(nodes["latitude"], nodes["longitude"])
+        self.clusters = dict(zip(keys, nodes["cluster_label"].tolist()))
+
+        # other consumers belong to the cluster of the nearest consumer
+        consumers = nodes[~nodes["node_type"].isin(GRID_NODE_TYPES)]
+        if consumers.shape[0] > 0:
+            self.consumer_tree = cKDTree(
+                np.column_stack(
+                    [
+                        consumers["latitude"].to_numpy(dtype=float),
+                        consumers["longitude"].to_numpy(dtype=float),
+                    ]
+                )
+            )
+            self.consumer_clusters = consumers["cluster_label"].to_numpy()
+        else:
+            self.consumer_tree, self.consumer_clusters = None, None
+
+    def invalidate_clusters(self, changed_nodes):
+        """
+        Removes the poles of the clusters, whose consumers were added, changed
+        or removed, and the links attached to these poles. All other poles,
+        the power house and the other links of the grid design are kept.
+
+        If the clusters of the grid design are not known (see `set_clusters`),
+        all poles, the power house and all links are removed.
+
+        Parameters
+        ----------
+        changed_nodes (pandas.DataFrame):
+            added, changed or removed nodes with their `latitude`, `longitude`
+            and `node_type`. Only the consumers among them are considered.
+
+        Output
+        ------
+        (int): number of removed poles.
+        """
+        consumers = changed_nodes[~changed_nodes["node_type"].isin(GRID_NODE_TYPES)]
+        self.refresh()
+        if (consumers.shape[0] == 0) or (self.n_grid_nodes == 0):
+            return 0
+
+        if self.clusters is None:
+            rows = [
+                row for row, key in enumerate(self.keys) if key[2] in GRID_NODE_TYPES
+            ]
+            return self.remove_rows(rows)
+
+        invalid_clusters = set()
+        unknown_keys = []
+        for key in coordinate_keys(consumers["latitude"], consumers["longitude"]):
+            if key in self.clusters:
+                invalid_clusters.add(self.clusters[key])
+            else:
+                unknown_keys.append(key)
+        if unknown_keys and (self.consumer_tree is not None):
+            _, positions = self.consumer_tree.query(np.array(unknown_keys))
+            invalid_clusters.update(self.consumer_clusters[positions].tolist())
+
+        rows = [
+            row
+            for row, key in enumerate(self.keys)
+            if (key[2] == "pole")
+            and (self.clusters.get(key[:2], None) in invalid_clusters)
+        ]
+        return self.remove_rows(rows)
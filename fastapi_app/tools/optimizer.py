@@ -1,27 +1,40 @@
 from __future__ import division
-from copyreg import remove_extension
 import ssl
 import numpy as np
 import pandas as pd
 import os
 import time
 import json
-from k_means_constrained import KMeansConstrained
-from munkres import Munkres
+import copy
+from concurrent.futures import ProcessPoolExecutor
 from scipy.sparse import csr_matrix
-from scipy.sparse.csgraph import minimum_spanning_tree
+from scipy.sparse.csgraph import (
+    minimum_spanning_tree,
+    connected_components,
+    breadth_first_order,
+)
+from scipy.spatial import cKDTree, Delaunay, QhullError
 from scipy.optimize import linprog
 
-from sklearn.datasets import make_blobs
-from sklearn.metrics import precision_recall_curve
+from fastapi_app.tools.io import make_folder, read_timeseries
+from fastapi_app.tools.grids import Grid, CABLE_SECTIONS
+from fastapi_app.tools.assignment import capacitated_kmeans, assignment_gap
+from fastapi_app.tools.annealing import anneal_poles
+from fastapi_app.tools.profiling import timed
+from fastapi_app.tools.lazy import LazyModule
 
-from fastapi_app.tools.io import make_folder
-from fastapi_app.tools.grids import Grid
-
-import oemof.solph as solph
 from datetime import datetime, timedelta
-import pyomo.environ as po
-from pyomo.util.infeasible import log_infeasible_constraints
+
+# the optimization libraries are only imported when they are first used
+solph = LazyModule("oemof.solph")
+po = LazyModule("pyomo.environ")
+sklearn_cluster = LazyModule("sklearn.cluster")
+k_means_constrained = LazyModule("k_means_constrained")
+munkres = LazyModule("munkres")
+
+# number of nodes from which on the mini-batch k-means is used, if the
+# clusters are not limited in size
+MINI_BATCH_MIN_SAMPLES = 10000
 
 
 class Optimizer:
@@ -98,15 +111,34 @@ class GridOptimizer(Optimizer):
     """
 
     def __init__(
-        self, start_date, n_days, project_lifetime, wacc, tax, mst_algorithm="Kruskal"
+        self,
+        start_date,
+        n_days,
+        project_lifetime,
+        wacc,
+        tax,
+        mst_algorithm="Kruskal",
+        max_segment_size=None,
+        n_workers=None,
+        assignment="constrained",
+        annealing_chains=0,
+        annealing_iterations=20000,
     ):
         """
         Initialize the grid optimizer object
         """
         super().__init__(start_date, n_days, project_lifetime, wacc, tax)
         self.mst_algorithm = mst_algorithm
+        self.max_segment_size = max_segment_size
+        self.n_workers = n_workers
+        self.assignment = assignment
+        self.assignment_gap = None
+        self.annealing_chains = annealing_chains
+        self.annealing_iterations = annealing_iterations
+        self.annealing_result = None
 
     # ------------ CONNECT NODES USING TREE-STAR SHAPE ------------#
+    @timed("grid_optimizer.connect_grid_consumers")
     def connect_grid_consumers(self, grid: Grid):
         """
         +++ ok +++
@@ -124,25 +156,22 @@ class GridOptimizer(Optimizer):
         # Remove all existing connections between poles and consumers
         grid.clear_links(link_type="connection")
 
-        # calculate the number of clusters and their labels obtained from kmeans clustering
-        n_clusters = grid.poles()[grid.poles()["type_fixed"] == False].shape[0]
-        cluster_labels = grid.poles()["cluster_label"]
+        # the pole of each cluster obtained from kmeans clustering
+        poles = grid.poles()[grid.poles()["type_fixed"] == False]
+        pole_of_cluster = pd.Series(poles.index, index=poles["cluster_label"].values)
 
         # create links between each node and the corresponding centroid
-        for cluster in range(n_clusters):
-            # first filter the nodes and only select those with cluster labels equal to 'cluster'
-            filtered_nodes = grid.nodes[
-                grid.nodes["cluster_label"] == cluster_labels[cluster]
-            ]
-
-            # then obtain the label of the pole which is in this cluster (as the center)
-            pole_label = filtered_nodes.index[filtered_nodes["node_type"] == "pole"][0]
-
-            for node_label in filtered_nodes.index:
-                # adding consumers
-                if node_label != pole_label:
-                    grid.add_links(label_node_from=pole_label, label_node_to=node_label)
+        consumers = grid.nodes[
+            (grid.nodes["node_type"] == "consumer")
+            & grid.nodes["cluster_label"].isin(pole_of_cluster.index)
+        ]
+        grid.add_links_bulk(
+            label_node_from=pole_of_cluster.loc[consumers["cluster_label"]].values,
+            label_node_to=consumers.index,
+            link_type="connection",
+        )
 
+    @timed("grid_optimizer.connect_grid_poles")
     def connect_grid_poles(self, grid: Grid, long_links=[]):
         """
         +++ ok +++
@@ -162,113 +191,74 @@ class GridOptimizer(Optimizer):
             links.
         """
 
+        # The start and end of the long links are needed to connect the added
+        # poles, so they are obtained before all links are removed.
+        long_links = grid.links.loc[
+            grid.links.index.intersection(long_links), ["from_node", "to_node"]
+        ]
+
         # First, all links in the grid should be removed.
         grid.clear_links(link_type="distribution")
 
-        # Now, all links from the sparse matrix obtained using the minimum
-        # spanning tree are stored in `links_mst`.
-        # All poles in the `links_mst` should be connected together considering:
-        #   + The number of rows in the 'links_mst' reveals the number of
-        #     connections.
-        #   + (x,y) of each nonzero element of the 'links_mst' correspond to the
-        #     (pole_from, pole_to) labels.
-        links_mst = np.argwhere(grid.grid_mst != 0)
-
-        for link_mst in range(links_mst.shape[0]):
-            mst_pole_from = grid.poles().index[links_mst[link_mst, 0]]
-            mst_pole_to = grid.poles().index[links_mst[link_mst, 1]]
-
-            # Create two different combinations for each link obtained from the
-            # minimum spanning tree: (px, py) and (py, px).
-            # Since the direction of the link is not important here, it is
-            # assumed (px, py) = (py, px).
-            mst_from_to = "(" + mst_pole_from + ", " + mst_pole_to + ")"
-            mst_to_from = "(" + mst_pole_to + ", " + mst_pole_from + ")"
-
-            # If the link obtained from the minimum spanning tree is one of the
-            # long links that should be removed and replaced with smaller links,
-            # this part will be executed.
-            if (mst_from_to in long_links) or (mst_to_from in long_links):
-
-                # Both `mst_from_to` and `mst_to_from` will be checked to find
-                # the added poles, but only the dataframe which is not empty is
-                # considered as the final `added_poles`
-                added_poles_from_to = grid.poles()[
-                    (grid.poles()["type_fixed"] == True)
-                    & (grid.poles()["how_added"] == mst_from_to)
-                ]
-                added_poles_to_from = grid.poles()[
-                    (grid.poles()["type_fixed"] == True)
-                    & (grid.poles()["how_added"] == mst_to_from)
-                ]
+        # The links of the minimum spanning tree are kept as integer positions
+        # of the poles, which were used to create the tree. Fixed poles added
+        # afterwards are appended to the nodes and do not change them.
+        pole_labels = grid.poles().index.values
+        links_mst = grid.grid_mst.tocoo()
+        label_node_from = pole_labels[links_mst.row]
+        label_node_to = pole_labels[links_mst.col]
+
+        # Since the direction of the link is not important here, both ends
+        # are sorted as in the labels of the `distribution` links.
+        label_node_from, label_node_to = (
+            np.where(label_node_from < label_node_to, label_node_from, label_node_to),
+            np.where(label_node_from < label_node_to, label_node_to, label_node_from),
+        )
 
-                # In addition to the `added_poles` a flag is defined here to
-                # deal with the direction of adding additional poles.
-                if not added_poles_from_to.empty:
-                    added_poles = added_poles_from_to
-                    to_from = False
-                elif not added_poles_to_from.empty:
-                    added_poles = added_poles_to_from
-                    to_from = True
-
-                # In this part, the long links are broken into smaller links.
-                # `counter` represents the number of the added poles.
-                counter = 0
-                n_added_poles = added_poles.shape[0]
-                for index_added_pole in added_poles.index:
-
-                    if counter == 0:
-                        # The first `added poles` should be connected to
-                        # the beginning or to the end of the long link,
-                        # depending on the `to_from` flag.
-                        if to_from:
-                            grid.add_links(
-                                label_node_from=index_added_pole,
-                                label_node_to=mst_pole_to,
-                            )
-                        else:
-                            grid.add_links(
-                                label_node_from=mst_pole_from,
-                                label_node_to=index_added_pole,
-                            )
-
-                    if counter == n_added_poles - 1:
-                        # The last `added poles` should be connected to
-                        # the end or to the beginning of the long link,
-                        # depending on the `to_from` flag.
-                        if to_from:
-                            grid.add_links(
-                                label_node_from=mst_pole_from,
-                                label_node_to=index_added_pole,
-                            )
-                        else:
-                            grid.add_links(
-                                label_node_from=index_added_pole,
-                                label_node_to=mst_pole_to,
-                            )
-
-                    if counter > 0:
-                        # The intermediate `added poles` should connect to
-                        # the other `added_poles` before and after them.
-                        grid.add_links(
-                            label_node_from=added_poles.index[counter - 1],
-                            label_node_to=added_poles.index[counter],
-                        )
-                    counter += 1
+        # If a link obtained from the minimum spanning tree is one of the long
+        # links, it is replaced by a chain of links through the added poles.
+        is_long = pd.MultiIndex.from_arrays([label_node_from, label_node_to]).isin(
+            pd.MultiIndex.from_frame(long_links)
+        )
+        label_node_from = list(label_node_from[~is_long])
+        label_node_to = list(label_node_to[~is_long])
+
+        if long_links.shape[0] > 0:
+            # The added poles of each long link are placed one after the other
+            # from the start to the end of the link and have the label of the
+            # link as `how_added` tag.
+            poles = grid.poles()
+            added_poles = poles[
+                (poles["type_fixed"] == True)
+                & poles["how_added"].isin(long_links.index)
+            ]
+            long_link = added_poles["how_added"].values
+            previous_pole = (
+                pd.Series(added_poles.index, index=added_poles.index)
+                .groupby(long_link)
+                .shift(1)
+            )
+            is_first = previous_pole.isna().values
+            previous_pole = np.where(
+                is_first,
+                long_links["from_node"].reindex(long_link).values,
+                previous_pole.values,
+            )
+            is_last = ~pd.Series(long_link).duplicated(keep="last").values
+
+            label_node_from += list(previous_pole) + list(added_poles.index[is_last])
+            label_node_to += list(added_poles.index) + list(
+                long_links["to_node"].reindex(long_link[is_last]).values
+            )
 
-                    # Change the `how_added` tag for the new poles.
-                    grid.nodes.at[index_added_pole, "how_added"] = "long-distance"
+            # Change the `how_added` tag for the new poles.
+            grid.nodes.loc[added_poles.index, "how_added"] = "long-distance"
 
-            # If `link_mst` does not belong to the list of long links, it is
-            # simply connected without any further check.
-            else:
-                grid.add_links(
-                    label_node_from=grid.poles().index[links_mst[link_mst, 0]],
-                    label_node_to=grid.poles().index[links_mst[link_mst, 1]],
-                )
+        grid.add_links_bulk(label_node_from, label_node_to, link_type="distribution")
 
     # ------------ MINIMUM SPANNING TREE ALGORITHM ------------ #
 
+    @timed("grid_optimizer.create_minimum_spanning_tree")
     def create_minimum_spanning_tree(self, grid: Grid):
         """
         Creates links between all poles using 'Prims' or 'Kruskal' algorithms
@@ -372,23 +362,11 @@ class GridOptimizer(Optimizer):
             grid object
         """
 
-        # total number of poles (i.e., clusters)
-        poles = grid.poles()
-        n_poles = poles.shape[0]
-
-        # generate all possible edges between each pair of poles
-        graph_matrix = np.zeros((n_poles, n_poles))
-        for i in range(n_poles):
-            for j in range(n_poles):
-                # since the graph does not have a direction, only the upper part of the matrix must be flled
-                if j > i:
-                    graph_matrix[i, j] = grid.distance_between_nodes(
-                        label_node_1=poles.index[i], label_node_2=poles.index[j]
-                    )
-
-        # obtain the optimal links between all poles (grid_mst) and copy it in the grid object
-        grid_mst = minimum_spanning_tree(graph_matrix)
-        grid.grid_mst = grid_mst
+        # obtain the optimal links between all poles (grid_mst) and copy it in
+        # the grid object as integer (row, col) positions of the poles
+        grid.grid_mst = self.create_tree_of_points(
+            grid.poles()[["x", "y"]].values
+        ).tocoo()
 
     # ------------------- ALLOCATION ALGORITHMS -------------------#
 
@@ -487,7 +465,7 @@ class GridOptimizer(Optimizer):
                         distance_matrix.append(distance_list)
                         index_list.append(pole)
                 # Call munkres_sol function for solveing allocation problem
-                munkres_sol = Munkres()
+                munkres_sol = munkres.Munkres()
                 indices = munkres_sol.compute(distance_matrix)
                 # Add corresponding links to the grid
                 for x in indices:
@@ -501,10 +479,10 @@ class GridOptimizer(Optimizer):
     def propagate_segment_to_neighbours(self, grid: Grid, index, segment):
         """
         This method is a helping function used to split a segment into two.
-        It is a recursice function that sets the segment of a node to a given
-        value and then does the same for all of it's neighbours that have a
-        different segment index. The recursion starts at the node corresponding
-        to the index given as parameter.
+        It sets the segment of a node to a given value and then does the same
+        for all of it's neighbours that have a different segment index. The
+        propagation starts at the node corresponding to the index given as
+        parameter.
 
         Parameters
         ----------
@@ -518,14 +496,21 @@ class GridOptimizer(Optimizer):
             index (label) of the segment to be set for the nodes.
 
         """
-        for index_neighbour in grid.links()[(grid.links()["from"] == index)]["to"]:
-            if not grid.get_nodes()["segment"][index_neighbour] == segment:
-                grid.set_segment(index_neighbour, segment)
-                self.propagate_segment_to_neighbours(grid, index_neighbour, segment)
-        for index_neighbour in grid.links()[(grid.links()["to"] == index)]["from"]:
-            if not grid.get_nodes()["segment"][index_neighbour] == segment:
-                grid.set_segment(index_neighbour, segment)
-                self.propagate_segment_to_neighbours(grid, index_neighbour, segment)
+        grid.set_link_ends()
+        neighbours = {}
+        for node_from, node_to in zip(grid.links["from_node"], grid.links["to_node"]):
+            neighbours.setdefault(node_from, []).append(node_to)
+            neighbours.setdefault(node_to, []).append(node_from)
+
+        # The neighbours are visited using a stack instead of a recursion, so
+        # that large segments do not exceed the recursion limit.
+        grid.set_segment(index, segment)
+        stack = [index]
+        while len(stack) > 0:
+            for index_neighbour in neighbours.get(stack.pop(), []):
+                if not grid.nodes["segment"][index_neighbour] == segment:
+                    grid.set_segment(index_neighbour, segment)
+                    stack.append(index_neighbour)
 
     def split_segment(self, grid: Grid, segment, min_segment_size):
         """
@@ -545,86 +530,289 @@ class GridOptimizer(Optimizer):
 
         Notes
         -----
-            This method performs temporary modifications to the grid
-            nodes in order to connect all the nodes of the initial segment
-            with a minimum spanning tree to see what is the longest node from
-            the tree that can be removed, thus splitting the segment into two
-            sub-segments of respective size at least min_segment_size. Once the
-            segmentation is identified, the nodes are restored to their initial
-            state and the segmentation is performed by setting the 'segment'
-            property of the node to the ones identified earlier
+            All nodes of the initial segment are connected with a minimum
+            spanning tree to see what is the longest link of the tree that
+            can be removed, thus splitting the segment into two sub-segments
+            of respective size at least min_segment_size. The nodes behind
+            the removed link get the segment label `<segment>_2`.
         """
         # make sure that segment index matches a node segment
-        if segment not in grid.get_nodes()["segment"].unique():
+        if segment not in grid.nodes["segment"].unique():
             raise Warning("the segment index doesn't correspond to any grid segment")
-            return
 
         # make sure that the initial segment is big enough to be split into
         # two subsegments of size at least min_segment_size
-        if (
-            grid.get_nodes()[grid.get_nodes()["segment"] == segment].shape[0]
-            < 2 * min_segment_size
-        ):
+        nodes_in_segment = grid.nodes[grid.nodes["segment"] == segment]
+        n_nodes = nodes_in_segment.shape[0]
+        if n_nodes < 2 * min_segment_size:
             return
 
-        # Store grid's nodes in dataframe since the actual grid is modified
-        # during method
-        node_backup = grid.get_nodes()
-        # filter nodes to keep only the ones belongging to the initial segment
-        grid.set_nodes(grid.get_nodes()[grid.get_nodes()["segment"] == segment])
-        # changes all nodes into poles
-        grid.set_all_node_type_to_poles()
-        # Connect the nodes using MST
-        grid.clear_all_links()
+        # Connect the nodes of the segment using a minimum spanning tree and
+        # obtain the parent of each node, starting from the first node.
+        tree = self.create_tree_of_points(nodes_in_segment[["x", "y"]].values)
+        order, predecessors = breadth_first_order(
+            tree, i_start=0, directed=False, return_predecessors=True
+        )
 
-        self.create_minimum_spanning_tree(grid)
+        # Number of nodes behind each node, seen from the first node.
+        subtree_size = np.ones(n_nodes, dtype=int)
+        for position in order[:0:-1]:
+            subtree_size[predecessors[position]] += subtree_size[position]
 
-        # Create list containing links index sorted by link's distance
-        index_link_sorted_by_distance = [
-            index
-            for index in grid.links()["distance"].nlargest(grid.links().shape[0]).index
-        ]
         # Try to split the segment removing the longest link and see if
         # resulting sub-segments meet the minimum size criterion, if not,
         # try with next links (the ones just smaller) until criterion meet
+        tree = tree.tocoo()
+        for link in np.argsort(tree.data)[::-1]:
+            if predecessors[tree.col[link]] == tree.row[link]:
+                child = tree.col[link]
+            else:
+                child = tree.row[link]
+            if min(subtree_size[child], n_nodes - subtree_size[child]) >= (
+                min_segment_size
+            ):
+                break
+        else:
+            return
 
-        for link in index_link_sorted_by_distance:
-            index_node_from = grid.links()["from"][link]
-            index_node_to = grid.links()["to"][link]
-            old_segment = grid.get_nodes()["segment"][index_node_from]
-            segment_1 = grid.get_nodes()["segment"][index_node_from]
-            segment_2 = grid.get_nodes()["segment"][index_node_to] + "_2"
-            grid.set_segment(index_node_from, segment_2)
-            grid.set_segment(index_node_to, segment_2)
+        # All nodes whose path to the first node passes the child are moved
+        # to the new segment.
+        is_behind_child = np.zeros(n_nodes, dtype=bool)
+        is_behind_child[child] = True
+        for position in order[1:]:
+            if predecessors[position] >= 0:
+                is_behind_child[position] |= is_behind_child[predecessors[position]]
+        grid.nodes.loc[
+            nodes_in_segment.index[is_behind_child], "segment"
+        ] = f"{segment}_2"
+
+    def create_tree_of_points(self, coordinates):
+        """
+        Creates the minimum spanning tree between a set of points, only
+        considering the links of their Delaunay triangulation, which always
+        contains the Euclidean minimum spanning tree.
 
-            self.propagate_segment_to_neighbours(grid, index_node_to, segment_2)
-            grid.set_segment(index_node_from, segment_1)
+        Parameters
+        ----------
+        coordinates: numpy.ndarray
+            (x,y) coordinates of the points
 
-            if (
-                grid.get_nodes()[grid.get_nodes()["segment"] == segment_1].shape[0]
-                >= min_segment_size
-                and grid.get_nodes()[grid.get_nodes()["segment"] == segment_2].shape[0]
-                >= min_segment_size
-            ):
+        Return
+        ------
+        class:`scipy.sparse.csr_matrix`
+            links of the minimum spanning tree weighted by their length
+        """
+        n_points = coordinates.shape[0]
+        if n_points < 2:
+            return csr_matrix((n_points, n_points))
+
+        try:
+            simplices = Delaunay(coordinates).simplices
+            candidates = [
+                np.concatenate([simplices[:, 0], simplices[:, 1], simplices[:, 2]]),
+                np.concatenate([simplices[:, 1], simplices[:, 2], simplices[:, 0]]),
+            ]
+        except QhullError:
+            # e.g., less than three points or all points on one line
+            candidates = None
+
+        for _ in range(2):
+            if candidates is None:
+                candidates = np.triu_indices(n_points, k=1)
+
+            # Each link is only used once, since duplicated entries of the
+            # sparse matrix would be summed up.
+            candidate_from = np.minimum(*candidates)
+            candidate_to = np.maximum(*candidates)
+            candidate_id = np.unique(candidate_from * n_points + candidate_to)
+            candidate_from, candidate_to = np.divmod(candidate_id, n_points)
+
+            # Links with zero length would be ignored as missing links.
+            length = np.maximum(
+                np.sqrt(
+                    (
+                        (coordinates[candidate_from] - coordinates[candidate_to])
+                        ** 2
+                    ).sum(axis=1)
+                ),
+                1e-9,
+            )
+            tree = minimum_spanning_tree(
+                csr_matrix(
+                    (length, (candidate_from, candidate_to)),
+                    shape=(n_points, n_points),
+                )
+            )
+
+            # Points at the same location are left out of the triangulation,
+            # and then all pairs of points are considered.
+            if tree.nnz == n_points - 1:
                 break
-            else:
-                for node_label in grid.get_nodes().index:
-                    grid.set_segment(node_label, old_segment)
+            candidates = None
 
-        segment_dict = {
-            index: grid.get_nodes()["segment"][index]
-            for index in grid.get_nodes().index
-        }
+        return tree
+
+    def partition_consumers(self, grid: Grid, max_segment_size: int):
+        """
+        Splits the connected consumers into spatially compact segments with
+        balanced sizes using a recursive coordinate bisection.
 
-        grid.set_nodes(node_backup)
-        for index in segment_dict:
-            grid.set_segment(index, segment_dict[index])
+        Each segment is split along its wider extent until no segment holds
+        more than `max_segment_size` consumers. The label of the segment is
+        stored in the `segment` column of the nodes.
+
+        Parameters
+        ----------
+        grid (~grids.Grid):
+            Grid object.
+        max_segment_size (int):
+            Maximum number of consumers in each segment.
+
+        Return
+        ------
+        int
+            number of segments
+        """
+        consumers = grid.consumers()[grid.consumers()["is_connected"] == True]
+        coordinates = consumers[["x", "y"]].values
+
+        segments = []
+        remaining = [np.arange(consumers.shape[0])]
+        while len(remaining) > 0:
+            members = remaining.pop()
+            n_segments = int(np.ceil(len(members) / max_segment_size))
+            if n_segments <= 1:
+                segments.append(members)
+                continue
+
+            # Sort the consumers along the wider extent of the segment and
+            # split them in proportion to the number of final segments on
+            # each side, so that all final segments have similar sizes.
+            extent = np.ptp(coordinates[members], axis=0)
+            members = members[
+                np.argsort(coordinates[members, np.argmax(extent)], kind="stable")
+            ]
+            n_left = int(round(len(members) * (n_segments // 2) / n_segments))
+            remaining.extend([members[n_left:], members[:n_left]])
+
+        for segment, members in enumerate(segments):
+            grid.nodes.loc[consumers.index[members], "segment"] = str(segment)
+
+        return len(segments)
+
+    @timed("grid_optimizer.design_segmented_grid")
+    def design_segmented_grid(
+        self,
+        grid: Grid,
+        connection_cable_max_length: float,
+        distribution_cable_max_length: float,
+    ):
+        """
+        Designs the poles of a large settlement segment by segment.
+
+        The consumers are split into segments of at most `max_segment_size`
+        consumers. The poles of each segment are designed in parallel
+        processes and the segments are finally connected by the shortest
+        links between them.
+
+        Parameters
+        ----------
+        grid (~grids.Grid):
+            grid object containing only consumers with (x,y) coordinates
+        connection_cable_max_length: float
+            maximum allowed length of the `connection` cables [m]
+        distribution_cable_max_length: float
+            maximum allowed length of the `distribution` cables [m]
+        """
+
+        grid.clear_poles()
+        grid.clear_all_links()
+        n_segments = self.partition_consumers(
+            grid=grid, max_segment_size=self.max_segment_size
+        )
+
+        # Each segment gets its own grid object with the same parameters.
+        segment_grids = []
+        for segment in range(n_segments):
+            segment_grid = copy.copy(grid)
+            segment_grid.nodes = grid.nodes[
+                (grid.nodes["segment"] == str(segment))
+                & (grid.nodes["is_connected"] == True)
+            ].copy()
+            segment_grid.links = grid.links.copy()
+            segment_grid.ref_node = grid.ref_node.copy()
+            segment_grids.append(segment_grid)
+
+        with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+            segment_grids = list(
+                executor.map(
+                    design_segment,
+                    [self] * n_segments,
+                    segment_grids,
+                    [connection_cable_max_length] * n_segments,
+                    [distribution_cable_max_length] * n_segments,
+                )
+            )
+
+        # Poles and clusters are renumbered, so that their labels are unique
+        # in the entire grid.
+        nodes = [grid.nodes[grid.nodes["is_connected"] != True]]
+        links = []
+        n_poles = 0
+        n_clusters = 0
+        for segment, segment_grid in enumerate(segment_grids):
+            poles = segment_grid.poles().index
+            pole_labels = dict(
+                zip(poles, [f"p-{n_poles + i}" for i in range(len(poles))])
+            )
+            n_poles += len(poles)
+
+            is_cluster = segment_grid.nodes["cluster_label"] != 1000
+            segment_grid.nodes.loc[is_cluster, "cluster_label"] += n_clusters
+            n_clusters = segment_grid.nodes.loc[is_cluster, "cluster_label"].max() + 1
+            segment_grid.nodes.loc[poles, "segment"] = str(segment)
+            nodes.append(segment_grid.nodes.rename(index=pole_labels))
+
+            segment_grid.set_link_ends()
+            segment_links = segment_grid.links
+            node_from = segment_links["from_node"].replace(pole_labels).values
+            node_to = segment_links["to_node"].replace(pole_labels).values
+
+            # The ends of the `distribution` links must stay sorted after the
+            # poles are renamed.
+            is_swapped = (segment_links["link_type"] == "distribution").values & (
+                node_from > node_to
+            )
+            segment_links["from_node"] = np.where(is_swapped, node_to, node_from)
+            segment_links["to_node"] = np.where(is_swapped, node_from, node_to)
+            segment_links.index = (
+                "(" + segment_links["from_node"] + ", " + segment_links["to_node"] + ")"
+            )
+            links.append(segment_links)
+
+        grid.nodes = pd.concat(nodes)
+        grid.links = pd.concat(links)
+        grid.links.index.name = "label"
+
+        # Connect the segments with the shortest links between their poles.
+        self.add_distribution_links(
+            grid=grid,
+            new_links=self.reconnect_grid_poles(grid),
+            distribution_cable_max_length=distribution_cable_max_length,
+        )
 
     #  --------------------- K-MEANS CLUSTERING ---------------------#
+    @timed("grid_optimizer.kmeans_clustering")
     def kmeans_clustering(self, grid: Grid, n_clusters: int):
         """
         Uses a k-means clustering algorithm and returns the coordinates of the centroids.
 
+        If the clusters exceed the maximum number of connections of the poles,
+        they are obtained either by the constrained k-means
+        (`assignment="constrained"`) or by a k-means using the greedy
+        capacitated assignment (`assignment="greedy"`). In the latter case,
+        the gap to the exact assignment is stored in `assignment_gap`.
+
         Pamameters
         ----------
             grid (~grids.Grid):
@@ -648,13 +836,8 @@ class GridOptimizer(Optimizer):
         grid.clear_poles()
 
         # gets (x,y) coordinates of all nodes in the grid
-        nodes_coord = np.array(
-            [
-                [grid.nodes.x.loc[index], grid.nodes.y.loc[index]]
-                for index in grid.nodes.index
-                if grid.nodes.is_connected.loc[index] == True
-            ]
-        )
+        is_connected = (grid.nodes["is_connected"] == True).values
+        nodes_coord = grid.nodes.loc[is_connected, ["x", "y"]].values.astype(float)
 
         # features, true_labels = make_blobs(
         #    n_samples=200,
@@ -664,23 +847,50 @@ class GridOptimizer(Optimizer):
 
         # features = coord_nodes
 
-        # call kmeans clustering with constraints (min and max number of members in each cluster )
-        kmeans = KMeansConstrained(
-            n_clusters=n_clusters,
-            init="k-means++",  # 'k-means++' or 'random'
-            n_init=10,
-            max_iter=300,
-            tol=1e-4,
-            size_min=0,
-            size_max=grid.pole_max_connection,
-            random_state=0,
-        )
-
-        # fit clusters to the data
-        kmeans.fit(nodes_coord)
-
-        # coordinates of the centroids of the clusters
+        # Without a limit on the number of connections, or if the clusters of
+        # the plain k-means already meet this limit, the constraint does not
+        # bind and the costly constrained solver is not needed.
+        kmeans = self.unconstrained_kmeans(nodes_coord, n_clusters)
         centroids_coord = kmeans.cluster_centers_
+        nodes_cluster_labels = kmeans.labels_
+        if (grid.pole_max_connection > 0) and (
+            np.bincount(nodes_cluster_labels, minlength=n_clusters).max()
+            > grid.pole_max_connection
+        ):
+            if self.assignment == "greedy":
+                # k-means with the greedy capacitated assignment, starting
+                # from the clusters without size limit
+                centroids_coord, nodes_cluster_labels = capacitated_kmeans(
+                    consumers=nodes_coord,
+                    centers=centroids_coord,
+                    capacity=grid.pole_max_connection,
+                )
+                self.assignment_gap = assignment_gap(
+                    consumers=nodes_coord,
+                    poles=centroids_coord,
+                    capacity=grid.pole_max_connection,
+                    labels=nodes_cluster_labels,
+                )
+            elif self.assignment == "constrained":
+                # call kmeans clustering with constraints (min and max number
+                # of members in each cluster)
+                kmeans = k_means_constrained.KMeansConstrained(
+                    n_clusters=n_clusters,
+                    init="k-means++",  # 'k-means++' or 'random'
+                    n_init=10,
+                    max_iter=300,
+                    tol=1e-4,
+                    size_min=0,
+                    size_max=grid.pole_max_connection,
+                    random_state=0,
+                )
+
+                # fit clusters to the data
+                kmeans.fit(nodes_coord)
+                centroids_coord = kmeans.cluster_centers_
+                nodes_cluster_labels = kmeans.labels_
+            else:
+                raise Exception("Invalid value provided for assignment.")
 
         # add the obtained centroids as poles to the grid
         counter = 0
@@ -707,14 +917,54 @@ class GridOptimizer(Optimizer):
         #   + poles together
 
         # this parameter shows the label of the associated cluster to each node
-        nodes_cluster_labels = kmeans.predict(nodes_coord)
-        counter = 0
-        for node_label in grid.consumers().index:
-            if grid.nodes.is_connected.loc[node_label] == True:
-                grid.nodes.cluster_label.loc[node_label] = nodes_cluster_labels[counter]
-                counter += 1
-            else:
-                grid.nodes.cluster_label.loc[node_label] = "n.a."
+        consumers = grid.nodes["node_type"] == "consumer"
+        is_connected = grid.nodes["is_connected"] == True
+        grid.nodes.loc[consumers & ~is_connected, "cluster_label"] = "n.a."
+        grid.nodes.loc[
+            consumers & is_connected, "cluster_label"
+        ] = nodes_cluster_labels
+
+    def unconstrained_kmeans(self, nodes_coord, n_clusters: int):
+        """
+        Clusters the nodes using the k-means algorithm without any limit on
+        the size of the clusters.
+
+        For large numbers of nodes, the mini-batch variant is used.
+
+        Parameters
+        ----------
+        nodes_coord: numpy.ndarray
+            (x,y) coordinates of the nodes
+        n_clusters (int):
+            number of clusters (i.e., k-value) for the k-means clustering algorithm
+
+        Return
+        ------
+        fitted :class:`sklearn.cluster.KMeans` or
+        :class:`sklearn.cluster.MiniBatchKMeans` object
+        """
+        if nodes_coord.shape[0] >= MINI_BATCH_MIN_SAMPLES:
+            kmeans = sklearn_cluster.MiniBatchKMeans(
+                n_clusters=n_clusters,
+                init="k-means++",
+                n_init=3,
+                max_iter=300,
+                batch_size=4096,
+                tol=1e-4,
+                random_state=0,
+            )
+        else:
+            kmeans = sklearn_cluster.KMeans(
+                n_clusters=n_clusters,
+                init="k-means++",
+                n_init=10,
+                max_iter=300,
+                tol=1e-4,
+                algorithm="elkan",
+                random_state=0,
+            )
+
+        return kmeans.fit(nodes_coord)
 
     def find_opt_number_of_poles(self, grid: Grid, min_n_clusters: int):
         """
@@ -751,6 +1001,807 @@ class GridOptimizer(Optimizer):
 
         return number_of_poles
 
+    # ------------------------ GRID DESIGN ------------------------ #
+
+    @timed("grid_optimizer.design_grid")
+    def design_grid(
+        self,
+        grid: Grid,
+        connection_cable_max_length: float,
+        distribution_cable_max_length: float,
+    ):
+        """
+        Designs the entire grid from scratch: places the poles, connects
+        consumers and poles, splits too long distribution links and selects
+        the location of the power house.
+
+        If `max_segment_size` is given, settlements with more consumers are
+        split into segments, which are designed separately. Otherwise, all
+        consumers are designed at once.
+
+        Parameters
+        ----------
+        grid (~grids.Grid):
+            grid object containing only consumers with (x,y) coordinates
+        connection_cable_max_length: float
+            maximum allowed length of the `connection` cables [m]
+        distribution_cable_max_length: float
+            maximum allowed length of the `distribution` cables [m]
+        """
+
+        n_mg_consumers = grid.consumers()[
+            grid.consumers()["is_connected"] == True
+        ].shape[0]
+        if (self.max_segment_size is not None) and (
+            n_mg_consumers > self.max_segment_size
+        ):
+            self.design_segmented_grid(
+                grid=grid,
+                connection_cable_max_length=connection_cable_max_length,
+                distribution_cable_max_length=distribution_cable_max_length,
+            )
+        else:
+            self.design_poles(
+                grid=grid,
+                connection_cable_max_length=connection_cable_max_length,
+                distribution_cable_max_length=distribution_cable_max_length,
+            )
+
+        # Calculate distances of all poles from the load centroid.
+        grid.get_poles_distances_from_load_centroid()
+
+        # Find the location of the power house.
+        grid.select_location_of_power_house()
+
+    @timed("grid_optimizer.design_poles")
+    def design_poles(
+        self,
+        grid: Grid,
+        connection_cable_max_length: float,
+        distribution_cable_max_length: float,
+    ):
+        """
+        Places the poles of the grid, connects consumers and poles, and
+        splits too long distribution links.
+
+        Parameters
+        ----------
+        grid (~grids.Grid):
+            grid object containing only consumers with (x,y) coordinates
+        connection_cable_max_length: float
+            maximum allowed length of the `connection` cables [m]
+        distribution_cable_max_length: float
+            maximum allowed length of the `distribution` cables [m]
+        """
+
+        # calculate the minimum number of poles based on the
+        # maximum number of connectins at each pole
+        n_mg_consumers = grid.consumers()[
+            grid.consumers()["is_connected"] == True
+        ].shape[0]
+        if grid.pole_max_connection == 0:
+            min_number_of_poles = 1
+        else:
+            min_number_of_poles = int(
+                np.ceil(n_mg_consumers / (grid.pole_max_connection))
+            )
+
+        # ---------- MAX DISTANCE BETWEEN POLES AND CONSUMERS ----------
+        # First, the appropriate number of poles should be selected, to meet
+        # the constraint on the maximum distance between consumers and poles.
+        while True:
+            # Initial number of poles.
+            self.find_opt_number_of_poles(
+                grid=grid, min_n_clusters=min_number_of_poles
+            )
+
+            # Find those connections with constraint violation.
+            constraints_violation = grid.links[grid.links["link_type"] == "connection"]
+            constraints_violation = constraints_violation[
+                constraints_violation["length"] > connection_cable_max_length
+            ]
+
+            # Increase the number of poles if necessary.
+            if constraints_violation.shape[0] > 0:
+                min_number_of_poles += 1
+            else:
+                break
+
+        # Improve the positions of the poles by simulated annealing.
+        if self.annealing_chains > 0:
+            self.anneal_poles(
+                grid=grid,
+                connection_cable_max_length=connection_cable_max_length,
+                distribution_cable_max_length=distribution_cable_max_length,
+            )
+
+        # ----------------- MAX DISTANCE BETWEEN POLES -----------------
+        # Find the connection links in the network with lengths greater than the
+        # maximum allowed length for `connection` cables, specified by the user.
+        long_links = grid.find_index_longest_distribution_link(
+            max_distance_dist_links=distribution_cable_max_length,
+        )
+
+        # Add poles to the identified long `distribution` links, so that the
+        # distance between all poles remains below the maximum allowed distance.
+        grid.add_fixed_poles_on_long_links(
+            long_links=long_links,
+            max_allowed_distance=distribution_cable_max_length,
+        )
+
+        # Update the (lon,lat) coordinates based on the newly inserted poles
+        # which only have (x,y) coordinates.
+        grid.convert_lonlat_xy(inverse=True)
+
+        # Connect all poles together using the minimum spanning tree algorithm.
+        self.connect_grid_poles(grid, long_links=long_links)
+
+    @timed("grid_optimizer.update_grid")
+    def update_grid(
+        self,
+        grid: Grid,
+        added_nodes,
+        removed_nodes,
+        connection_cable_max_length: float,
+        distribution_cable_max_length: float,
+        max_cost_increase: float = 0.05,
+        max_delta_share: float = 0.25,
+    ):
+        """
+        Updates a previously designed grid for a set of added and removed
+        consumers, instead of designing the whole grid again.
+
+        New consumers are assigned to the nearest pole with free capacity
+        within the maximum connection length, or get a new pole otherwise.
+        Only the clusters which gained or lost consumers are re-centered and
+        reconnected. If poles are added or removed, the existing
+        `distribution` links are kept and the resulting components of the
+        network are reconnected with the shortest possible links.
+
+        Parameters
+        ----------
+        grid (~grids.Grid):
+            grid object obtained from a previous optimization, which is
+            modified in place
+        added_nodes: :class:`pandas.core.frame.DataFrame`
+            consumers to be added to the grid, see `Grid.find_consumer_delta`
+        removed_nodes: list
+            labels of the consumers to be removed from the grid
+        connection_cable_max_length: float
+            maximum allowed length of the `connection` cables [m]
+        distribution_cable_max_length: float
+            maximum allowed length of the `distribution` cables [m]
+        max_cost_increase: float
+            maximum allowed relative increase of the grid cost per consumer
+            compared to the previous grid
+        max_delta_share: float
+            maximum number of changed consumers relative to the number of
+            consumers in the previous grid
+
+        Return
+        ------
+        bool
+            True if the grid was updated. False if the change is too large,
+            a constraint cannot be met locally or the quality of the grid
+            degrades too much. In this case, the grid is left in an undefined
+            state and must be designed from scratch.
+        """
+
+        consumers = grid.consumers()
+        n_previous_consumers = consumers.shape[0]
+        n_changes = len(added_nodes) + len(removed_nodes)
+        if n_changes == 0:
+            return True
+        if n_changes > max_delta_share * n_previous_consumers:
+            return False
+        if (grid.nodes["node_type"] == "power-house").sum() != 1:
+            return False
+        previous_cost_per_consumer = grid.cost() / n_previous_consumers
+
+        grid.set_link_ends()
+        poles = grid.poles()
+        cluster_poles = poles[poles["type_fixed"] == False]
+        pole_of_cluster = dict(zip(cluster_poles["cluster_label"], cluster_poles.index))
+        cluster_size = consumers["cluster_label"].value_counts().to_dict()
+        previous_cluster_size = dict(cluster_size)
+        affected_clusters = set()
+        topology_changed = False
+
+        # ------------------- REMOVED CONSUMERS -------------------
+        for label in removed_nodes:
+            cluster = grid.nodes.cluster_label.loc[label]
+            cluster_size[cluster] -= 1
+            affected_clusters.add(cluster)
+        grid.nodes = grid.nodes.drop(index=removed_nodes)
+        grid.links = grid.links[~grid.links["to_node"].isin(removed_nodes)]
+
+        # -------------------- ADDED CONSUMERS --------------------
+        x_added, y_added = grid.project_lonlat_xy(
+            added_nodes["longitude"], added_nodes["latitude"]
+        )
+        next_consumer = max([int(label) for label in consumers.index] + [-1]) + 1
+        next_pole = grid.get_next_pole_id()
+        next_cluster = int(max(pole_of_cluster.keys())) + 1
+
+        tree = cKDTree(grid.nodes.loc[list(pole_of_cluster.values()), ["x", "y"]])
+        tree_clusters = list(pole_of_cluster.keys())
+        for i, node_index in enumerate(added_nodes.index):
+            distances, positions = tree.query(
+                [x_added[i], y_added[i]], k=min(8, len(tree_clusters))
+            )
+
+            # Choose the nearest pole which is close enough and still has a
+            # free connection.
+            cluster = None
+            for distance, position in zip(
+                np.atleast_1d(distances), np.atleast_1d(positions)
+            ):
+                if distance > connection_cable_max_length:
+                    break
+                if (grid.pole_max_connection == 0) or (
+                    cluster_size.get(tree_clusters[position], 0)
+                    < grid.pole_max_connection
+                ):
+                    cluster = tree_clusters[position]
+                    break
+
+            # Otherwise, a new pole is placed at the location of the consumer.
+            if cluster is None:
+                cluster = next_cluster
+                pole_of_cluster[cluster] = f"p-{next_pole}"
+                grid.add_node(
+                    label=f"p-{next_pole}",
+                    x=x_added[i],
+                    y=y_added[i],
+                    node_type="pole",
+                    consumer_type="n.a.",
+                    consumer_detail="n.a.",
+                    is_connected=True,
+                    how_added="k-means",
+                    cluster_label=cluster,
+                )
+                next_pole += 1
+                next_cluster += 1
+                topology_changed = True
+                tree_clusters = list(pole_of_cluster.keys())
+                tree = cKDTree(
+                    grid.nodes.loc[list(pole_of_cluster.values()), ["x", "y"]]
+                )
+
+            grid.add_node(
+                label=str(next_consumer),
+                latitude=added_nodes.latitude[node_index],
+                longitude=added_nodes.longitude[node_index],
+                x=x_added[i],
+                y=y_added[i],
+                node_type="consumer",
+                is_connected=True,
+                peak_demand=added_nodes.peak_demand[node_index],
+                average_consumption=added_nodes.average_consumption[node_index],
+                surface_area=added_nodes.surface_area[node_index],
+                cluster_label=cluster,
+            )
+            next_consumer += 1
+            cluster_size[cluster] = cluster_size.get(cluster, 0) + 1
+            affected_clusters.add(cluster)
+
+        # -------------------- EMPTY CLUSTERS ---------------------
+        # Poles without consumers are removed, except for the power house.
+        removed_poles = [
+            pole_of_cluster[cluster]
+            for cluster in affected_clusters
+            if cluster_size.get(cluster, 0) == 0
+            and grid.nodes.node_type.loc[pole_of_cluster[cluster]] == "pole"
+        ]
+        while len(removed_poles) > 0:
+            topology_changed = True
+            for pole in removed_poles:
+                pole_of_cluster.pop(grid.nodes.cluster_label.loc[pole], None)
+            grid.nodes = grid.nodes.drop(index=removed_poles)
+            grid.links = grid.links[
+                ~(
+                    grid.links["from_node"].isin(removed_poles)
+                    | grid.links["to_node"].isin(removed_poles)
+                )
+            ]
+
+            # Poles added on long links which became a dead end are removed
+            # as well.
+            distribution_links = grid.links[grid.links["link_type"] == "distribution"]
+            degree = pd.concat(
+                [distribution_links["from_node"], distribution_links["to_node"]]
+            ).value_counts()
+            fixed_poles = grid.poles()[grid.poles()["type_fixed"] == True].index
+            removed_poles = [pole for pole in fixed_poles if degree.get(pole, 0) <= 1]
+
+        # ------------------- AFFECTED CLUSTERS -------------------
+        # Move the poles of the affected clusters to the centroid of their
+        # consumers, as long as all consumers and neighbouring poles remain
+        # close enough.
+        affected_poles = [
+            pole_of_cluster[cluster]
+            for cluster in affected_clusters
+            if cluster in pole_of_cluster
+        ]
+        consumers = grid.consumers()
+        distribution_links = grid.links[grid.links["link_type"] == "distribution"]
+        for pole in affected_poles:
+            members = consumers[
+                consumers["cluster_label"] == grid.nodes.cluster_label.loc[pole]
+            ]
+            if members.shape[0] == 0:
+                continue
+            neighbours = pd.concat(
+                [
+                    distribution_links["to_node"][
+                        distribution_links["from_node"] == pole
+                    ],
+                    distribution_links["from_node"][
+                        distribution_links["to_node"] == pole
+                    ],
+                ]
+            )
+            centroid = members[["x", "y"]].mean().values
+            distances = np.sqrt(
+                ((members[["x", "y"]].values - centroid) ** 2).sum(axis=1)
+            )
+            pole_distances = np.sqrt(
+                ((grid.nodes.loc[neighbours, ["x", "y"]].values - centroid) ** 2).sum(
+                    axis=1
+                )
+            )
+            if (distances.max() <= connection_cable_max_length) and (
+                pole_distances.max(initial=0) <= distribution_cable_max_length
+            ):
+                grid.nodes.loc[pole, ["x", "y"]] = centroid
+        grid.convert_lonlat_xy(inverse=True)
+
+        # Reconnect the consumers of the affected clusters.
+        members = consumers[
+            consumers["cluster_label"].isin(
+                [grid.nodes.cluster_label.loc[pole] for pole in affected_poles]
+            )
+        ]
+        grid.links = grid.links[~grid.links["to_node"].isin(members.index)]
+        grid.add_links_bulk(
+            label_node_from=[
+                pole_of_cluster[cluster] for cluster in members["cluster_label"]
+            ],
+            label_node_to=members.index,
+            link_type="connection",
+        )
+        grid.update_link_geometry(affected_poles)
+
+        # ---------------------- REPAIR MST -----------------------
+        if topology_changed:
+            self.add_distribution_links(
+                grid=grid,
+                new_links=self.reconnect_grid_poles(grid),
+                distribution_cable_max_length=distribution_cable_max_length,
+            )
+
+        distribution_links = grid.links[grid.links["link_type"] == "distribution"]
+        if (distribution_links["length"] > distribution_cable_max_length).any():
+            return False
+
+        # --------------- CAPACITIES AND COSTS ---------------
+        if topology_changed:
+            grid.find_capacity_of_each_link()
+        else:
+            consumers = grid.consumers()
+            grid.nodes.loc[consumers.index, "n_connection_links"] = 1
+            grid.nodes.loc[consumers.index, "parent"] = [
+                pole_of_cluster[cluster] for cluster in consumers["cluster_label"]
+            ]
+            for cluster in affected_clusters:
+                pole = pole_of_cluster[cluster]
+                grid.nodes.at[pole, "n_connection_links"] = cluster_size[cluster]
+                grid.update_capacity_along_path(
+                    pole_label=pole,
+                    n_consumers=cluster_size[cluster]
+                    - previous_cluster_size.get(cluster, 0),
+                )
+
+        n_consumers = grid.consumers().shape[0]
+        if n_consumers == 0:
+            return False
+        cost_per_consumer = grid.cost() / n_consumers
+
+        return cost_per_consumer <= (1 + max_cost_increase) * previous_cost_per_consumer
+
+    def add_distribution_links(
+        self, grid: Grid, new_links, distribution_cable_max_length: float
+    ):
+        """
+        Adds new `distribution` links between poles. Links longer than the
+        maximum allowed distance are split by placing additional poles on
+        them.
+
+        Parameters
+        ----------
+        grid (~grids.Grid):
+            grid object
+        new_links: list
+            (label_node_from, label_node_to) tuples of the new links
+        distribution_cable_max_length: float
+            maximum allowed length of the `distribution` cables [m]
+        """
+
+        new_links = list(new_links)
+        if len(new_links) == 0:
+            return
+
+        label_node_from = [label_node_from for label_node_from, _ in new_links]
+        label_node_to = [label_node_to for _, label_node_to in new_links]
+        added_poles, n_added_poles = grid.add_fixed_poles_on_lines(
+            start=grid.nodes.loc[label_node_from, ["x", "y"]].values,
+            end=grid.nodes.loc[label_node_to, ["x", "y"]].values,
+            max_allowed_distance=distribution_cable_max_length,
+            how_added="long-distance",
+        )
+        grid.convert_lonlat_xy(inverse=True)
+
+        # Each new link is replaced by a chain through the poles added on it.
+        chains = [
+            [label_node_from, *poles, label_node_to]
+            for (label_node_from, label_node_to), poles in zip(
+                new_links, np.split(added_poles, np.cumsum(n_added_poles)[:-1])
+            )
+        ]
+        grid.add_links_bulk(
+            label_node_from=[label for chain in chains for label in chain[:-1]],
+            label_node_to=[label for chain in chains for label in chain[1:]],
+            link_type="distribution",
+        )
+
+    def reconnect_grid_poles(self, grid: Grid):
+        """
+        Finds the shortest links that reconnect all components of the
+        `distribution` network, while keeping all existing links.
+
+        Parameters
+        ----------
+        grid (~grids.Grid):
+            grid object
+
+        Return
+        ------
+        list
+            (label_node_from, label_node_to) tuples of the new links
+        """
+
+        poles = grid.poles()
+        n_poles = poles.shape[0]
+        pole_position = pd.Series(np.arange(n_poles), index=poles.index)
+        distribution_links = grid.links[grid.links["link_type"] == "distribution"]
+        rows = pole_position.reindex(distribution_links["from_node"]).values
+        cols = pole_position.reindex(distribution_links["to_node"]).values
+
+        existing_links = csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(n_poles, n_poles)
+        )
+        n_components, component = connected_components(existing_links, directed=False)
+        if n_components == 1:
+            return []
+
+        # Candidate links only between the nearest neighbours of each pole.
+        # If they do not connect all components, all pairs of poles are used.
+        coordinates = poles[["x", "y"]].values
+        for k in [min(8, n_poles), n_poles]:
+            distances, neighbours = cKDTree(coordinates).query(coordinates, k=k)
+            candidate_from = np.repeat(np.arange(n_poles), k)
+            candidate_to = neighbours.ravel()
+            candidate_length = distances.ravel()
+            is_crossing = component[candidate_from] != component[candidate_to]
+
+            # The existing links get a negligible weight, so that they are
+            # always part of the minimum spanning tree.
+            graph = csr_matrix(
+                (
+                    np.concatenate(
+                        [np.full(len(rows), 1e-9), candidate_length[is_crossing]]
+                    ),
+                    (
+                        np.concatenate([rows, candidate_from[is_crossing]]),
+                        np.concatenate([cols, candidate_to[is_crossing]]),
+                    ),
+                ),
+                shape=(n_poles, n_poles),
+            )
+            tree = minimum_spanning_tree(graph).tocoo()
+            if len(tree.row) == n_poles - 1:
+                break
+
+        new_links = component[tree.row] != component[tree.col]
+        return [
+            tuple(sorted([poles.index[i], poles.index[j]]))
+            for i, j in zip(tree.row[new_links], tree.col[new_links])
+        ]
+
+    # ------------------------- ANNEALING -------------------------#
+
+    @timed("grid_optimizer.anneal_poles")
+    def anneal_poles(
+        self,
+        grid: Grid,
+        connection_cable_max_length: float,
+        distribution_cable_max_length: float,
+    ):
+        """
+        Improves the poles obtained from the k-means clustering by simulated
+        annealing, moving poles and consumers between neighbouring poles.
+
+        Several independent chains with different seeds are run in parallel,
+        and the grid is updated with the best layout found by any of them.
+        The cost of all chains and the convergence trace of the best chain
+        are stored in `annealing_result`.
+
+        Parameters
+        ----------
+        grid (~grids.Grid):
+            grid object with consumers assigned to the k-means poles
+        connection_cable_max_length: float
+            maximum allowed length of the `connection` cables [m]
+        distribution_cable_max_length: float
+            maximum allowed length of the `distribution` cables [m]
+        """
+        start_time = time.time()
+        poles = grid.poles()[grid.poles()["type_fixed"] == False]
+        consumers = grid.consumers()[
+            grid.consumers()["cluster_label"].isin(poles["cluster_label"])
+        ]
+        if poles.shape[0] < 2:
+            return
+
+        # The consumers are labelled by the position of their pole.
+        pole_position = pd.Series(
+            np.arange(poles.shape[0]), index=poles["cluster_label"].values
+        )
+        kwargs = dict(
+            consumers=consumers[["x", "y"]].values.astype(float),
+            poles=poles[["x", "y"]].values.astype(float),
+            labels=pole_position.loc[consumers["cluster_label"]].values,
+            capacity=grid.pole_max_connection,
+            create_tree=self.create_tree_of_points,
+            epc_connection_cable=grid.epc_connection_cable,
+            epc_distribution_cable=grid.epc_distribution_cable,
+            epc_pole=grid.epc_pole,
+            connection_cable_max_length=connection_cable_max_length,
+            distribution_cable_max_length=distribution_cable_max_length,
+            n_iterations=self.annealing_iterations,
+        )
+
+        if self.annealing_chains == 1:
+            chains = [anneal_poles(**kwargs, seed=0)]
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                futures = [
+                    executor.submit(anneal_poles, **kwargs, seed=seed)
+                    for seed in range(self.annealing_chains)
+                ]
+                chains = [future.result() for future in futures]
+
+        best = min(chains, key=lambda chain: chain["cost"])
+        self.annealing_result = {
+            "initial_cost": best["initial_cost"],
+            "cost": best["cost"],
+            "chain_costs": [chain["cost"] for chain in chains],
+            "trace": best["trace"],
+            "time": time.time() - start_time,
+        }
+        if best["cost"] >= best["initial_cost"]:
+            return
+
+        grid.nodes.loc[poles.index, "x"] = best["poles"][:, 0]
+        grid.nodes.loc[poles.index, "y"] = best["poles"][:, 1]
+        cluster_labels = poles["cluster_label"].values[best["labels"]]
+        grid.nodes.loc[consumers.index, "cluster_label"] = cluster_labels
+        grid.convert_lonlat_xy(inverse=True)
+
+        self.create_minimum_spanning_tree(grid)
+        self.connect_grid_consumers(grid)
+        self.connect_grid_poles(grid)
+
+    # --------------------- VOLTAGE DROP ---------------------#
+
+    @timed("grid_optimizer.repair_voltage_drop")
+    def repair_voltage_drop(
+        self,
+        grid: Grid,
+        distribution_cable_max_length: float,
+        max_iterations: int = 50,
+        max_time: float = 10,
+    ):
+        """
+        Changes the grid until the voltage drop at all nodes is within the
+        maximum allowed voltage drop, or until the maximum number of
+        iterations or the maximum time is reached.
+
+        In each iteration, the node with the largest voltage drop is
+        considered, and the repair with the lower cost per ohm removed from
+        its route to the power house is applied:
+            + upgrading the cross-section of the cables on the route, starting
+              with the cheapest reduction of the resistance, or
+            + adding a new feeder from the power house to one of the poles on
+              the route, which replaces the link between the pole and its
+              parent.
+
+        Parameters
+        ----------
+        grid (~grids.Grid):
+            grid object including the power house
+        distribution_cable_max_length: float
+            maximum allowed length of the `distribution` cables [m]
+        max_iterations: int
+            maximum number of repairs
+        max_time: float
+            maximum time for all repairs [s]
+
+        Return
+        ------
+        dict
+            number of iterations, upgraded cables and added feeders, the
+            number of remaining violations and the time of the repair [s],
+            as builtin types which are returned by the API
+        """
+        start_time = time.monotonic()
+        summary = {"n_iterations": 0, "n_upgraded_cables": 0, "n_feeders": 0}
+        cables = grid.cables.set_index("cable_type")
+        max_resistance = (
+            grid.max_voltage_drop / 100 * grid.voltage / grid.max_current
+        )
+
+        grid.find_capacity_of_each_link()
+        while True:
+            route_resistance, _ = grid.sum_link_values_from_power_house(
+                grid.get_link_resistance()
+            )
+            excess = np.nan_to_num(route_resistance[:, 0] - max_resistance, nan=0)
+            summary["n_violations"] = int((excess > 0).sum())
+            if (
+                (summary["n_violations"] == 0)
+                or (summary["n_iterations"] >= max_iterations)
+                or (time.monotonic() - start_time >= max_time)
+            ):
+                break
+            summary["n_iterations"] += 1
+
+            # Route from the power house to the node with the largest voltage
+            # drop and the positions of the links on this route.
+            worst = np.argmax(excess)
+            route = [grid.nodes.index[worst]]
+            while grid.nodes.at[route[-1], "parent"] not in ["none", "unknown"]:
+                route.append(grid.nodes.at[route[-1], "parent"])
+            route = np.array(route[::-1], dtype=object)
+            link_ends = pd.MultiIndex.from_arrays(
+                [grid.links["from_node"], grid.links["to_node"]]
+            )
+            links = link_ends.get_indexer(
+                pd.MultiIndex.from_arrays([route[:-1], route[1:]])
+            )
+            links = np.where(
+                links >= 0,
+                links,
+                link_ends.get_indexer(
+                    pd.MultiIndex.from_arrays([route[1:], route[:-1]])
+                ),
+            )
+
+            # ----------------- UPGRADE CABLES -----------------
+            link_type = grid.links["link_type"].values[links]
+            length = grid.links["length"].values[links]
+            section = grid.get_link_section_area()[links]
+            next_section = np.array(
+                [
+                    min([area for area in CABLE_SECTIONS if area > link_section])
+                    if link_section < max(CABLE_SECTIONS)
+                    else np.nan
+                    for link_section in section
+                ]
+            )
+            with np.errstate(invalid="ignore"):
+                upgrade_reduction = (
+                    cables["resistivity"].reindex(link_type).values
+                    * 2
+                    * length
+                    * (1 / section - 1 / next_section)
+                )
+            upgrade_cost = (
+                np.where(
+                    link_type == "distribution",
+                    grid.epc_distribution_cable,
+                    grid.epc_connection_cable,
+                )
+                * length
+                * (next_section - section)
+                / cables["section_area"].reindex(link_type).values
+            )
+            upgrades = np.flatnonzero(np.nan_to_num(upgrade_reduction) > 0)
+            upgrades = upgrades[
+                np.argsort(upgrade_cost[upgrades] / upgrade_reduction[upgrades])
+            ]
+            n_upgrades = min(
+                int(
+                    np.searchsorted(
+                        np.cumsum(upgrade_reduction[upgrades]), excess[worst]
+                    )
+                )
+                + 1,
+                len(upgrades),
+            )
+            upgrades = upgrades[:n_upgrades]
+            upgrade_ratio = (
+                upgrade_cost[upgrades].sum()
+                / min(upgrade_reduction[upgrades].sum(), excess[worst])
+                if n_upgrades > 0
+                else np.inf
+            )
+
+            # ----------------- ADD FEEDER -----------------
+            # Poles on the route, which are not yet connected directly to the
+            # power house.
+            route_positions = grid.nodes.index.get_indexer(route)
+            candidates = np.arange(2, len(route))
+            candidates = candidates[
+                grid.nodes["node_type"].values[route_positions[candidates]]
+                == "pole"
+            ]
+            coordinates = grid.nodes[["x", "y"]].values
+            feeder_length = np.sqrt(
+                (
+                    (
+                        coordinates[route_positions[candidates]]
+                        - coordinates[route_positions[0]]
+                    )
+                    ** 2
+                ).sum(axis=1)
+            )
+            feeder_reduction = route_resistance[
+                route_positions[candidates], 0
+            ] - (
+                cables.at["distribution", "resistivity"]
+                * 2
+                * feeder_length
+                / cables.at["distribution", "section_area"]
+            )
+            feeder_cost = (
+                grid.epc_distribution_cable
+                * (feeder_length - grid.links["length"].values[links[candidates - 1]])
+                + grid.epc_pole
+                * np.maximum(
+                    np.ceil(feeder_length / distribution_cable_max_length) - 1, 0
+                )
+            )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                feeder_ratio = feeder_cost / np.minimum(
+                    feeder_reduction, excess[worst]
+                )
+            feeder_ratio[feeder_reduction <= 0] = np.inf
+
+            if (len(candidates) > 0) and (feeder_ratio.min() < upgrade_ratio):
+                feeder = np.argmin(feeder_ratio)
+                grid.links = grid.links.drop(
+                    grid.links.index[links[candidates[feeder] - 1]]
+                )
+                self.add_distribution_links(
+                    grid=grid,
+                    new_links=[(route[0], route[candidates[feeder]])],
+                    distribution_cable_max_length=distribution_cable_max_length,
+                )
+                grid.find_capacity_of_each_link()
+                summary["n_feeders"] += 1
+            elif n_upgrades > 0:
+                grid.links.loc[
+                    grid.links.index[links[upgrades]], "section_area"
+                ] = next_section[upgrades]
+                summary["n_upgraded_cables"] += n_upgrades
+            else:
+                break
+
+        summary["time"] = time.monotonic() - start_time
+
+        return summary
+
     # -----------------------REMOVE NODE-------------------------#
 
     def remove_last_node(self, grid: Grid):
@@ -801,6 +1852,41 @@ class GridOptimizer(Optimizer):
                         )
 
 
+def design_segment(
+    optimizer: GridOptimizer,
+    grid: Grid,
+    connection_cable_max_length: float,
+    distribution_cable_max_length: float,
+):
+    """
+    Designs the poles of one segment of a grid. This function is executed
+    in a separate process by `GridOptimizer.design_segmented_grid`.
+
+    Parameters
+    ----------
+    optimizer (~optimizer.GridOptimizer):
+        grid optimizer object
+    grid (~grids.Grid):
+        grid object containing only the consumers of the segment
+    connection_cable_max_length: float
+        maximum allowed length of the `connection` cables [m]
+    distribution_cable_max_length: float
+        maximum allowed length of the `distribution` cables [m]
+
+    Return
+    ------
+    (~grids.Grid)
+        grid object of the segment including its poles and links
+    """
+    optimizer.design_poles(
+        grid=grid,
+        connection_cable_max_length=connection_cable_max_length,
+        distribution_cable_max_length=distribution_cable_max_length,
+    )
+
+    return grid
+
+
 class EnergySystemOptimizer(Optimizer):
     """
     This class includes:
@@ -881,9 +1967,9 @@ class EnergySystemOptimizer(Optimizer):
         shortage={
             "settings": {"is_selected": True},
             "parameters": {
-                "max_total": 10,
-                "max_timestep": 50,
-                "penalty_cost": 0.3,
+                "max_shortage_total": 0.1,
+                "max_shortage_timestep": 0.5,
+                "shortage_penalty_cost": 0.3,
             },
         },
     ):
@@ -914,7 +2000,7 @@ class EnergySystemOptimizer(Optimizer):
         self.end_datetime = self.start_datetime + timedelta(days=int(self.n_days))
 
     def import_data(self):
-        data = pd.read_csv(filepath_or_buffer=self.path_data)
+        data = read_timeseries(self.path_data)
         data.index = pd.date_range(
             start=self.start_datetime, periods=len(data), freq="H"
         )
@@ -927,6 +2013,19 @@ class EnergySystemOptimizer(Optimizer):
         self.demand_peak = self.demand.max()
 
     def optimize_energy_system(self):
+        model = self.build_model()
+        self.solve_model(model)
+
+    def build_model(self):
+        """
+        Builds the optimization model of the energy system without solving
+        it.
+
+        Return
+        ------
+        class:`oemof.solph.Model`
+            optimization model of the energy system
+        """
         self.create_datetime_objects()
         self.import_data()
 
@@ -1306,6 +2405,20 @@ class EnergySystemOptimizer(Optimizer):
         #     rule=max_surplus_electricity_total_rule
         # )
 
+        return model
+
+    def solve_model(self, model, tee=True):
+        """
+        Solves the optimization model of the energy system and processes the
+        results.
+
+        Parameters
+        ----------
+        model: class:`oemof.solph.Model`
+            optimization model obtained from `build_model`
+        tee: bool
+            if true, the output of the solver is shown
+        """
         # optimize the energy system
         # gurobi --> 'MipGap': '0.01'
         # cbc --> 'ratioGap': '0.01'
@@ -1313,10 +2426,10 @@ class EnergySystemOptimizer(Optimizer):
 
         model.solve(
             solver=self.solver,
-            solve_kwargs={"tee": True},
-            cmdline_options=solver_option[self.solver],
+            solve_kwargs={"tee": tee},
+            cmdline_options=solver_option.get(self.solver, {}),
         )
-        energy_system.results["meta"] = solph.processing.meta_results(model)
+        model.es.results["meta"] = solph.processing.meta_results(model)
         self.results_main = solph.processing.results(model)
 
         self.process_results()
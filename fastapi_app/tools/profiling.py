@@ -0,0 +1,234 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# prefix of the names of all exported metrics
+METRICS_PREFIX = "offgrid_planner"
+
+# The memory allocated inside each stage is only measured, if `tracemalloc`
+# is tracing, since it slows down all allocations. It is started on import
+# if the environment variable `OFFGRID_PLANNER_TRACE_MEMORY` is set to 1.
+if os.environ.get("OFFGRID_PLANNER_TRACE_MEMORY", "0") == "1":
+    tracemalloc.start()
+
+# accumulated wall time [s], number of calls and the largest peak of the
+# memory allocated inside a single call [bytes] of each stage since the
+# start of the process
+_stages = {}
+_lock = threading.Lock()
+
+# timings of the stages of the current request, if they are collected
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+# memory at the start and peak so far of the enclosing spans [bytes]
+_memory_frames = contextvars.ContextVar("memory_frames", default=())
+
+
+def process_max_rss():
+    """
+    Returns the peak resident set size of the process since its start
+    [bytes], or None if it cannot be determined on this platform.
+    """
+    if resource is None:
+        return None
+    # `ru_maxrss` is given in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _start_memory_frame():
+    """
+    Starts measuring the peak of the memory allocated inside a span. The
+    peak of `tracemalloc` is reset, so the peak so far is first passed to the
+    enclosing span.
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    frames = _memory_frames.get()
+    if frames:
+        frames[-1]["peak"] = max(frames[-1]["peak"], peak)
+    tracemalloc.reset_peak()
+    frame = {"start": current, "peak": current}
+    token = _memory_frames.set(frames + (frame,))
+    return frame, token
+
+
+def _stop_memory_frame(frame, token):
+    """
+    Returns the peak of the memory allocated inside a span [bytes] and passes
+    it to the enclosing span.
+    """
+    frame["peak"] = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+    _memory_frames.reset(token)
+    frames = _memory_frames.get()
+    if frames:
+        frames[-1]["peak"] = max(frames[-1]["peak"], frame["peak"])
+    return frame["peak"] - frame["start"]
+
+
+def _add_stage(name, elapsed_time, calls, memory):
+    with _lock:
+        stage = _stages.setdefault(
+            name, {"time": 0.0, "calls": 0, "peak_memory": None}
+        )
+        stage["time"] += elapsed_time
+        stage["calls"] += calls
+        if memory is not None:
+            stage["peak_memory"] = max(stage["peak_memory"] or 0, memory)
+
+    request_timings = _request_timings.get()
+    if request_timings is not None:
+        timing = request_timings.setdefault(name, {"time": 0.0, "calls": 0})
+        timing["time"] += elapsed_time
+        timing["calls"] += calls
+        if memory is not None:
+            timing["peak_memory"] = max(timing.get("peak_memory", 0), memory)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Measures the wall time of a stage and adds it to the statistics of the
+    process and, if collected, to the timings of the current request.
+
+    If `tracemalloc` is tracing, the peak of the memory allocated inside the
+    span is measured as well. Allocations of other threads running at the
+    same time are included.
+
+    Parameters
+    ----------
+    name (str):
+        name of the stage, e.g. 'grid_optimizer.kmeans_clustering'.
+    """
+    memory_frame = _start_memory_frame() if tracemalloc.is_tracing() else None
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_time = time.perf_counter() - start_time
+        memory = None
+        if memory_frame is not None and tracemalloc.is_tracing():
+            memory = _stop_memory_frame(*memory_frame)
+        _add_stage(name, elapsed_time, 1, memory)
+
+
+def timed(name: str):
+    """
+    Decorator measuring each call of a function as a stage with the given
+    name.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def collect_timings():
+    """
+    Collects the timings of all stages inside the block, e.g. during one
+    request. The dictionary yielded by the context manager is filled with
+    the wall time, the number of calls and, if measured, the peak memory of
+    each stage.
+    """
+    request_timings = {}
+    token = _request_timings.set(request_timings)
+    try:
+        yield request_timings
+    finally:
+        _request_timings.reset(token)
+
+
+def add_timings(timings: dict):
+    """
+    Adds the timings of stages measured in another process, e.g. in a worker
+    of the optimizations, to the statistics of this process and, if
+    collected, to the timings of the current request.
+
+    Parameters
+    ----------
+    timings (dict):
+        wall time, number of calls and, if measured, peak memory of each
+        stage, as collected by `collect_timings`.
+    """
+    for name, timing in timings.items():
+        _add_stage(
+            name, timing["time"], timing["calls"], timing.get("peak_memory")
+        )
+
+
+def stage_statistics():
+    """
+    Returns a copy of the statistics of all stages since the start of the
+    process.
+    """
+    with _lock:
+        return {name: dict(stage) for name, stage in _stages.items()}
+
+
+def reset_statistics():
+    """
+    Removes the statistics of all stages.
+    """
+    with _lock:
+        _stages.clear()
+
+
+def prometheus_metrics():
+    """
+    Formats the statistics of all stages in the Prometheus text format.
+
+    Output
+    ------
+    (str): wall time, number of calls and, if measured, peak memory of each
+        stage, and the peak resident memory of the process.
+    """
+    statistics = stage_statistics()
+    metrics = [
+        (
+            "stage_seconds_total",
+            "counter",
+            "Total wall time spent in each stage.",
+            "time",
+        ),
+        ("stage_calls_total", "counter", "Number of calls of each stage.", "calls"),
+        (
+            "stage_peak_memory_bytes",
+            "gauge",
+            "Largest peak of the memory allocated inside a single call of each "
+            "stage (only measured with tracemalloc).",
+            "peak_memory",
+        ),
+    ]
+
+    lines = []
+    max_rss = process_max_rss()
+    if max_rss is not None:
+        name = f"{METRICS_PREFIX}_process_max_rss_bytes"
+        lines.append(f"# HELP {name} Peak resident memory of the process.")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {max_rss}")
+    for metric, metric_type, description, key in metrics:
+        name = f"{METRICS_PREFIX}_{metric}"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for stage, values in sorted(statistics.items()):
+            if values[key] is None:
+                continue
+            stage_label = stage.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'{name}{{stage="{stage_label}"}} {values[key]}')
+
+    return "\n".join(lines) + "\n"
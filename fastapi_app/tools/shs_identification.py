@@ -2,8 +2,11 @@ import pandas as pd
 import numpy as np
 from scipy.sparse import csr_matrix
 from scipy.sparse.csgraph import minimum_spanning_tree
-import networkx as nx
 import time
+from fastapi_app.tools.lazy import LazyModule
+
+# networkx is only imported when the betweenness centrality is computed
+nx = LazyModule("networkx")
 
 # --------------- EDIDTING nodes_df ----------------#
 
@@ -87,7 +90,7 @@ def add_node(nodes_df,
 
     """
 
-    nodes_df.at[node_label] = (x_coordinate,
+    nodes_df.loc[node_label] = (x_coordinate,
                                y_coordinate,
                                required_capacity,
                                max_power,
@@ -386,7 +389,7 @@ def mst_links(nodes_df):
         for j in range(len(nodes_df.index)):
             if i > j:
                 if A[j][i] > 0:
-                    links.at[f"({nodes_df.index[i]}, {nodes_df.index[j]})"] = [
+                    links.loc[f"({nodes_df.index[i]}, {nodes_df.index[j]})"] = [
                         nodes_df.index[i],
                         nodes_df.index[j],
                         distance_between_nodes(
@@ -525,7 +528,9 @@ def nodes_to_disconnect_from_grid(nodes_df,
         nodes_disconnected_if_most_favorable_link_is_cutted = []
 
         links_removed_from_links_subject_to_disconnection = set()
-        for link in links_subject_to_disconnection:
+        # The links are sorted, so that the result does not depend on the
+        # iteration order of the set.
+        for link in sorted(links_subject_to_disconnection):
             if link in links_removed_from_links_subject_to_disconnection:
                 break
             # Explore branch a (clsuter containing node_a and all nodes
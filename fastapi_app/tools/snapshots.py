@@ -0,0 +1,376 @@
+"""
+Versioned binary snapshots of objects holding DataFrames, arrays and sparse
+matrices, e.g. of the `Grid` objects.
+
+A snapshot is a folder with a `header.json` file, which describes all
+attributes of the object, and one `.npy` file per array. The numerical
+columns of the DataFrames are stored as they are and memory-mapped when the
+snapshot is read. Columns with the dtype 'object' are stored as a code of
+the type of each value (None, NaN, bool, int, float or str) and one array
+per type, so that mixed columns are restored losslessly without pickling.
+Sparse matrices are stored in the COO format.
+"""
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+SNAPSHOT_FORMAT = "offgrid-planner-snapshot"
+SNAPSHOT_VERSION = 1
+HEADER_FILE = "header.json"
+
+# codes of the types of the values in columns with the dtype 'object'
+NONE, NAN, BOOL, INT, FLOAT, STR = range(6)
+
+# codes of the types inferred by pandas for columns without mixed types
+INFERRED_TYPE_CODES = {
+    "empty": NAN,
+    "boolean": BOOL,
+    "integer": INT,
+    "floating": FLOAT,
+    "string": STR,
+}
+
+# dtype kinds which are stored as they are: bool, (unsigned) integer,
+# floating, complex, timedelta and datetime
+NATIVE_KINDS = "biufcmM"
+
+
+# ------------------------- ENCODING ------------------------- #
+
+
+def type_code(value):
+    """
+    Returns the code of the type of a value in a column of dtype 'object'.
+    """
+    if value is None:
+        return NONE
+    if isinstance(value, (bool, np.bool_)):
+        return BOOL
+    if isinstance(value, (int, np.integer)):
+        return INT
+    if isinstance(value, (float, np.floating)):
+        return NAN if np.isnan(value) else FLOAT
+    if isinstance(value, str):
+        return STR
+    raise TypeError(f"values of type '{type(value).__name__}' cannot be stored")
+
+
+def encode_objects(values):
+    """
+    Splits the values of a column of dtype 'object' into arrays without
+    Python objects.
+
+    Parameters
+    ----------
+    values (array-like):
+        values of the column.
+
+    Output
+    ------
+    (dict): 'codes' of the types of the values and, if they are used, the
+        'strings', 'integers' (also holding the booleans) and 'floats'.
+    """
+    values = np.asarray(values, dtype=object)
+    inferred_type = pd.api.types.infer_dtype(values, skipna=True)
+    if inferred_type in INFERRED_TYPE_CODES:
+        codes = np.where(
+            pd.isna(values), NAN, INFERRED_TYPE_CODES[inferred_type]
+        ).astype(np.uint8)
+        codes[np.equal(values, None)] = NONE
+    else:
+        codes = np.fromiter(map(type_code, values), dtype=np.uint8, count=len(values))
+
+    arrays = {"codes": codes}
+    is_string = codes == STR
+    if is_string.any():
+        # unicode strings are larger than UTF-8 encoded ones, but they are
+        # converted into Python strings several times faster
+        arrays["strings"] = np.where(is_string, values, "").astype(str)
+    is_integer = (codes == INT) | (codes == BOOL)
+    if is_integer.any():
+        arrays["integers"] = np.where(is_integer, values, 0).astype(np.int64)
+    is_float = codes == FLOAT
+    if is_float.any():
+        arrays["floats"] = np.where(is_float, values, 0).astype(np.float64)
+
+    return arrays
+
+
+def decode_objects(arrays):
+    """
+    Restores the values of a column of dtype 'object' from the arrays
+    obtained by `encode_objects`.
+    """
+    codes = np.asarray(arrays["codes"])
+    if (codes.shape[0] > 0) and (codes == STR).all():
+        return arrays["strings"].astype(object)
+
+    values = np.full(codes.shape[0], np.nan, dtype=object)
+    values[codes == NONE] = None
+    for code, name in [
+        (STR, "strings"),
+        (INT, "integers"),
+        (BOOL, "integers"),
+        (FLOAT, "floats"),
+    ]:
+        selected = codes == code
+        if selected.any():
+            selected_values = arrays[name][selected]
+            if code == BOOL:
+                selected_values = selected_values.astype(bool)
+            # `tolist` converts the values into Python objects
+            values[selected] = selected_values.tolist()
+
+    return values
+
+
+def json_default(value):
+    """
+    Converts NumPy scalars nested in lists or dicts, which are not supported
+    by `json`.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"values of type '{type(value).__name__}' cannot be stored")
+
+
+# ------------------------- WRITING ------------------------- #
+
+
+def block_name(array):
+    """
+    Returns the name of the block of a frame, in which a column with the
+    dtype of the given array is stored.
+    """
+    if array.dtype.kind == "U":
+        return "str"
+    return str(array.dtype)
+
+
+class SnapshotWriter:
+    """
+    Writes the arrays of a snapshot into a folder and describes them.
+
+    The columns of a DataFrame with the same dtype are stored together as
+    the rows of one array (block), so that few files need to be opened.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def save_array(self, name, array):
+        file_name = f"{name}.npy"
+        np.save(
+            os.path.join(self.folder, file_name),
+            np.ascontiguousarray(array),
+            allow_pickle=False,
+        )
+        return file_name
+
+    def add_column(self, blocks, values):
+        """
+        Adds a column to the blocks of a frame and returns its description.
+        """
+
+        def add_to_block(array):
+            block = blocks.setdefault(block_name(array), [])
+            block.append(array)
+            return [block_name(array), len(block) - 1]
+
+        if values.dtype.kind in NATIVE_KINDS:
+            return {"dtype": str(values.dtype), "position": add_to_block(values)}
+        if values.dtype != object:
+            raise TypeError(f"columns of dtype '{values.dtype}' cannot be stored")
+        return {
+            "dtype": "object",
+            "parts": {
+                part: add_to_block(array)
+                for part, array in encode_objects(values).items()
+            },
+        }
+
+    def save_frame(self, name, frame):
+        if isinstance(frame.index, pd.MultiIndex):
+            raise TypeError("DataFrames with a MultiIndex cannot be stored")
+
+        blocks = {}
+        if isinstance(frame.index, pd.RangeIndex):
+            index = {"range": [frame.index.start, frame.index.stop, frame.index.step]}
+        else:
+            index = self.add_column(blocks, frame.index.to_numpy())
+        index["name"] = frame.index.name
+
+        columns = []
+        for i, column in enumerate(frame.columns):
+            spec = self.add_column(blocks, frame.iloc[:, i].to_numpy())
+            columns.append(dict(name=column, **spec))
+
+        return {
+            "kind": "frame",
+            "n_rows": frame.shape[0],
+            "index": index,
+            "columns": columns,
+            "blocks": {
+                block: self.save_array(f"{name}.{block}", np.stack(arrays))
+                for block, arrays in blocks.items()
+            },
+        }
+
+    def save(self, name, value):
+        """
+        Saves an attribute and returns its description for the header.
+        """
+        if isinstance(value, pd.DataFrame):
+            return self.save_frame(name, value)
+        if sparse.issparse(value):
+            coo = value.tocoo()
+            return {
+                "kind": "sparse",
+                "format": value.format,
+                "shape": list(coo.shape),
+                "files": {
+                    "row": self.save_array(f"{name}.row", coo.row),
+                    "col": self.save_array(f"{name}.col", coo.col),
+                    "data": self.save_array(f"{name}.data", coo.data),
+                },
+            }
+        if isinstance(value, np.ndarray):
+            if value.dtype.kind not in NATIVE_KINDS:
+                raise TypeError(f"arrays of dtype '{value.dtype}' cannot be stored")
+            return {"kind": "array", "file": self.save_array(name, value)}
+        if isinstance(value, np.generic):
+            return {"kind": "scalar", "dtype": str(value.dtype), "value": value.item()}
+        # values which cannot be written into the header raise a TypeError
+        json.dumps(value, default=json_default)
+        return {"kind": "value", "value": value}
+
+
+def write_snapshot(folder, attributes, metadata=None):
+    """
+    Writes a snapshot of the given attributes into a folder, which is
+    replaced if it already exists.
+
+    Parameters
+    ----------
+    folder (str):
+        path of the snapshot.
+    attributes (dict):
+        DataFrames, arrays, sparse matrices and JSON serializable values.
+    metadata (dict):
+        JSON serializable information stored in the header, e.g. the
+        parameters the object was created with.
+    """
+    # the snapshot is written next to an existing one and only replaces it
+    # after all files are complete
+    folder = os.path.normpath(folder)
+    temporary_folder = f"{folder}.tmp"
+    shutil.rmtree(temporary_folder, ignore_errors=True)
+    os.makedirs(temporary_folder)
+
+    writer = SnapshotWriter(temporary_folder)
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "metadata": metadata,
+        "attributes": {},
+    }
+    for name, value in attributes.items():
+        try:
+            header["attributes"][name] = writer.save(name, value)
+        except TypeError as error:
+            raise TypeError(f"attribute '{name}': {error}") from None
+
+    with open(os.path.join(temporary_folder, HEADER_FILE), "w") as header_file:
+        json.dump(header, header_file, indent=1, default=json_default)
+
+    shutil.rmtree(folder, ignore_errors=True)
+    os.rename(temporary_folder, folder)
+
+
+# ------------------------- READING ------------------------- #
+
+
+def read_snapshot(folder, mmap_mode="r"):
+    """
+    Reads a snapshot written by `write_snapshot`.
+
+    Parameters
+    ----------
+    folder (str):
+        path of the snapshot.
+    mmap_mode (str or None):
+        mode in which the arrays are memory-mapped (see `numpy.load`), or
+        None for reading them into memory. The values are copied into new
+        DataFrames and arrays, so that they can be changed in any case.
+
+    Output
+    ------
+    (tuple): the attributes and the metadata of the snapshot.
+    """
+    with open(os.path.join(folder, HEADER_FILE)) as header_file:
+        header = json.load(header_file)
+    if header.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"'{folder}' is not a snapshot")
+    if header["version"] > SNAPSHOT_VERSION:
+        raise ValueError(
+            f"the snapshot has version {header['version']}, but only versions "
+            f"up to {SNAPSHOT_VERSION} can be read"
+        )
+
+    def load(file_name):
+        return np.load(
+            os.path.join(folder, file_name), mmap_mode=mmap_mode, allow_pickle=False
+        )
+
+    def read_frame(spec):
+        blocks = {block: load(file_name) for block, file_name in spec["blocks"].items()}
+
+        def column(column_spec):
+            if column_spec["dtype"] == "object":
+                return decode_objects(
+                    {
+                        part: blocks[block][position]
+                        for part, (block, position) in column_spec["parts"].items()
+                    }
+                )
+            block, position = column_spec["position"]
+            return blocks[block][position]
+
+        index_spec = spec["index"]
+        if "range" in index_spec:
+            index = pd.RangeIndex(*index_spec["range"], name=index_spec["name"])
+        else:
+            index = pd.Index(column(index_spec), name=index_spec["name"], copy=True)
+
+        frame = pd.DataFrame(
+            {i: column(column_spec) for i, column_spec in enumerate(spec["columns"])},
+            index=index,
+            copy=True,
+        )
+        frame.columns = pd.Index([column["name"] for column in spec["columns"]])
+        return frame
+
+    attributes = {}
+    for name, spec in header["attributes"].items():
+        if spec["kind"] == "frame":
+            attributes[name] = read_frame(spec)
+        elif spec["kind"] == "sparse":
+            files = spec["files"]
+            attributes[name] = sparse.coo_matrix(
+                (load(files["data"]), (load(files["row"]), load(files["col"]))),
+                shape=tuple(spec["shape"]),
+            ).asformat(spec["format"])
+        elif spec["kind"] == "array":
+            attributes[name] = np.array(load(spec["file"]))
+        elif spec["kind"] == "scalar":
+            attributes[name] = np.dtype(spec["dtype"]).type(spec["value"])
+        else:
+            attributes[name] = spec["value"]
+
+    return attributes, header["metadata"]
@@ -0,0 +1,328 @@
+"""
+Import of large files of nodes or links uploaded by the users (*.xlsx, *.csv
+and Parquet files).
+
+The files are parsed in chunks of rows. Each chunk is validated and inserted
+into the database before the next one is read, so that the memory does not
+grow with the size of the file. Invalid rows are skipped and reported. The
+progress of each import is kept in an `ImportJob`, which is polled by the
+web app.
+
+Parquet files are read by `pyarrow`, which is listed in the requirements,
+but the other formats are imported without it.
+"""
+import os
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from fastapi_app.tools.lazy import LazyModule
+
+openpyxl = LazyModule("openpyxl")
+pa_parquet = LazyModule("pyarrow.parquet")
+
+# number of rows parsed, validated and inserted at once
+CHUNK_SIZE = 10000
+
+# maximum number of invalid rows reported with their errors
+MAX_REPORTED_ERRORS = 100
+
+# file formats of the supported file extensions
+FILE_FORMATS = {".xlsx": "xlsx", ".csv": "csv", ".parquet": "parquet"}
+
+# columns which must be given for every row
+REQUIRED_COLUMNS = {
+    "nodes": ["latitude", "longitude"],
+    "links": ["lat_from", "lon_from", "lat_to", "lon_to"],
+}
+
+# values of the other columns, if they are missing in the file. Together
+# with the required columns, they are in the order of the *.csv files.
+DEFAULT_VALUES = {
+    "nodes": {
+        "node_type": "consumer",
+        "consumer_type": "household",
+        "consumer_detail": "default",
+        "surface_area": np.nan,
+        "peak_demand": np.nan,
+        "average_consumption": np.nan,
+        "is_connected": True,
+        "how_added": "manual",
+    },
+    "links": {"link_type": "distribution", "length": np.nan},
+}
+
+# allowed values of the columns with categories
+CATEGORIES = {
+    "nodes": {"node_type": ["consumer", "pole", "power-house"]},
+    "links": {"link_type": ["distribution", "connection"]},
+}
+
+NUMERICAL_COLUMNS = {
+    "nodes": ["surface_area", "peak_demand", "average_consumption"],
+    "links": ["length"],
+}
+
+# ranges of the coordinates [degree]
+LATITUDE_RANGE = (-90, 90)
+LONGITUDE_RANGE = (-180, 180)
+
+
+# ------------------------- READING ------------------------- #
+
+
+def file_format(file_name):
+    """
+    Returns the format of a file from its extension, or None if the format
+    is not supported.
+    """
+    return FILE_FORMATS.get(os.path.splitext(file_name)[1].lower())
+
+
+def xlsx_sheet(workbook, table):
+    """
+    Returns the sheet named after the table, or the first sheet if the file
+    only contains one table.
+    """
+    if table in workbook.sheetnames:
+        return workbook[table]
+    return workbook.worksheets[0]
+
+
+def count_rows(path, file_format, table):
+    """
+    Counts the rows of a file without parsing them, if possible.
+
+    Output
+    ------
+    (int or None): number of rows (the header excluded), or None if it is
+        not known before the file is read.
+    """
+    if file_format == "csv":
+        n_lines = 0
+        last_block = b"\n"
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                n_lines += block.count(b"\n")
+                last_block = block
+        # the last line may not end with a line break
+        n_lines += not last_block.endswith(b"\n")
+        return max(n_lines - 1, 0)
+    if file_format == "parquet":
+        return pa_parquet.ParquetFile(path).metadata.num_rows
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        # the dimensions are only known, if they are stored in the file
+        max_row = xlsx_sheet(workbook, table).max_row
+    finally:
+        workbook.close()
+    return None if max_row is None else max(max_row - 1, 0)
+
+
+def read_chunks(path, file_format, table, chunk_size=CHUNK_SIZE):
+    """
+    Parses a file of nodes or links in chunks of rows.
+
+    Parameters
+    ----------
+    path (str):
+        path of the file.
+    file_format (str):
+        'xlsx', 'csv' or 'parquet'.
+    table (str):
+        'nodes' or 'links'. In *.xlsx files, the sheet of the same name is
+        read, if it exists.
+
+    Output
+    ------
+    (generator): DataFrames with at most `chunk_size` rows.
+    """
+    if file_format == "csv":
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    elif file_format == "parquet":
+        parquet_file = pa_parquet.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif file_format == "xlsx":
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = xlsx_sheet(workbook, table).iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) == chunk_size:
+                    yield pd.DataFrame(chunk, columns=header)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=header)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"unknown file format '{file_format}'")
+
+
+# ------------------------ VALIDATION ------------------------ #
+
+
+def convert_distinct(values, function, default, dtype=object):
+    """
+    Converts the values of a column, where each distinct value is converted
+    only once, since columns such as the types of the nodes contain few
+    distinct values. Missing values are replaced by the default value.
+    """
+    # missing values get the code -1, which selects the last element
+    codes, distinct_values = pd.factorize(values)
+    converted = [function(value) for value in distinct_values] + [default]
+    return np.array(converted, dtype=dtype)[codes]
+
+
+def to_bool(value):
+    """
+    Converts booleans given as bool, numbers or strings (e.g., 'True',
+    'false', '1').
+    """
+    return str(value).strip().lower() in ["true", "1", "1.0", "yes"]
+
+
+def validate_chunk(chunk, table, first_row=0):
+    """
+    Validates a chunk of nodes or links, converts its values and adds the
+    default values of missing columns.
+
+    Parameters
+    ----------
+    chunk (pandas.DataFrame):
+        rows read from the file.
+    table (str):
+        'nodes' or 'links'.
+    first_row (int):
+        number of rows of the file before the chunk.
+
+    Output
+    ------
+    (tuple): the valid rows in the columns and order of the *.csv file, and
+        a list of the invalid rows (counted from 1) with their errors.
+    """
+    chunk = chunk.rename(columns=lambda column: str(column).strip())
+    missing_columns = [c for c in REQUIRED_COLUMNS[table] if c not in chunk.columns]
+    if missing_columns:
+        raise ValueError(f"missing columns: {', '.join(missing_columns)}")
+
+    columns = REQUIRED_COLUMNS[table] + list(DEFAULT_VALUES[table])
+    chunk = chunk.reindex(columns=columns).reset_index(drop=True)
+    errors = np.full(chunk.shape[0], None, dtype=object)
+
+    def add_error(is_invalid, error):
+        # only the first error of each row is reported
+        errors[np.asarray(is_invalid) & np.equal(errors, None)] = error
+
+    for column in REQUIRED_COLUMNS[table]:
+        chunk[column] = pd.to_numeric(chunk[column], errors="coerce")
+        add_error(chunk[column].isna(), f"'{column}' is missing or not a number")
+    for column in REQUIRED_COLUMNS[table]:
+        low, high = LATITUDE_RANGE if "lat" in column else LONGITUDE_RANGE
+        add_error(
+            (chunk[column] < low) | (chunk[column] > high),
+            f"'{column}' is not between {low} and {high}",
+        )
+
+    for column in NUMERICAL_COLUMNS[table]:
+        chunk[column] = pd.to_numeric(chunk[column], errors="coerce")
+
+    for column, default in DEFAULT_VALUES[table].items():
+        if column == "is_connected":
+            chunk[column] = convert_distinct(chunk[column], to_bool, default, bool)
+        elif isinstance(default, str):
+            chunk[column] = convert_distinct(
+                chunk[column], lambda value: str(value).strip(), default
+            )
+
+    for column, categories in CATEGORIES[table].items():
+        add_error(
+            ~chunk[column].isin(categories),
+            f"'{column}' must be one of {', '.join(categories)}",
+        )
+
+    is_invalid = np.not_equal(errors, None)
+    invalid_rows = [
+        {"row": first_row + int(position) + 1, "error": errors[position]}
+        for position in np.flatnonzero(is_invalid)
+    ]
+    return chunk[~is_invalid].reset_index(drop=True), invalid_rows
+
+
+# --------------------------- JOBS --------------------------- #
+
+
+class ImportJob:
+    """
+    Progress of the import of an uploaded file.
+
+    Attributes
+    ----------
+    id: str
+        identifier of the job, which is used for polling its progress.
+    table: str
+        'nodes' or 'links'.
+    status: str
+        'pending', 'running', 'done' or 'failed'.
+    n_rows: int or None
+        number of rows of the file, if it is known.
+    n_rows_read: int
+        number of rows parsed so far.
+    n_rows_imported: int
+        number of valid rows inserted into the database.
+    invalid_rows: list
+        the first invalid rows with their errors.
+    """
+
+    def __init__(self, table, file_name):
+        self.id = uuid.uuid4().hex
+        self.table = table
+        self.file_name = file_name
+        self.status = "pending"
+        self.n_rows = None
+        self.n_rows_read = 0
+        self.n_rows_imported = 0
+        self.n_rows_invalid = 0
+        self.invalid_rows = []
+        self.error = None
+        self.lock = threading.Lock()
+
+    def add_chunk(self, n_rows_read, n_rows_imported, invalid_rows):
+        with self.lock:
+            self.n_rows_read += n_rows_read
+            self.n_rows_imported += n_rows_imported
+            self.n_rows_invalid += len(invalid_rows)
+            n_free = MAX_REPORTED_ERRORS - len(self.invalid_rows)
+            self.invalid_rows.extend(invalid_rows[: max(n_free, 0)])
+
+    def progress(self):
+        """
+        Returns the progress of the job, which is sent to the web app.
+        """
+        with self.lock:
+            if self.status == "done":
+                fraction = 1.0
+            elif self.n_rows:
+                fraction = min(self.n_rows_read / self.n_rows, 1.0)
+            else:
+                fraction = None
+            return {
+                "id": self.id,
+                "table": self.table,
+                "file_name": self.file_name,
+                "status": self.status,
+                "progress": fraction,
+                "n_rows": self.n_rows,
+                "n_rows_read": self.n_rows_read,
+                "n_rows_imported": self.n_rows_imported,
+                "n_rows_invalid": self.n_rows_invalid,
+                "invalid_rows": list(self.invalid_rows),
+                "error": self.error,
+            }
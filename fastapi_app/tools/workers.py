@@ -0,0 +1,367 @@
+"""
+Pool of long-lived worker processes for the grid and energy system
+optimizations.
+
+Every worker imports the optimization and geo libraries and creates the
+projection of the coordinates once when it starts, so that the jobs do not
+pay for it. The jobs and their results are sent to the workers through the
+queues of a `concurrent.futures.ProcessPoolExecutor`. To bound the growth
+of their memory, the workers are replaced by new processes once one of them
+has done a given number of jobs.
+
+The pool is configured with the environment variables
+`OFFGRID_PLANNER_WORKERS` (number of workers, default: 2; with 0, the jobs
+run in the process of the app) and `OFFGRID_PLANNER_WORKER_MAX_JOBS`
+(number of jobs of a worker after which the workers are replaced,
+default: 20).
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi_app.tools.profiling import add_timings, collect_timings
+
+POOL_SIZE = int(os.environ.get("OFFGRID_PLANNER_WORKERS", 2))
+MAX_JOBS_PER_WORKER = int(os.environ.get("OFFGRID_PLANNER_WORKER_MAX_JOBS", 20))
+
+# number of jobs done by the current worker process
+_n_jobs = 0
+
+
+# ------------------------ WORKER ------------------------ #
+
+
+def warm_up():
+    """
+    Imports the optimization and geo libraries and creates the projection
+    of the coordinates in a new worker process.
+    """
+    from fastapi_app.tools import grids, optimizer
+
+    # accessing an attribute imports the modules behind the lazy facades
+    optimizer.solph.EnergySystem
+    optimizer.po.SolverFactory
+    optimizer.k_means_constrained.KMeansConstrained
+    grids.utm_projection()
+
+
+def ping():
+    """
+    Answers a health check of the pool.
+
+    Output
+    ------
+    (dict): process id of the worker and the number of jobs it has done.
+    """
+    return {"pid": os.getpid(), "n_jobs": _n_jobs}
+
+
+def run_job(function, kwargs):
+    """
+    Runs a job in the worker process and counts it.
+
+    Output
+    ------
+    (tuple): return value of the function, the timings of its stages,
+        which are added to the statistics of the app, and the answer of the
+        worker as for a health check.
+    """
+    global _n_jobs
+    _n_jobs += 1
+    with collect_timings() as timings:
+        result = function(**kwargs)
+    return result, timings, ping()
+
+
+# ------------------------- JOBS ------------------------- #
+
+
+def design_grid(
+    opt,
+    grid,
+    connection_cable_max_length,
+    distribution_cable_max_length,
+    voltage_drop_repair=False,
+):
+    """
+    Finds the poles and links of the grid.
+
+    Output
+    ------
+    (tuple): the optimizer and the grid, since both of them are changed by
+        the design and only copies of them are sent to the worker, and the
+        summary of the voltage drop repair, if it is requested.
+    """
+    opt.design_grid(
+        grid=grid,
+        connection_cable_max_length=connection_cable_max_length,
+        distribution_cable_max_length=distribution_cable_max_length,
+    )
+    repair = None
+    if voltage_drop_repair:
+        repair = opt.repair_voltage_drop(
+            grid=grid, distribution_cable_max_length=distribution_cable_max_length
+        )
+    return opt, grid, repair
+
+
+def update_grid(
+    opt,
+    grid,
+    added_nodes,
+    removed_nodes,
+    connection_cable_max_length,
+    distribution_cable_max_length,
+    voltage_drop_repair=False,
+):
+    """
+    Adds and removes consumers of a previously designed grid.
+
+    Output
+    ------
+    (tuple): the optimizer, the grid, whether the grid has been updated (see
+        `GridOptimizer.update_grid`) and the summary of the voltage drop
+        repair of the updated grid, if it is requested.
+    """
+    is_updated = opt.update_grid(
+        grid=grid,
+        added_nodes=added_nodes,
+        removed_nodes=removed_nodes,
+        connection_cable_max_length=connection_cable_max_length,
+        distribution_cable_max_length=distribution_cable_max_length,
+    )
+    repair = None
+    if is_updated and voltage_drop_repair:
+        repair = opt.repair_voltage_drop(
+            grid=grid, distribution_cable_max_length=distribution_cable_max_length
+        )
+    return opt, grid, is_updated, repair
+
+
+def optimize_energy_system(ensys_opt):
+    """
+    Optimizes the energy system.
+
+    Output
+    ------
+    (EnergySystemOptimizer): the optimizer holding the results.
+    """
+    ensys_opt.optimize_energy_system()
+
+    # the raw results refer to the whole oemof energy system and are not
+    # needed anymore after they are processed
+    ensys_opt.results_main = None
+    return ensys_opt
+
+
+# ------------------------- POOL ------------------------- #
+
+
+class WorkerPool:
+    """
+    Long-lived pool of pre-warmed worker processes.
+
+    The pool knows the number of jobs of each worker from its answers. A
+    `ProcessPoolExecutor` cannot replace a single worker before Python 3.11,
+    so all workers are replaced once one of them has done the given number
+    of jobs.
+
+    Parameters
+    ----------
+    size (int):
+        number of worker processes. With 0, the jobs run in the calling
+        process.
+    max_jobs_per_worker (int):
+        number of jobs of a worker, after which the workers are replaced by
+        new processes.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_jobs_per_worker=MAX_JOBS_PER_WORKER):
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.executor = None
+        self.n_jobs = 0
+        self.n_recycles = 0
+        self.started_at = None
+        # number of jobs of the workers of the executor, keyed by process id
+        self.answers = {}
+        # number of pings sent at the start, which are not answered yet
+        self.n_warming_up = 0
+        # the callback of a finished warm-up runs in the thread adding it
+        self.lock = threading.RLock()
+
+    def start(self):
+        """
+        Starts the worker processes, which warm up in the background.
+        """
+        if self.size == 0:
+            return
+        with self.lock:
+            if self.executor is None:
+                self.executor = self._new_executor()
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        # the answers of pending pings are stored by the thread of the
+        # executor, which needs the lock before it can be joined
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _new_executor(self):
+        executor = ProcessPoolExecutor(max_workers=self.size, initializer=warm_up)
+        self.n_jobs = 0
+        self.answers = {}
+        self.n_warming_up = self.size
+        self.started_at = time.time()
+        # the pings start the workers, but nobody waits for their warm-up
+        for _ in range(self.size):
+            executor.submit(ping).add_done_callback(
+                functools.partial(self._warmed_up, executor)
+            )
+        return executor
+
+    def _warmed_up(self, executor, future):
+        with self.lock:
+            if self.executor is executor:
+                self.n_warming_up -= 1
+        self._answered(executor, future)
+
+    def _answered(self, executor, future):
+        """
+        Stores the answer of a ping, or replaces the workers of the given
+        executor if one of them has died before answering.
+        """
+        if future.cancelled():
+            return
+        try:
+            answer = future.result()
+        except BrokenProcessPool:
+            self._replace(executor)
+            return
+        self._store_answer(executor, answer)
+
+    def _store_answer(self, executor, answer):
+        """
+        Stores the number of jobs of a worker and replaces the workers of the
+        given executor if the worker has done too many jobs.
+        """
+        with self.lock:
+            if self.executor is not executor:
+                # the worker belongs to an executor, which has been replaced
+                return
+            self.answers[answer["pid"]] = answer["n_jobs"]
+            if answer["n_jobs"] >= self.max_jobs_per_worker:
+                self._replace(executor)
+
+    def _replace(self, executor):
+        """
+        Replaces the workers of the given executor by new processes, unless
+        this has already been done by another thread.
+        """
+        with self.lock:
+            if self.executor is executor:
+                # the running jobs are still finished by the old workers
+                executor.shutdown(wait=False)
+                self.executor = self._new_executor()
+                self.n_recycles += 1
+
+    def _executor_for_next_job(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = self._new_executor()
+            self.n_jobs += 1
+            return self.executor
+
+    async def run(self, function, **kwargs):
+        """
+        Runs a job, i.e. a function of this module, in one of the workers.
+
+        Parameters
+        ----------
+        function (callable):
+            module level function, which can be sent to the workers.
+        kwargs:
+            arguments of the function, which are copied to the worker.
+
+        Output
+        ------
+        return value of the function
+        """
+        loop = asyncio.get_running_loop()
+        if self.size == 0:
+            # the context holds the timings of the current request
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                None, functools.partial(context.run, function, **kwargs)
+            )
+
+        executor = self._executor_for_next_job()
+        try:
+            result, timings, answer = await loop.run_in_executor(
+                executor, run_job, function, kwargs
+            )
+        except BrokenProcessPool:
+            # a worker died, e.g. because it ran out of memory
+            self._replace(executor)
+            raise
+
+        self._store_answer(executor, answer)
+        add_timings(timings)
+        return result
+
+    def health(self):
+        """
+        Checks that the worker processes are alive and replaces them
+        otherwise. A ping is sent to the workers, but its answer is not
+        awaited, so that a busy pool is not taken for a broken one. The
+        workers are known from their answers to the pings and jobs.
+
+        Output
+        ------
+        (dict): status of the pool and of each worker, i.e. its process id
+            and the number of jobs it has answered with.
+        """
+        status = {
+            "size": self.size,
+            "max_jobs_per_worker": self.max_jobs_per_worker,
+            "n_jobs": self.n_jobs,
+            "n_recycles": self.n_recycles,
+            "uptime": None,
+            "workers": [],
+        }
+        if self.size == 0:
+            status["status"] = "in-process"
+            return status
+
+        self.start()
+        with self.lock:
+            executor = self.executor
+            try:
+                # if a worker dies before answering, the ping fails and the
+                # workers are replaced by the callback
+                executor.submit(ping).add_done_callback(
+                    functools.partial(self._answered, executor)
+                )
+            except BrokenProcessPool:
+                # a worker has died since the last job
+                self._replace(executor)
+                status["status"] = "recycled"
+                return status
+
+            status["uptime"] = time.time() - self.started_at
+            status["workers"] = [
+                {"pid": pid, "n_jobs": n_jobs}
+                for pid, n_jobs in sorted(self.answers.items())
+            ]
+            if self.n_warming_up > 0:
+                status["status"] = "warming up"
+            else:
+                status["status"] = "healthy"
+
+        return status
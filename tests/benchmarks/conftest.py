@@ -0,0 +1,57 @@
+"""
+Comparison of the benchmarks with the baseline in `baseline.json`.
+
+With `BENCHMARK_BASELINE=compare`, a benchmark fails if its mean time
+exceeds the baseline by more than `BENCHMARK_THRESHOLD` (default: 0.5,
+i.e. 50%). With `BENCHMARK_BASELINE=update`, the mean times of all
+benchmarks of the session are written to the baseline instead.
+"""
+import json
+import os
+
+import pytest
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+BASELINE_MODE = os.environ.get("BENCHMARK_BASELINE", "")
+THRESHOLD = float(os.environ.get("BENCHMARK_THRESHOLD", 0.5))
+
+_results = {}
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE) as baseline_file:
+        return json.load(baseline_file)
+
+
+@pytest.fixture(autouse=True)
+def baseline(request):
+    yield
+    # The benchmark fixture is already torn down, but keeps its results.
+    benchmark = request.node.funcargs.get("benchmark")
+    if (benchmark is None) or (benchmark.stats is None):
+        return
+    stats = benchmark.stats
+    if len(stats.stats.data) == 0:
+        return
+
+    name = f"{request.node.module.__name__}::{request.node.name}"
+    mean = stats.stats.mean
+    _results[name] = mean
+    if BASELINE_MODE == "compare":
+        reference = load_baseline().get(name)
+        if (reference is not None) and (mean > reference * (1 + THRESHOLD)):
+            pytest.fail(
+                f"{name} took {mean:.4f} s, more than {THRESHOLD:.0%} above the "
+                f"baseline of {reference:.4f} s"
+            )
+
+
+def pytest_sessionfinish(session):
+    if (BASELINE_MODE == "update") and (len(_results) > 0):
+        results = load_baseline()
+        results.update(_results)
+        with open(BASELINE_FILE, "w") as baseline_file:
+            json.dump(dict(sorted(results.items())), baseline_file, indent=4)
+            baseline_file.write("\n")
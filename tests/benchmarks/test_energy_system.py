@@ -0,0 +1,139 @@
+"""
+Benchmarks of the energy system optimization for different time horizons
+and component configurations.
+
+Building and solving the model are timed separately. The solve benchmarks
+are skipped for solvers which are not installed. The size of the model and
+the peak memory are stored as extra information, so that a comparable
+report is written with `pytest tests/benchmarks --benchmark-json=<file>`.
+The long horizons are only included if the environment variable
+`BENCHMARK_LARGE` is set.
+"""
+import copy
+import inspect
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import oemof.solph as solph
+import pyomo.environ as po
+
+from fastapi_app.tools.optimizer import EnergySystemOptimizer
+from fastapi_app.tools.profiling import process_max_rss
+
+from timeseries import demand_and_solar
+
+N_DAYS = [7, 30] + ([90, 365] if os.environ.get("BENCHMARK_LARGE") else [])
+SOLVERS = ["cbc", "glpk"]
+
+# components whose settings are changed in the configurations
+COMPONENTS = ["pv", "diesel_genset", "battery", "inverter", "rectifier"]
+
+# nominal capacities of the components, if they are not designed
+NOMINAL_CAPACITIES = {
+    "pv": 60,
+    "diesel_genset": 20,
+    "battery": 120,
+    "inverter": 30,
+    "rectifier": 20,
+}
+
+CONFIGURATIONS = {
+    # capacities of all components are optimized
+    "design": {component: {"design": True} for component in COMPONENTS},
+    # only the dispatch of given capacities is optimized
+    "dispatch": {component: {"design": False} for component in COMPONENTS},
+    # capacities of a system without diesel genset are optimized
+    "pv-battery": {
+        "pv": {"design": True},
+        "diesel_genset": {"is_selected": False},
+        "battery": {"design": True},
+        "inverter": {"design": True},
+        "rectifier": {"is_selected": False},
+    },
+}
+
+
+# oemof.solph 0.4 requires an oemof.network version before 0.5
+try:
+    solph.Transformer(label="check", conversion_factors={})
+except TypeError:
+    pytest.skip(
+        "the installed oemof.network is incompatible with oemof.solph",
+        allow_module_level=True,
+    )
+
+
+@pytest.fixture(scope="module")
+def path_data(tmp_path_factory):
+    path = tmp_path_factory.mktemp("energy_system") / "timeseries.csv"
+    demand_and_solar().to_csv(path, index=False)
+
+    return str(path)
+
+
+def energy_system_optimizer(path_data, n_days, configuration, solver="cbc"):
+    """
+    Creates the optimizer with the default parameters of all components and
+    the settings of the given configuration.
+    """
+    defaults = inspect.signature(EnergySystemOptimizer.__init__).parameters
+    components = {}
+    for component, settings in CONFIGURATIONS[configuration].items():
+        components[component] = copy.deepcopy(defaults[component].default)
+        components[component]["settings"].update(settings)
+        if not components[component]["settings"]["design"]:
+            components[component]["parameters"][
+                "nominal_capacity"
+            ] = NOMINAL_CAPACITIES[component]
+
+    return EnergySystemOptimizer(
+        start_date="2022-01-01",
+        n_days=n_days,
+        project_lifetime=20,
+        wacc=0.1,
+        tax=0,
+        path_data=path_data,
+        solver=solver,
+        **components,
+    )
+
+
+def model_size(model):
+    return {
+        "n_variables": model.nvariables(),
+        "n_constraints": model.nconstraints(),
+        "process_max_rss": process_max_rss(),
+    }
+
+
+@pytest.mark.parametrize("configuration", CONFIGURATIONS)
+@pytest.mark.parametrize("n_days", N_DAYS)
+def test_build_model(benchmark, path_data, n_days, configuration):
+    benchmark.group = f"energy-system-build-{n_days}"
+    ensys_opt = energy_system_optimizer(path_data, n_days, configuration)
+
+    model = benchmark.pedantic(ensys_opt.build_model, rounds=1)
+
+    benchmark.extra_info.update(model_size(model))
+    assert len(model.TIMESTEPS) == n_days * 24
+
+
+@pytest.mark.parametrize("solver", SOLVERS)
+@pytest.mark.parametrize("configuration", CONFIGURATIONS)
+@pytest.mark.parametrize("n_days", N_DAYS)
+def test_solve_model(benchmark, path_data, n_days, configuration, solver):
+    if not po.SolverFactory(solver).available(exception_flag=False):
+        pytest.skip(f"solver '{solver}' is not installed")
+    benchmark.group = f"energy-system-solve-{n_days}"
+    ensys_opt = energy_system_optimizer(path_data, n_days, configuration, solver)
+    model = ensys_opt.build_model()
+
+    benchmark.pedantic(
+        ensys_opt.solve_model, args=(model,), kwargs={"tee": False}, rounds=1
+    )
+
+    benchmark.extra_info.update(model_size(model))
+    assert ensys_opt.sequences_demand.sum() > 0
@@ -0,0 +1,151 @@
+"""
+Benchmarks of the stages of the grid design in `optimize_grid`.
+
+Run them with `pytest tests/benchmarks`. The large settlements are only
+included if the environment variable `BENCHMARK_LARGE` is set.
+"""
+import copy
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from fastapi_app.tools.optimizer import GridOptimizer
+
+from villages import village
+
+N_CONSUMERS = [50, 500] + ([5000, 50000] if os.environ.get("BENCHMARK_LARGE") else [])
+LAYOUTS = ["dispersed", "clustered"]
+
+DISTRIBUTION_CABLE_MAX_LENGTH = 40
+
+
+def optimizer():
+    return GridOptimizer(
+        start_date="2021-01-01", n_days=365, project_lifetime=20, wacc=0.1, tax=0
+    )
+
+
+def clustered_grid(n_consumers, layout):
+    """
+    Creates a grid with one pole for every 10 consumers, connected by the
+    minimum spanning tree.
+    """
+    grid = village(n_consumers, pole_max_connection=0, layout=layout)
+    grid.get_load_centroid()
+    grid.get_nodes_distances_from_load_centroid()
+    opt = optimizer()
+    opt.kmeans_clustering(grid, max(n_consumers // 10, 2))
+    opt.create_minimum_spanning_tree(grid)
+    opt.connect_grid_consumers(grid)
+    opt.connect_grid_poles(grid)
+
+    return grid
+
+
+def designed_grid(n_consumers, layout):
+    """
+    Creates a grid whose long links are split and which has a power house.
+    """
+    grid = clustered_grid(n_consumers, layout)
+    long_links = grid.find_index_longest_distribution_link(
+        max_distance_dist_links=DISTRIBUTION_CABLE_MAX_LENGTH
+    )
+    grid.add_fixed_poles_on_long_links(
+        long_links=long_links, max_allowed_distance=DISTRIBUTION_CABLE_MAX_LENGTH
+    )
+    optimizer().connect_grid_poles(grid, long_links=long_links)
+    grid.get_poles_distances_from_load_centroid()
+    grid.select_location_of_power_house()
+
+    return grid
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("n_consumers", N_CONSUMERS)
+def test_projection(benchmark, n_consumers, layout):
+    benchmark.group = f"projection-{n_consumers}"
+    grid = village(n_consumers, pole_max_connection=0, layout=layout)
+
+    benchmark.pedantic(grid.convert_lonlat_xy, rounds=1)
+
+    assert grid.nodes["x"].notna().all()
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("n_consumers", N_CONSUMERS)
+def test_clustering(benchmark, n_consumers, layout):
+    benchmark.group = f"clustering-{n_consumers}"
+    grid = village(n_consumers, pole_max_connection=0, layout=layout)
+    n_clusters = n_consumers // 10
+
+    benchmark.pedantic(
+        optimizer().kmeans_clustering, args=(grid, n_clusters), rounds=1
+    )
+
+    assert grid.poles().shape[0] == n_clusters
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("n_consumers", N_CONSUMERS)
+def test_minimum_spanning_tree(benchmark, n_consumers, layout):
+    benchmark.group = f"minimum-spanning-tree-{n_consumers}"
+    grid = clustered_grid(n_consumers, layout)
+    opt = optimizer()
+
+    def connect_poles():
+        opt.create_minimum_spanning_tree(grid)
+        opt.connect_grid_poles(grid)
+
+    benchmark.pedantic(connect_poles, rounds=3)
+
+    n_distribution_links = (grid.links["link_type"] == "distribution").sum()
+    assert n_distribution_links == grid.poles().shape[0] - 1
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("n_consumers", N_CONSUMERS)
+def test_long_link_splitting(benchmark, n_consumers, layout):
+    benchmark.group = f"long-link-splitting-{n_consumers}"
+    grid = clustered_grid(n_consumers, layout)
+
+    def setup():
+        split_grid = copy.deepcopy(grid)
+        long_links = split_grid.find_index_longest_distribution_link(
+            max_distance_dist_links=DISTRIBUTION_CABLE_MAX_LENGTH
+        )
+        return (split_grid, long_links), {}
+
+    def split_long_links(split_grid, long_links):
+        split_grid.add_fixed_poles_on_long_links(
+            long_links=long_links,
+            max_allowed_distance=DISTRIBUTION_CABLE_MAX_LENGTH,
+        )
+        optimizer().connect_grid_poles(split_grid, long_links=long_links)
+
+    benchmark.pedantic(split_long_links, setup=setup, rounds=3)
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("n_consumers", N_CONSUMERS)
+def test_capacity(benchmark, n_consumers, layout):
+    benchmark.group = f"capacity-{n_consumers}"
+    grid = designed_grid(n_consumers, layout)
+
+    benchmark.pedantic(grid.find_capacity_of_each_link, rounds=3)
+
+    distribution_links = grid.links[grid.links["link_type"] == "distribution"]
+    assert distribution_links["n_consumers"].between(1, n_consumers).all()
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("n_consumers", N_CONSUMERS)
+def test_cost_allocation(benchmark, n_consumers, layout):
+    benchmark.group = f"cost-allocation-{n_consumers}"
+    grid = designed_grid(n_consumers, layout)
+    grid.find_capacity_of_each_link()
+
+    benchmark.pedantic(grid.distribute_grid_cost_among_consumers, rounds=3)
+
+    assert grid.consumers()["distribution_cost"].notna().all()
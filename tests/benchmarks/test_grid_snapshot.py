@@ -0,0 +1,129 @@
+"""
+Benchmarks of exporting and importing designed grids as binary snapshots
+compared with the *.csv files of `Grid.export`, and a check that the
+snapshots restore the grids losslessly.
+
+`import_grid` cannot parse the DataFrames stored in the *.cfg file, so the
+*.csv import is measured by reading the nodes and links as it does. The
+large settlements are only included if the environment variable
+`BENCHMARK_LARGE` is set.
+"""
+import copy
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from fastapi_app.tools.grids import import_grid_snapshot
+
+from test_grid_design import designed_grid
+
+N_CONSUMERS = [500] + ([5000, 50000] if os.environ.get("BENCHMARK_LARGE") else [])
+LAYOUTS = ["dispersed", "clustered"]
+FORMATS = ["csv", "snapshot"]
+
+
+@functools.lru_cache(maxsize=None)
+def cached_grid(n_consumers, layout):
+    grid = designed_grid(n_consumers, layout)
+    grid.find_capacity_of_each_link()
+    grid.distribute_grid_cost_among_consumers()
+
+    return grid
+
+
+def export(grid, file_format, folder):
+    if file_format == "snapshot":
+        grid.export_snapshot(os.path.join(folder, "snapshot"))
+    else:
+        # `export_grid` only handles folders relative to the working directory
+        grid.export(
+            folder="csv",
+            backup_name="grid",
+            allow_saving_in_existing_backup_folder=True,
+        )
+
+
+def import_csv(folder):
+    nodes = pd.read_csv(
+        os.path.join(folder, "csv", "grid", "nodes.csv"),
+        index_col=[0],
+        converters={
+            "node_type": str,
+            "type_fixed": lambda x: True if x == "True" else False,
+            "segment": str,
+        },
+    )
+    links = pd.read_csv(os.path.join(folder, "csv", "grid", "links.csv"), index_col=[0])
+
+    return nodes, links
+
+
+@pytest.mark.parametrize("file_format", FORMATS)
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("n_consumers", N_CONSUMERS)
+def test_export(benchmark, monkeypatch, tmp_path, n_consumers, layout, file_format):
+    benchmark.group = f"grid-export-{n_consumers}"
+    monkeypatch.chdir(tmp_path)
+    grid = cached_grid(n_consumers, layout)
+
+    benchmark.pedantic(export, args=(grid, file_format, str(tmp_path)), rounds=3)
+
+    benchmark.extra_info["size"] = sum(
+        path.stat().st_size for path in tmp_path.rglob("*") if path.is_file()
+    )
+
+
+@pytest.mark.parametrize("file_format", FORMATS)
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("n_consumers", N_CONSUMERS)
+def test_import(benchmark, monkeypatch, tmp_path, n_consumers, layout, file_format):
+    benchmark.group = f"grid-import-{n_consumers}"
+    monkeypatch.chdir(tmp_path)
+    grid = cached_grid(n_consumers, layout)
+    export(grid, file_format, str(tmp_path))
+
+    if file_format == "snapshot":
+        imported_grid = benchmark.pedantic(
+            import_grid_snapshot, args=(str(tmp_path / "snapshot"),), rounds=3
+        )
+        nodes = imported_grid.nodes
+    else:
+        nodes, _ = benchmark.pedantic(import_csv, args=(str(tmp_path),), rounds=3)
+
+    assert nodes.shape == grid.nodes.shape
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_snapshot_round_trip(tmp_path, layout):
+    grid = copy.deepcopy(cached_grid(N_CONSUMERS[0], layout))
+    # columns of dtype 'object' may mix types and missing values
+    grid.nodes.loc[grid.nodes.index[:2], "segment"] = [None, "ü"]
+
+    grid.export_snapshot(str(tmp_path / "snapshot"))
+    imported_grid = import_grid_snapshot(str(tmp_path / "snapshot"))
+
+    assert set(vars(imported_grid)) == set(vars(grid))
+    for key, value in vars(grid).items():
+        imported_value = getattr(imported_grid, key)
+        assert type(imported_value) == type(value)
+        if isinstance(value, pd.DataFrame):
+            pd.testing.assert_frame_equal(imported_value, value)
+            for column in value.columns[value.dtypes == object]:
+                assert list(map(type, imported_value[column])) == list(
+                    map(type, value[column])
+                )
+        elif isinstance(value, np.ndarray):
+            np.testing.assert_array_equal(imported_value, value)
+        elif hasattr(value, "tocoo"):
+            assert (imported_value != value).nnz == 0
+        else:
+            assert imported_value == value
+
+    # the imported grid can be changed
+    imported_grid.nodes.loc[imported_grid.nodes.index[0], "x"] = 0
+    imported_grid.ref_node[0] = 0
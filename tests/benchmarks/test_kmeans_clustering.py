@@ -0,0 +1,75 @@
+"""
+Benchmarks of the clustering step of the grid optimization.
+
+Run them with `pytest tests/benchmarks`. The large village is only
+included if the environment variable `BENCHMARK_LARGE` is set.
+"""
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from k_means_constrained import KMeansConstrained
+
+from fastapi_app.tools.optimizer import GridOptimizer
+
+from villages import village
+
+N_CONSUMERS = [1000] + ([10000] if os.environ.get("BENCHMARK_LARGE") else [])
+
+
+def optimizer():
+    return GridOptimizer(
+        start_date="2021-01-01", n_days=365, project_lifetime=20, wacc=0.1, tax=0
+    )
+
+
+@pytest.mark.parametrize("n_consumers", N_CONSUMERS)
+def test_kmeans_unconstrained(benchmark, n_consumers):
+    benchmark.group = f"kmeans-{n_consumers}"
+    grid = village(n_consumers, pole_max_connection=0)
+    n_clusters = n_consumers // 10
+
+    benchmark.pedantic(
+        optimizer().kmeans_clustering, args=(grid, n_clusters), rounds=1
+    )
+
+    assert grid.poles().shape[0] == n_clusters
+
+
+@pytest.mark.parametrize("n_consumers", N_CONSUMERS)
+def test_kmeans_non_binding_constraint(benchmark, n_consumers):
+    benchmark.group = f"kmeans-{n_consumers}"
+    grid = village(n_consumers, pole_max_connection=n_consumers)
+    n_clusters = n_consumers // 10
+
+    benchmark.pedantic(
+        optimizer().kmeans_clustering, args=(grid, n_clusters), rounds=1
+    )
+
+    assert grid.poles().shape[0] == n_clusters
+
+
+@pytest.mark.parametrize("n_consumers", N_CONSUMERS)
+def test_kmeans_constrained_solver(benchmark, n_consumers):
+    """
+    Reference: the constrained solver, which was used for every call before.
+    """
+    benchmark.group = f"kmeans-{n_consumers}"
+    grid = village(n_consumers, pole_max_connection=n_consumers)
+    n_clusters = n_consumers // 10
+    kmeans = KMeansConstrained(
+        n_clusters=n_clusters,
+        init="k-means++",
+        n_init=10,
+        max_iter=300,
+        tol=1e-4,
+        size_min=0,
+        size_max=n_consumers,
+        random_state=0,
+    )
+
+    benchmark.pedantic(kmeans.fit, args=(grid.nodes[["x", "y"]].values,), rounds=1)
+
+    assert kmeans.cluster_centers_.shape[0] == n_clusters
@@ -0,0 +1,135 @@
+"""
+Benchmarks and parity checks of the identification of solar home systems.
+
+The nodes which are disconnected from the grid are compared with the
+results of the original implementation in `shs_reference.json`, so that
+faster algorithms can replace it. The reference is written again with
+`BENCHMARK_BASELINE=update`, which should only be done if the results are
+meant to change. The peak memory allocated by each stage is stored as extra
+information of the benchmarks. The settlements of 30 nodes need several
+rounds of disconnections, and the large settlements, which need even more,
+are only included if the environment variable `BENCHMARK_LARGE` is set.
+"""
+import json
+import os
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import fastapi_app.tools.shs_identification as shs_ident
+
+from villages import settlement
+
+N_NODES = [10, 20, 30] + ([50] if os.environ.get("BENCHMARK_LARGE") else [])
+LAYOUTS = ["dispersed", "clustered"]
+
+# prices of the solar home systems for low, medium and high demand [$]
+SHS_PRICES = {"cheap": [100, 250, 600], "expensive": [300, 700, 1500]}
+
+CABLE_PRICE_PER_METER = 4
+CONNECTION_PRICE = 100
+
+REFERENCE_FILE = os.path.join(os.path.dirname(__file__), "shs_reference.json")
+
+_reference_results = {}
+
+
+def shs_nodes(n_nodes, layout, shs_prices):
+    """
+    Creates the nodes of a settlement, whose demand level and thus price of
+    the solar home system is given by the surface area of the buildings.
+    """
+    buildings = settlement(n_nodes, layout=layout)
+    demand_level = np.digitize(
+        buildings["surface_area"],
+        np.quantile(buildings["surface_area"], [0.5, 0.85]),
+    )
+    nodes_df = pd.DataFrame(
+        {
+            "x_coordinate": buildings["x"].values,
+            "y_coordinate": buildings["y"].values,
+            "required_capacity": buildings["average_consumption"].values,
+            "max_power": buildings["peak_demand"].values,
+            "shs_price": np.array(SHS_PRICES[shs_prices], dtype=float)[demand_level],
+        },
+        index=pd.Index(buildings.index, name="label"),
+    )
+
+    return nodes_df
+
+
+def peak_allocation(function, **kwargs):
+    """
+    Returns the peak memory allocated during the call of a function [bytes].
+    """
+    tracemalloc.start()
+    try:
+        function(**kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture(scope="module")
+def reference():
+    if os.path.exists(REFERENCE_FILE):
+        with open(REFERENCE_FILE) as reference_file:
+            results = json.load(reference_file)
+    else:
+        results = {}
+
+    yield results
+
+    if (os.environ.get("BENCHMARK_BASELINE") == "update") and _reference_results:
+        results.update(_reference_results)
+        with open(REFERENCE_FILE, "w") as reference_file:
+            json.dump(dict(sorted(results.items())), reference_file, indent=4)
+            reference_file.write("\n")
+
+
+@pytest.mark.parametrize("shs_prices", SHS_PRICES)
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("n_nodes", N_NODES)
+def test_mst_links(benchmark, n_nodes, layout, shs_prices):
+    benchmark.group = f"shs-mst-links-{n_nodes}"
+    nodes_df = shs_nodes(n_nodes, layout, shs_prices)
+
+    links_df = benchmark.pedantic(shs_ident.mst_links, args=(nodes_df,), rounds=1)
+
+    benchmark.extra_info["peak_allocation"] = peak_allocation(
+        shs_ident.mst_links, nodes_df=nodes_df
+    )
+    assert links_df.shape[0] == n_nodes - 1
+
+
+@pytest.mark.parametrize("shs_prices", SHS_PRICES)
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("n_nodes", N_NODES)
+def test_nodes_to_disconnect_from_grid(
+    benchmark, reference, n_nodes, layout, shs_prices
+):
+    benchmark.group = f"shs-nodes-to-disconnect-{n_nodes}"
+    nodes_df = shs_nodes(n_nodes, layout, shs_prices)
+    kwargs = dict(
+        nodes_df=nodes_df,
+        links_df=shs_ident.mst_links(nodes_df),
+        cable_price_per_meter=CABLE_PRICE_PER_METER,
+        additional_price_for_connection_per_node=CONNECTION_PRICE,
+    )
+
+    disconnected_nodes = benchmark.pedantic(
+        shs_ident.nodes_to_disconnect_from_grid, kwargs=kwargs, rounds=1
+    )
+
+    benchmark.extra_info["peak_allocation"] = peak_allocation(
+        shs_ident.nodes_to_disconnect_from_grid, **kwargs
+    )
+    disconnected_nodes = sorted(disconnected_nodes, key=int)
+    case = f"{n_nodes}-{layout}-{shs_prices}"
+    _reference_results[case] = disconnected_nodes
+    if case in reference:
+        assert disconnected_nodes == reference[case]
@@ -0,0 +1,105 @@
+"""
+Fixtures for testing the endpoints of the app against a temporary database.
+
+The app reads and writes its *.csv files relative to the working directory,
+so each test runs in its own temporary directory containing a database with
+seeded project inputs, demand profiles and time series.
+"""
+import asyncio
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from timeseries import demand_and_solar
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROJECT_INPUTS = {
+    "project_name": "Test project",
+    "project_description": "",
+    "interest_rate": 10,
+    "project_lifetime": 20,
+    "start_date": "2021-01-01",
+    "temporal_resolution": 1,
+    "n_days": 365,
+    "distribution_cable_lifetime": 20,
+    "distribution_cable_capex": 10,
+    "distribution_cable_max_length": 40,
+    "connection_cable_lifetime": 20,
+    "connection_cable_capex": 4,
+    "connection_cable_max_length": 30,
+    "pole_lifetime": 20,
+    "pole_capex": 800,
+    "pole_max_n_connections": 5,
+    "mg_connection_cost": 140,
+    "shs_lifetime": 5,
+    "shs_tier_one_capex": 1,
+    "shs_tier_two_capex": 1,
+    "shs_tier_three_capex": 1,
+    "shs_tier_four_capex": 1,
+    "shs_tier_five_capex": 1,
+}
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    """
+    Returns the `fastapi_app.main` module using an empty database in a
+    temporary directory. The jobs run in the test process.
+    """
+    # the static files of the app are resolved when it is imported
+    monkeypatch.chdir(ROOT)
+    import fastapi_app.main as main
+    from fastapi_app.tools import io, workers
+    from fastapi_app.tools.node_store import NodeStore
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(main.directory_database)
+    os.makedirs(main.directory_inputs)
+    demand_and_solar().to_csv(main.full_path_timeseries, index=False)
+    rng = np.random.default_rng(0)
+    pd.DataFrame(rng.random((8760, 5)) / 1000).to_csv(
+        main.full_path_demands, sep=";", header=False, index=False
+    )
+    pd.DataFrame([PROJECT_INPUTS]).to_csv(main.full_path_stored_inputs, index=False)
+
+    monkeypatch.setattr(
+        main, "node_store", NodeStore(main.full_path_nodes, main.full_path_links)
+    )
+    monkeypatch.setattr(
+        main, "previous_grid_design", {"grid": None, "parameters": None}
+    )
+    monkeypatch.setattr(main, "worker_pool", workers.WorkerPool(size=0))
+    monkeypatch.setattr(main, "export_jobs", {})
+    monkeypatch.setattr(main, "import_jobs", {})
+    io._json_payload_cache.clear()
+    io._timeseries_cache.clear()
+
+    asyncio.run(main.database_initialization(nodes=True, links=True))
+    return main
+
+
+@pytest.fixture
+def client(main):
+    """
+    Sends requests to the app and returns the responses.
+
+    `TestClient` does not work with the installed version of httpx, so the
+    requests are sent through the ASGI transport of httpx. The startup
+    events of the app are not run.
+    """
+    import httpx
+
+    def request(method, url, **kwargs):
+        async def send():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as async_client:
+                return await async_client.request(method, url, **kwargs)
+
+        return asyncio.run(send())
+
+    return request
@@ -0,0 +1,93 @@
+"""
+Tests of adding many nodes given as columns at once (`/database_add_nodes`).
+"""
+import pandas as pd
+import pytest
+
+from villages import settlement
+
+
+def test_add_nodes(main, client):
+    buildings = settlement(50, seed=5)
+
+    response = client(
+        "POST",
+        "/database_add_nodes",
+        json={
+            "latitude": buildings["latitude"].tolist(),
+            "longitude": buildings["longitude"].tolist(),
+            "surface_area": buildings["surface_area"].tolist(),
+            "how_added": ["automatic"] * 50,
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "inserted": 50,
+        "updated": 0,
+        "removed": 0,
+        "invalid": 0,
+        "invalid_rows": [],
+    }
+    nodes = pd.read_csv(main.full_path_nodes)
+    assert nodes.shape[0] == 50
+    assert (nodes["node_type"] == "consumer").all()
+    assert (nodes["how_added"] == "automatic").all()
+    # the demands are estimated from the surface areas
+    assert nodes["peak_demand"].notna().all()
+    assert nodes["average_consumption"].notna().all()
+
+    # adding the same nodes again updates them
+    response = client(
+        "POST",
+        "/database_add_nodes",
+        json={
+            "latitude": buildings["latitude"].tolist()[:10],
+            "longitude": buildings["longitude"].tolist()[:10],
+            "peak_demand": [1.5] * 10,
+        },
+    )
+
+    assert response.json()["updated"] == 10
+    assert pd.read_csv(main.full_path_nodes).shape[0] == 50
+
+
+def test_invalid_nodes_are_reported(main, client):
+    response = client(
+        "POST",
+        "/database_add_nodes",
+        json={
+            "latitude": [10.1, None, 10.3, 95.0, 10.5, 10.6],
+            "longitude": [8.1, 8.2, 8.3, 8.4, 8.5, 8.6],
+            "node_type": ["consumer", "consumer", "consumer", None, "tree", "pole"],
+            "surface_area": [50.0, 50.0, None, 50.0, 50.0, None],
+            "peak_demand": [None, None, None, None, None, None],
+        },
+    )
+
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["inserted"] == 2
+    assert summary["invalid"] == 4
+    assert [invalid["row"] for invalid in summary["invalid_rows"]] == [2, 3, 4, 5]
+    errors = [invalid["error"] for invalid in summary["invalid_rows"]]
+    assert "latitude" in errors[0]
+    assert errors[1] == "'peak_demand' or 'surface_area' is missing"
+    assert "latitude" in errors[2]
+    assert "node_type" in errors[3]
+
+    nodes = pd.read_csv(main.full_path_nodes)
+    assert nodes["latitude"].tolist() == pytest.approx([10.1, 10.6])
+    assert nodes["node_type"].tolist() == ["consumer", "pole"]
+    assert nodes.loc[0, "peak_demand"] > 0
+
+
+def test_columns_of_different_lengths_are_rejected(main, client):
+    response = client(
+        "POST",
+        "/database_add_nodes",
+        json={"latitude": [10.1, 10.2], "longitude": [8.1]},
+    )
+
+    assert response.status_code == 422
+    assert pd.read_csv(main.full_path_nodes).shape[0] == 0
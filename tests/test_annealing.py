@@ -0,0 +1,99 @@
+"""
+Tests of the improvement of pole layouts by simulated annealing
+(`fastapi_app.tools.annealing`).
+"""
+import numpy as np
+import pytest
+
+from fastapi_app.tools.annealing import anneal_poles, pole_layout_cost
+from fastapi_app.tools.assignment import capacitated_kmeans
+
+from villages import settlement
+
+from test_grid_update import optimizer
+
+CAPACITY = 6
+CONNECTION_CABLE_MAX_LENGTH = 90
+DISTRIBUTION_CABLE_MAX_LENGTH = 40
+COSTS = {
+    "epc_connection_cable": 1.0,
+    "epc_distribution_cable": 2.0,
+    "epc_pole": 80.0,
+}
+
+
+@pytest.fixture(scope="module")
+def layout():
+    """
+    Consumers of a village with the poles of the capacitated k-means.
+    """
+    consumers = settlement(120, seed=3)[["x", "y"]].to_numpy(dtype=float)
+    rng = np.random.default_rng(0)
+    centers = consumers[rng.choice(consumers.shape[0], 24, replace=False)]
+    poles, labels = capacitated_kmeans(consumers, centers, CAPACITY)
+    return consumers, poles, labels
+
+
+def anneal(layout, **kwargs):
+    consumers, poles, labels = layout
+    return anneal_poles(
+        consumers=consumers,
+        poles=poles,
+        labels=labels,
+        capacity=CAPACITY,
+        create_tree=optimizer().create_tree_of_points,
+        connection_cable_max_length=CONNECTION_CABLE_MAX_LENGTH,
+        distribution_cable_max_length=DISTRIBUTION_CABLE_MAX_LENGTH,
+        **COSTS,
+        **kwargs,
+    )
+
+
+def test_initial_layout_is_feasible(layout):
+    consumers, poles, labels = layout
+    length = np.sqrt(((consumers - poles[labels]) ** 2).sum(axis=1))
+
+    assert np.bincount(labels).max() <= CAPACITY
+    assert length.max() <= CONNECTION_CABLE_MAX_LENGTH
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_annealing_keeps_layout_feasible(layout, seed):
+    consumers, poles, _ = layout
+
+    best = anneal(layout, n_iterations=5000, seed=seed)
+
+    assert best["poles"].shape == poles.shape
+    assert np.bincount(best["labels"], minlength=poles.shape[0]).max() <= CAPACITY
+    length = np.sqrt(((consumers - best["poles"][best["labels"]]) ** 2).sum(axis=1))
+    assert length.max() <= CONNECTION_CABLE_MAX_LENGTH
+
+    assert best["cost"] <= best["initial_cost"]
+    assert best["cost"] == pytest.approx(
+        pole_layout_cost(
+            consumers,
+            best["poles"],
+            best["labels"],
+            optimizer().create_tree_of_points(best["poles"]),
+            distribution_cable_max_length=DISTRIBUTION_CABLE_MAX_LENGTH,
+            **COSTS,
+        )
+    )
+    best_costs = [entry[3] for entry in best["trace"]]
+    assert best_costs == sorted(best_costs, reverse=True)
+
+
+def test_best_layout_is_kept_between_trace_points(layout):
+    # without any refresh or trace point during the chain, the best layout
+    # is only known from the accepted moves, which mostly lower the cost at
+    # a low temperature
+    best = anneal(
+        layout,
+        n_iterations=2000,
+        initial_temperature=1.0,
+        refresh_interval=10**6,
+        trace_interval=10**6,
+    )
+
+    assert best["trace"] == []
+    assert best["cost"] < best["initial_cost"]
@@ -0,0 +1,88 @@
+"""
+Tests of the greedy capacitated assignment of consumers to poles, which is
+used instead of `KMeansConstrained` with `assignment="greedy"`.
+"""
+import numpy as np
+import pytest
+
+from fastapi_app.tools.assignment import (
+    assignment_cost,
+    exact_assignment,
+    greedy_assignment,
+)
+from fastapi_app.tools.optimizer import GridOptimizer
+
+from villages import village
+
+CONNECTION_CABLE_MAX_LENGTH = 60
+DISTRIBUTION_CABLE_MAX_LENGTH = 40
+POLE_MAX_CONNECTION = 8
+
+
+def optimizer():
+    return GridOptimizer(
+        start_date="2021-01-01",
+        n_days=365,
+        project_lifetime=20,
+        wacc=0.1,
+        tax=0,
+        assignment="greedy",
+    )
+
+
+@pytest.mark.parametrize("layout", ["dispersed", "clustered"])
+def test_greedy_clustering_respects_capacity(layout):
+    grid = village(120, pole_max_connection=POLE_MAX_CONNECTION, layout=layout)
+    opt = optimizer()
+
+    opt.kmeans_clustering(grid, 20)
+
+    consumers = grid.consumers()
+    assert consumers["cluster_label"].value_counts().max() <= POLE_MAX_CONNECTION
+
+    # the gap is reported against the exact assignment to the same poles
+    poles = grid.poles()[["x", "y"]].to_numpy(dtype=float)
+    coordinates = consumers[["x", "y"]].to_numpy(dtype=float)
+    labels = consumers["cluster_label"].to_numpy(dtype=int)
+    exact_labels = exact_assignment(coordinates, poles, POLE_MAX_CONNECTION)
+    gap = opt.assignment_gap
+
+    assert gap["reference_type"] == "exact"
+    assert gap["objective"] == pytest.approx(
+        assignment_cost(coordinates, poles, labels)
+    )
+    assert gap["reference"] == pytest.approx(
+        assignment_cost(coordinates, poles, exact_labels)
+    )
+    assert gap["gap"] >= 0
+
+
+def test_greedy_assignment_is_close_to_exact():
+    rng = np.random.default_rng(0)
+    consumers = rng.random((200, 2)) * 500
+    poles = rng.random((25, 2)) * 500
+
+    labels = greedy_assignment(consumers, poles, POLE_MAX_CONNECTION)
+    exact_labels = exact_assignment(consumers, poles, POLE_MAX_CONNECTION)
+
+    assert np.bincount(labels).max() <= POLE_MAX_CONNECTION
+    cost = assignment_cost(consumers, poles, labels)
+    exact_cost = assignment_cost(consumers, poles, exact_labels)
+    assert exact_cost <= cost <= 1.1 * exact_cost
+
+
+def test_greedy_design_respects_connection_length():
+    grid = village(120, pole_max_connection=POLE_MAX_CONNECTION, layout="clustered")
+    grid.get_load_centroid()
+    grid.get_nodes_distances_from_load_centroid()
+
+    optimizer().design_grid(
+        grid=grid,
+        connection_cable_max_length=CONNECTION_CABLE_MAX_LENGTH,
+        distribution_cable_max_length=DISTRIBUTION_CABLE_MAX_LENGTH,
+    )
+
+    connections = grid.links[grid.links["link_type"] == "connection"]
+    assert sorted(connections["to_node"]) == sorted(grid.consumers().index)
+    assert (connections["length"] <= CONNECTION_CABLE_MAX_LENGTH + 1e-6).all()
+    assert connections["from_node"].value_counts().max() <= POLE_MAX_CONNECTION
@@ -0,0 +1,112 @@
+"""
+Tests of the *.xlsx export of a project, which is written in the background
+(`/export_data/`) and downloaded with `/download_export_file`.
+"""
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from villages import settlement
+
+SETTINGS = {
+    "cost_pole": 800,
+    "cost_connection": 140,
+    "cost_distribution_cable": 10,
+    "cost_connection_cable": 4,
+    "shs_identification_cable_cost": 10,
+    "shs_identification_connection_cost": 140,
+    "number_of_relaxation_steps_nr": 3,
+}
+
+
+def add_consumers(main, n_consumers=30):
+    buildings = settlement(n_consumers, seed=6)
+    nodes = pd.DataFrame(
+        {
+            "latitude": buildings["latitude"],
+            "longitude": buildings["longitude"],
+            "node_type": "consumer",
+            "consumer_type": "household",
+            "consumer_detail": "default",
+            "surface_area": buildings["surface_area"],
+            "peak_demand": buildings["peak_demand"],
+            "average_consumption": buildings["average_consumption"],
+            "is_connected": True,
+            "how_added": "automatic",
+        }
+    )
+    main.database_add(add_nodes=True, add_links=False, inlet=nodes.to_dict())
+
+
+def test_export_is_written_and_served_with_etag(main, client):
+    add_consumers(main)
+
+    response = client("POST", "/export_data/", json=SETTINGS)
+
+    assert response.status_code == 200
+    export_hash = response.json()["hash"]
+    # the background task has finished when the response has been received
+    path = main.exports.export_path(
+        main.directory_import_export, main.project_name(), export_hash, "xlsx"
+    )
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        assert workbook.sheetnames == ["nodes", "links", "settings"]
+        n_rows = sum(1 for _ in workbook["nodes"].iter_rows())
+    finally:
+        workbook.close()
+    assert n_rows == 31
+    assert main.export_jobs[export_hash] == "ready"
+
+    download = client(
+        "GET", "/download_export_file", params={"export_hash": export_hash}
+    )
+
+    assert download.status_code == 200
+    assert download.headers["etag"] == f'"{export_hash}"'
+    assert download.headers["content-type"] == main.exports.XLSX_MEDIA_TYPE
+    assert export_hash in download.headers["content-disposition"]
+    openpyxl.load_workbook(io.BytesIO(download.content)).close()
+
+    # without a hash, the latest export is downloaded
+    latest = client("GET", "/download_export_file")
+    assert latest.headers["etag"] == f'"{export_hash}"'
+
+
+def test_unchanged_project_is_not_exported_again(main, client):
+    add_consumers(main)
+    export_hash = client("POST", "/export_data/", json=SETTINGS).json()["hash"]
+
+    response = client("POST", "/export_data/", json=SETTINGS)
+
+    assert response.json() == {
+        "code": "success",
+        "hash": export_hash,
+        "status": "ready",
+    }
+
+    # other settings or nodes give another export
+    changed = client("POST", "/export_data/", json={**SETTINGS, "cost_pole": 900})
+    assert changed.json()["hash"] != export_hash
+    add_consumers(main, n_consumers=31)
+    changed = client("POST", "/export_data/", json=SETTINGS)
+    assert changed.json()["hash"] != export_hash
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_export_without_pyarrow_is_refused(main, client, monkeypatch, file_format):
+    add_consumers(main)
+    monkeypatch.setattr(main.exports, "arrow_available", lambda: False)
+
+    response = client("GET", f"/export/nodes/{file_format}")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "error": "Parquet and Arrow exports require the package 'pyarrow'!"
+    }
+    # the GeoJSON export does not need it
+    geojson = client("GET", "/export/nodes/geojson")
+    assert geojson.status_code == 200
+    assert len(geojson.json()["features"]) == 30
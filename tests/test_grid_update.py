@@ -0,0 +1,232 @@
+"""
+Tests of `GridOptimizer.update_grid`, which adds and removes consumers of a
+previously designed grid without designing the whole grid again.
+"""
+import copy
+import functools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fastapi_app.tools.grids import utm_projection
+from fastapi_app.tools.optimizer import GridOptimizer
+
+from villages import settlement, village
+
+CONNECTION_CABLE_MAX_LENGTH = 60
+DISTRIBUTION_CABLE_MAX_LENGTH = 40
+POLE_MAX_CONNECTION = 10
+
+N_CONSUMERS = 150
+CONSUMER_COLUMNS = [
+    "latitude",
+    "longitude",
+    "peak_demand",
+    "average_consumption",
+    "surface_area",
+]
+
+
+def optimizer():
+    return GridOptimizer(
+        start_date="2021-01-01",
+        n_days=365,
+        project_lifetime=20,
+        wacc=0.1,
+        tax=0,
+        assignment="greedy",
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def cached_design():
+    grid = village(N_CONSUMERS, pole_max_connection=POLE_MAX_CONNECTION, seed=1)
+    grid.get_load_centroid()
+    grid.get_nodes_distances_from_load_centroid()
+    optimizer().design_grid(
+        grid=grid,
+        connection_cable_max_length=CONNECTION_CABLE_MAX_LENGTH,
+        distribution_cable_max_length=DISTRIBUTION_CABLE_MAX_LENGTH,
+    )
+    return grid
+
+
+@pytest.fixture
+def grid():
+    return copy.deepcopy(cached_design())
+
+
+def changed_consumers(grid, n_removed, offsets):
+    """
+    Returns the consumers of the grid without the first `n_removed` ones and
+    with new consumers at the given (x,y) offsets [m] from the last ones.
+    """
+    consumers = grid.consumers()
+    new_consumers = consumers.iloc[consumers.shape[0] - len(offsets) :].copy()
+    x = new_consumers["x"].to_numpy() + [offset[0] for offset in offsets]
+    y = new_consumers["y"].to_numpy() + [offset[1] for offset in offsets]
+    longitude, latitude = utm_projection()(
+        x + grid.ref_node[0], y + grid.ref_node[1], inverse=True
+    )
+    new_consumers["longitude"] = np.asarray(longitude)
+    new_consumers["latitude"] = np.asarray(latitude)
+
+    return pd.concat(
+        [consumers.iloc[n_removed:], new_consumers], ignore_index=True
+    )[CONSUMER_COLUMNS]
+
+
+def update(grid, nodes, **kwargs):
+    added_nodes, removed_nodes = grid.find_consumer_delta(nodes=nodes)
+    return optimizer().update_grid(
+        grid=grid,
+        added_nodes=added_nodes,
+        removed_nodes=removed_nodes,
+        connection_cable_max_length=CONNECTION_CABLE_MAX_LENGTH,
+        distribution_cable_max_length=DISTRIBUTION_CABLE_MAX_LENGTH,
+        **kwargs,
+    )
+
+
+def assert_grid_is_feasible(grid):
+    consumers = grid.consumers()
+    poles = grid.poles()
+    links = grid.links
+
+    # every consumer is connected to exactly one pole, which is close enough
+    connections = links[links["link_type"] == "connection"]
+    assert sorted(connections["to_node"]) == sorted(consumers.index)
+    assert connections["from_node"].isin(poles.index).all()
+    assert (connections["length"] <= CONNECTION_CABLE_MAX_LENGTH + 1e-6).all()
+
+    # no pole exceeds its number of connections
+    assert connections["from_node"].value_counts().max() <= POLE_MAX_CONNECTION
+
+    # the distribution links form a single tree containing the power house
+    distribution = links[links["link_type"] == "distribution"]
+    assert distribution.shape[0] == poles.shape[0] - 1
+    power_house = poles.index[poles["node_type"] == "power-house"]
+    assert len(power_house) == 1
+    neighbours = {pole: set() for pole in poles.index}
+    for start, end in zip(distribution["from_node"], distribution["to_node"]):
+        neighbours[start].add(end)
+        neighbours[end].add(start)
+    reached, queue = {power_house[0]}, [power_house[0]]
+    while queue:
+        for neighbour in neighbours[queue.pop()] - reached:
+            reached.add(neighbour)
+            queue.append(neighbour)
+    assert reached == set(poles.index)
+
+
+def test_designed_grid_is_feasible(grid):
+    assert_grid_is_feasible(grid)
+
+
+@pytest.mark.parametrize(
+    "n_removed, offsets",
+    [
+        (0, [(5, 5), (-10, 3), (2, -8)]),
+        (6, []),
+        (4, [(8, 0), (0, 45), (-30, -30)]),
+        # far away consumers need new poles
+        (1, [(150, 0), (0, -200)]),
+    ],
+)
+def test_update_keeps_grid_feasible(grid, n_removed, offsets):
+    nodes = changed_consumers(grid, n_removed, offsets)
+
+    assert update(grid, nodes, max_cost_increase=np.inf)
+
+    assert grid.consumers().shape[0] == N_CONSUMERS - n_removed + len(offsets)
+    assert_grid_is_feasible(grid)
+
+
+def test_update_removes_empty_clusters(grid):
+    connections = grid.links[grid.links["link_type"] == "connection"]
+    n_connections = connections["from_node"].value_counts()
+    pole = n_connections.index[-1]
+    removed = connections["to_node"][connections["from_node"] == pole]
+    nodes = grid.consumers().drop(index=removed)[CONSUMER_COLUMNS]
+
+    assert update(grid, nodes, max_cost_increase=np.inf)
+
+    assert pole not in grid.nodes.index
+    assert_grid_is_feasible(grid)
+
+
+def test_update_is_rejected_beyond_max_delta_share(grid):
+    nodes = changed_consumers(grid, 20, [])
+
+    assert not update(grid, nodes, max_delta_share=0.1, max_cost_increase=np.inf)
+
+
+def test_update_is_rejected_beyond_max_cost_increase(grid):
+    nodes = changed_consumers(grid, 4, [(8, 0), (0, 45)])
+    cost_per_consumer = grid.cost() / grid.consumers().shape[0]
+
+    updated_grid = copy.deepcopy(grid)
+    assert update(updated_grid, nodes, max_cost_increase=np.inf)
+    increase = updated_grid.cost() / updated_grid.consumers().shape[0]
+    increase = increase / cost_per_consumer - 1
+
+    assert update(copy.deepcopy(grid), nodes, max_cost_increase=increase + 1e-6)
+    assert not update(copy.deepcopy(grid), nodes, max_cost_increase=increase - 1e-6)
+
+
+def add_consumers(main, buildings):
+    nodes = pd.DataFrame(
+        {
+            "latitude": buildings["latitude"],
+            "longitude": buildings["longitude"],
+            "node_type": "consumer",
+            "consumer_type": "household",
+            "consumer_detail": "default",
+            "surface_area": buildings["surface_area"],
+            "peak_demand": buildings["peak_demand"],
+            "average_consumption": buildings["average_consumption"],
+            "is_connected": True,
+            "how_added": "automatic",
+        }
+    )
+    main.database_add(add_nodes=True, add_links=False, inlet=nodes.to_dict())
+
+
+@pytest.fixture
+def jobs(main, monkeypatch):
+    """
+    Counts the grid designs and updates sent to the workers.
+    """
+    counts = {"design_grid": 0, "update_grid": 0}
+    for name in counts:
+
+        def job(*, _name=name, _function=getattr(main.workers, name), **kwargs):
+            counts[_name] += 1
+            return _function(**kwargs)
+
+        monkeypatch.setattr(main.workers, name, job)
+    return counts
+
+
+def test_optimize_grid_is_only_incremental_on_request(main, client, jobs):
+    buildings = settlement(41, seed=7)
+    add_consumers(main, buildings.iloc[:39])
+    params = {"assignment": "greedy"}
+    assert client("POST", "/optimize_grid/", params=params).status_code == 200
+    assert jobs == {"design_grid": 1, "update_grid": 0}
+
+    # without the parameter, the grid is designed again
+    add_consumers(main, buildings.iloc[39:40])
+    assert client("POST", "/optimize_grid/", params=params).status_code == 200
+    assert jobs == {"design_grid": 2, "update_grid": 0}
+
+    # the update runs as a job of the workers
+    add_consumers(main, buildings.iloc[40:])
+    response = client(
+        "POST", "/optimize_grid/", params={**params, "incremental": "true"}
+    )
+    assert response.status_code == 200
+    assert jobs["update_grid"] == 1
+    consumers = pd.read_csv(main.full_path_nodes)
+    assert (consumers["node_type"] == "consumer").sum() == 41
@@ -0,0 +1,169 @@
+"""
+Tests of the vectorized methods of the `Grid` on small grids built by hand.
+"""
+import numpy as np
+import pytest
+
+from fastapi_app.tools.grids import Grid
+
+
+def empty_grid():
+    # the default nodes and links are shared by all grids created without
+    # them, so each test grid gets its own empty ones
+    return Grid(
+        nodes=Grid().nodes.iloc[0:0].copy(), links=Grid().links.iloc[0:0].copy()
+    )
+
+
+def grid_of_poles(coordinates):
+    grid = empty_grid()
+    for label, (x, y) in coordinates.items():
+        grid.add_node(label=label, x=x, y=y, node_type="pole")
+    return grid
+
+
+@pytest.mark.parametrize(
+    "start, end",
+    [
+        ((0, 0), (0, 100)),
+        ((0, 100), (0, 0)),
+        ((200, 50), (300, 50)),
+        ((300, 50), (200, 50)),
+    ],
+    ids=["equal x", "equal x reversed", "equal y", "equal y reversed"],
+)
+def test_poles_are_placed_evenly_on_axis_parallel_links(start, end):
+    grid = grid_of_poles({"p-0": start, "p-1": end})
+    grid.add_links_bulk(["p-0"], ["p-1"], link_type="distribution")
+
+    grid.add_fixed_poles_on_long_links(
+        long_links=grid.links.index, max_allowed_distance=40
+    )
+
+    added_poles = grid.nodes[grid.nodes["type_fixed"] == True]
+    assert list(added_poles.index) == ["p-2", "p-3"]
+    assert not added_poles[["x", "y"]].isna().any().any()
+    # 100 m are split into three sections of 33.3 m
+    expected = np.array(start) + np.outer([1 / 3, 2 / 3], np.subtract(end, start))
+    assert added_poles[["x", "y"]].to_numpy(dtype=float) == pytest.approx(expected)
+    assert (added_poles["how_added"] == "(p-0, p-1)").all()
+
+
+def test_poles_on_lines_of_different_lengths():
+    grid = empty_grid()
+
+    labels, n_added_poles = grid.add_fixed_poles_on_lines(
+        start=[(0, 0), (0, 0), (10, 10)],
+        end=[(0, 30), (0, 81), (10, 10)],
+        max_allowed_distance=40,
+        how_added="long link",
+    )
+
+    # lines within the distance and lines of zero length get no poles
+    assert list(n_added_poles) == [0, 2, 0]
+    assert list(labels) == ["p-0", "p-1"]
+    assert grid.nodes.loc[labels, "x"].tolist() == [0, 0]
+    assert grid.nodes.loc[labels, "y"].tolist() == pytest.approx([27, 54])
+
+
+def test_links_of_poles_with_common_label_prefix():
+    # `p-1` is a prefix of `p-10`, `p-11` and `p-12`
+    grid = grid_of_poles({f"p-{i}": (10 * i, 0) for i in range(13)})
+    for label in ["c-0", "c-1", "c-2", "c-3", "c-4"]:
+        grid.add_node(label=label, x=0, y=10)
+    grid.add_links_bulk(
+        ["p-0", "p-1", "p-1"] + [f"p-{i}" for i in range(2, 10)] + ["p-11"],
+        ["p-1", "p-2", "p-11"] + [f"p-{i + 1}" for i in range(2, 10)] + ["p-12"],
+        link_type="distribution",
+    )
+    grid.add_links_bulk(
+        ["p-1", "p-1", "p-11", "p-10", "p-10"],
+        ["c-0", "c-1", "c-2", "c-3", "c-4"],
+        link_type="connection",
+    )
+
+    grid.find_n_links_connected_to_each_pole()
+
+    poles = grid.nodes.loc[["p-1", "p-11", "p-10", "p-12"]]
+    assert poles["n_distribution_links"].astype(int).tolist() == [3, 2, 1, 1]
+    assert poles["n_connection_links"].astype(int).tolist() == [2, 1, 2, 0]
+    # the consumers keep their values
+    assert grid.nodes.loc["c-0", "n_connection_links"] == "0"
+
+
+def feeder_grid():
+    """
+    Power house with two feeders and one consumer out of the grid:
+
+        c-1
+         |          p-1 (30, 40) - c-1 (35, 40)
+        p-1         p-0 (30, 0)  - c-0 (30, -10)
+         |          p-2 (-20, 0) - c-3 (-20, 8)
+    p-2 - ph - p-0
+     |         |
+    c-3       c-0                c-2 (500, 500)
+    """
+    grid = grid_of_poles({"p-0": (30, 0), "p-1": (30, 40), "p-2": (-20, 0)})
+    grid.add_node(label="ph", x=0, y=0, node_type="power-house")
+    for label, (x, y) in {
+        "c-0": (30, -10),
+        "c-1": (35, 40),
+        "c-2": (500, 500),
+        "c-3": (-20, 8),
+    }.items():
+        grid.add_node(label=label, x=x, y=y)
+    grid.add_links_bulk(
+        ["ph", "p-0", "ph"], ["p-0", "p-1", "p-2"], link_type="distribution"
+    )
+    grid.add_links_bulk(
+        ["p-0", "p-1", "p-2"], ["c-0", "c-1", "c-3"], link_type="connection"
+    )
+    return grid
+
+
+# lengths of the distribution and connection cables from the power house
+ROUTES = {
+    "p-0": (30, 0),
+    "p-1": (70, 0),
+    "p-2": (20, 0),
+    "ph": (0, 0),
+    "c-0": (30, 10),
+    "c-1": (70, 5),
+    "c-3": (20, 8),
+}
+
+
+def test_cable_distance_from_power_house():
+    distance = feeder_grid().get_cable_distance_from_consumers_to_powerhub()
+
+    # the consumer out of the grid is not reached
+    assert sorted(distance.index) == sorted(ROUTES)
+    for label, (distribution, connection) in ROUTES.items():
+        assert distance.loc[label, "distribution cable [m]"] == pytest.approx(
+            distribution
+        )
+        assert distance.loc[label, "connection cable [m]"] == pytest.approx(
+            connection
+        )
+    assert (distance["powerhub label"] == "ph").all()
+
+
+def test_voltage_drop_at_nodes():
+    grid = feeder_grid()
+
+    voltage_drop = grid.get_voltage_drop_at_nodes()
+
+    # resistance of the go and return conductors: rho * 2 * length / section
+    rho = 0.0171
+    assert sorted(voltage_drop.index) == sorted(ROUTES)
+    for label, (distribution, connection) in ROUTES.items():
+        resistance = rho * 2 * distribution / 4 + rho * 2 * connection / 2.5
+        assert voltage_drop.loc[label, "voltage drop [V]"] == pytest.approx(
+            resistance * grid.max_current
+        )
+        assert voltage_drop.loc[label, "voltage drop fraction [%]"] == pytest.approx(
+            100 * resistance * grid.max_current / grid.voltage
+        )
+    assert voltage_drop.loc["c-1", "distribution cable resistance [Ω]"] == (
+        pytest.approx(rho * 2 * 70 / 4)
+    )
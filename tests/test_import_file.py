@@ -0,0 +1,106 @@
+"""
+Tests of the import of large files of nodes in chunks (`/import_file/{table}`
+and `fastapi_app.tools.uploads`).
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from fastapi_app.tools import uploads
+
+# the invalid row is in the second chunk, whose rows are counted on from the
+# rows of the first chunk
+N_ROWS = uploads.CHUNK_SIZE + 500
+INVALID_ROW = uploads.CHUNK_SIZE + 20
+
+
+def nodes_file(n_rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "latitude": np.round(10 + rng.random(n_rows), 6),
+            "longitude": np.round(8 + rng.random(n_rows), 6),
+            "node_type": "consumer",
+            "consumer_type": "household",
+            "consumer_detail": "default",
+            "surface_area": np.round(20 + 100 * rng.random(n_rows), 2),
+            "peak_demand": np.round(rng.random(n_rows), 3),
+            "average_consumption": np.round(rng.random(n_rows), 3),
+            "is_connected": True,
+            "how_added": "automatic",
+        }
+    )
+
+
+def test_csv_round_trip_with_invalid_row(main, client, tmp_path):
+    nodes = nodes_file(N_ROWS)
+    upload = nodes.astype({"latitude": object})
+    upload.loc[INVALID_ROW - 1, "latitude"] = "north"
+    upload.to_csv(tmp_path / "upload.csv", index=False)
+
+    with open(tmp_path / "upload.csv", "rb") as file:
+        response = client(
+            "POST",
+            "/import_file/nodes",
+            files={"file": ("nodes.csv", file, "text/csv")},
+        )
+
+    assert response.status_code == 200
+    job_id = response.json()["id"]
+    # the background task has finished when the response has been received
+    progress = client("GET", f"/import_progress/{job_id}").json()
+    assert progress["status"] == "done"
+    assert progress["error"] is None
+    assert progress["progress"] == 1.0
+    assert progress["n_rows"] == N_ROWS
+    assert progress["n_rows_read"] == N_ROWS
+    assert progress["n_rows_imported"] == N_ROWS - 1
+    assert progress["n_rows_invalid"] == 1
+    assert progress["invalid_rows"] == [
+        {"row": INVALID_ROW, "error": "'latitude' is missing or not a number"}
+    ]
+
+    # the valid rows are stored as they are in the file
+    stored = pd.read_csv(main.full_path_nodes)
+    expected = nodes.drop(index=INVALID_ROW - 1).reset_index(drop=True)
+    pd.testing.assert_frame_equal(stored, expected, check_dtype=False)
+    # the uploaded file is removed after the import
+    assert not any((tmp_path / main.directory_import_export).rglob("*.csv"))
+
+
+@pytest.mark.parametrize(
+    "table, file_name, error",
+    [
+        (
+            "nodes",
+            "nodes.txt",
+            "Only *.xlsx, *.csv and *.parquet files can be imported!",
+        ),
+        ("poles", "nodes.csv", "Unknown table 'poles'!"),
+    ],
+)
+def test_invalid_uploads_are_rejected(main, client, table, file_name, error):
+    response = client(
+        "POST",
+        f"/import_file/{table}",
+        files={"file": (file_name, b"latitude,longitude\n10,8\n", "text/csv")},
+    )
+
+    assert response.json() == {"error": error}
+    assert pd.read_csv(main.full_path_nodes).shape[0] == 0
+
+
+def test_parquet_import_without_pyarrow_is_refused(main, client, monkeypatch):
+    monkeypatch.setattr(main.exports, "arrow_available", lambda: False)
+
+    response = client(
+        "POST",
+        "/import_file/nodes",
+        files={"file": ("nodes.parquet", b"PAR1", "application/octet-stream")},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "error": "Parquet imports require the package 'pyarrow'!"
+    }
+    assert len(main.import_jobs) == 0
@@ -0,0 +1,76 @@
+"""
+Checks that the app starts without importing the optimization and geo
+libraries, which are only loaded on first use (see
+`fastapi_app/tools/lazy.py`).
+
+The cumulative import time of `fastapi_app.main` is measured with
+`python -X importtime` and must stay below `IMPORT_TIME_BUDGET` seconds
+(default: 3).
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET = float(os.environ.get("IMPORT_TIME_BUDGET", 3))
+
+HEAVY_MODULES = [
+    "oemof.solph",
+    "pyomo.environ",
+    "sklearn",
+    "k_means_constrained",
+    "munkres",
+    "networkx",
+    "pyproj",
+]
+
+
+def import_app(*arguments, code="import fastapi_app.main"):
+    """
+    Imports the app in a fresh interpreter and returns the finished process.
+    """
+    # the app resolves its static files relative to the root of the repository
+    return subprocess.run(
+        [sys.executable, *arguments, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def cumulative_import_time(stderr, module):
+    """
+    Returns the cumulative import time [s] of a module from the output of
+    `python -X importtime`.
+    """
+    for line in stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+    raise ValueError(f"module '{module}' was not imported")
+
+
+def test_heavy_modules_are_not_imported():
+    process = import_app(
+        code="import sys, fastapi_app.main; "
+        f"print(*[m for m in {HEAVY_MODULES} if m in sys.modules])"
+    )
+
+    assert process.stdout.split() == []
+
+
+def test_heavy_modules_are_imported_on_first_use():
+    process = import_app(
+        code="import sys, fastapi_app.tools.optimizer as optimizer; "
+        "optimizer.solph.Bus; print('oemof.solph' in sys.modules)"
+    )
+
+    # pyomo prints deprecation warnings to stdout while it is imported
+    assert process.stdout.split()[-1] == "True"
+
+
+def test_import_time_budget():
+    process = import_app("-X", "importtime")
+
+    assert cumulative_import_time(process.stderr, "fastapi_app.main") < BUDGET
@@ -0,0 +1,94 @@
+"""
+Tests of the encoded JSON payloads of the *.csv files, which are sent to the
+map (`fastapi_app.tools.io.read_csv_as_json`).
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fastapi_app.tools import io
+
+
+@pytest.fixture
+def nodes_csv(tmp_path):
+    io._json_payload_cache.clear()
+    yield str(tmp_path / "nodes.csv")
+    io._json_payload_cache.clear()
+
+
+def nodes(n_nodes, node_type="consumer"):
+    rng = np.random.default_rng(n_nodes)
+    return pd.DataFrame(
+        {
+            "latitude": np.round(10 + rng.random(n_nodes), 6),
+            "longitude": np.round(8 + rng.random(n_nodes), 6),
+            "node_type": node_type,
+            "surface_area": [np.nan] + list(np.round(rng.random(n_nodes - 1), 2)),
+            "n_connections": np.arange(n_nodes),
+            "is_connected": [True, False] * (n_nodes // 2) + [True] * (n_nodes % 2),
+        }
+    )
+
+
+def test_payload_has_layout_of_to_json(nodes_csv):
+    nodes(7).to_csv(nodes_csv, index=False)
+
+    payload = io.read_csv_as_json(nodes_csv)
+
+    # the previous response of the endpoints
+    assert json.loads(payload) == json.loads(pd.read_csv(nodes_csv).to_json())
+    assert list(json.loads(payload)["latitude"]) == [str(row) for row in range(7)]
+    assert json.loads(payload)["surface_area"]["0"] is None
+
+
+def test_payload_of_empty_file(nodes_csv):
+    pd.DataFrame(columns=["latitude", "longitude"]).to_csv(nodes_csv, index=False)
+
+    assert json.loads(io.read_csv_as_json(nodes_csv)) == {
+        "latitude": {},
+        "longitude": {},
+    }
+
+
+def test_payload_is_cached_until_file_is_written(nodes_csv):
+    nodes(5).to_csv(nodes_csv, index=False)
+    payload = io.read_csv_as_json(nodes_csv)
+
+    assert io.read_csv_as_json(nodes_csv) is payload
+
+    nodes(6, node_type="pole").to_csv(nodes_csv, index=False)
+    new_payload = io.read_csv_as_json(nodes_csv)
+
+    assert json.loads(new_payload) == json.loads(pd.read_csv(nodes_csv).to_json())
+    assert set(json.loads(new_payload)["node_type"].values()) == {"pole"}
+
+
+def test_rewrite_of_same_size_is_served(nodes_csv):
+    nodes(5).to_csv(nodes_csv, index=False)
+    version = io.file_version(nodes_csv)
+    io.read_csv_as_json(nodes_csv)
+
+    # another content of the same size is told apart by its modification time
+    content = open(nodes_csv).read().replace("consumer", "customer")
+    with open(nodes_csv, "w") as file:
+        file.write(content)
+    os.utime(nodes_csv, ns=(version[0], version[0] + 1))
+    payload = io.read_csv_as_json(nodes_csv)
+
+    assert io.file_version(nodes_csv)[1] == version[1]
+    assert set(json.loads(payload)["node_type"].values()) == {"customer"}
+
+
+def test_database_to_js_serves_new_nodes(main, client):
+    nodes(4).to_csv(main.full_path_nodes, index=False)
+    first = client("GET", "/database_to_js/nodes")
+
+    nodes(8).to_csv(main.full_path_nodes, index=False)
+    second = client("GET", "/database_to_js/nodes")
+
+    assert first.headers["content-type"] == "application/json"
+    assert len(first.json()["latitude"]) == 4
+    assert second.json() == json.loads(pd.read_csv(main.full_path_nodes).to_json())
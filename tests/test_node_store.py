@@ -0,0 +1,304 @@
+"""
+Tests of the `NodeStore`, which keeps the `nodes.csv` file and its index in
+sync and removes the poles and links invalidated by changes of consumers.
+"""
+import pandas as pd
+import pytest
+
+from fastapi_app.tools.node_store import (
+    CONSUMER_NODE_TYPES,
+    GRID_NODE_TYPES,
+    NodeStore,
+)
+
+COLUMNS = [
+    "latitude",
+    "longitude",
+    "node_type",
+    "consumer_type",
+    "consumer_detail",
+    "surface_area",
+    "peak_demand",
+    "average_consumption",
+    "is_connected",
+    "how_added",
+]
+
+
+def nodes(coordinates, node_type="consumer", peak_demand=1.0):
+    return pd.DataFrame(
+        {
+            "latitude": [latitude for latitude, _ in coordinates],
+            "longitude": [longitude for _, longitude in coordinates],
+            "node_type": node_type,
+            "consumer_type": "household",
+            "consumer_detail": "default",
+            "surface_area": 20.0,
+            "peak_demand": peak_demand,
+            "average_consumption": 0.5,
+            "is_connected": True,
+            "how_added": "manual",
+        }
+    )
+
+
+def links(pairs):
+    return pd.DataFrame(
+        {
+            "lat_from": [start[0] for start, _ in pairs],
+            "lon_from": [start[1] for start, _ in pairs],
+            "lat_to": [end[0] for _, end in pairs],
+            "lon_to": [end[1] for _, end in pairs],
+            "link_type": "distribution",
+            "length": 10.0,
+        }
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    path_nodes = str(tmp_path / "nodes.csv")
+    path_links = str(tmp_path / "links.csv")
+    pd.DataFrame(columns=COLUMNS).to_csv(path_nodes, index=False)
+    links([]).to_csv(path_links, index=False)
+    return NodeStore(path_nodes, path_links)
+
+
+def assert_index_matches_file(store):
+    df = pd.read_csv(store.path_nodes)
+    keys = list(zip(df["latitude"], df["longitude"], df["node_type"]))
+    assert store.keys == keys
+    assert store.index == {key: row for row, key in enumerate(keys)}
+    assert store.n_rows == df.shape[0]
+
+
+# two clusters of consumers with one pole each, and the power house
+CLUSTER_0 = [(10.0, 20.0), (10.0, 20.0002)]
+CLUSTER_1 = [(10.01, 20.0), (10.01, 20.0002)]
+POLE_0 = (10.0, 20.0001)
+POLE_1 = (10.01, 20.0001)
+POWER_HOUSE = (10.005, 20.0001)
+
+
+def store_design(store):
+    """
+    Stores the consumers, poles and links of a grid design with two clusters.
+    """
+    store.upsert(nodes(CLUSTER_0 + CLUSTER_1))
+    store.upsert(
+        pd.concat(
+            [
+                nodes([POLE_0, POLE_1], node_type="pole"),
+                nodes([POWER_HOUSE], node_type="power-house"),
+            ]
+        )
+    )
+    links(
+        [(POLE_0, point) for point in CLUSTER_0]
+        + [(POLE_1, point) for point in CLUSTER_1]
+        + [(POWER_HOUSE, POLE_0), (POWER_HOUSE, POLE_1)]
+    ).to_csv(store.path_links, index=False)
+
+    grid_nodes = pd.concat(
+        [
+            nodes(CLUSTER_0).assign(cluster_label=0),
+            nodes(CLUSTER_1).assign(cluster_label=1),
+            nodes([POLE_0], node_type="pole").assign(cluster_label=0),
+            nodes([POLE_1], node_type="pole").assign(cluster_label=1),
+            nodes([POWER_HOUSE], node_type="power-house").assign(cluster_label=0),
+        ]
+    )
+    store.set_clusters(grid_nodes)
+
+
+def test_upsert_inserts_and_updates_nodes(store):
+    summary = store.upsert(nodes([(10.0, 20.0), (10.1, 20.1)]))
+    assert summary == {"inserted": 2, "updated": 0, "removed": 0}
+
+    summary = store.upsert(nodes([(10.1, 20.1), (10.2, 20.2)], peak_demand=2.0))
+    assert summary == {"inserted": 1, "updated": 1, "removed": 0}
+
+    df = pd.read_csv(store.path_nodes)
+    assert list(df.columns) == COLUMNS
+    assert list(zip(df["latitude"], df["longitude"])) == [
+        (10.0, 20.0),
+        (10.1, 20.1),
+        (10.2, 20.2),
+    ]
+    # the existing row is overwritten by the new values
+    assert list(df["peak_demand"]) == [1.0, 2.0, 2.0]
+    assert_index_matches_file(store)
+
+
+def test_upsert_ignores_duplicates_among_new_nodes(store):
+    df = pd.concat([nodes([(10.0, 20.0)]), nodes([(10.0, 20.0)], peak_demand=3.0)])
+    summary = store.upsert(df)
+
+    assert summary["inserted"] == 1
+    assert list(pd.read_csv(store.path_nodes)["peak_demand"]) == [1.0]
+
+
+def test_unchanged_nodes_are_not_rewritten(store):
+    store.upsert(nodes([(10.0, 20.0)]))
+    version = store.version
+
+    summary = store.upsert(nodes([(10.0, 20.0)]))
+
+    assert summary == {"inserted": 0, "updated": 0, "removed": 0}
+    assert store.version == version
+
+
+def test_remove_node_and_its_links(store):
+    store.upsert(nodes([(10.0, 20.0), (10.1, 20.1), (10.2, 20.2)]))
+    links([((10.0, 20.0), (10.1, 20.1)), ((10.1, 20.1), (10.2, 20.2))]).to_csv(
+        store.path_links, index=False
+    )
+
+    assert store.remove(10.0, 20.0) == 1
+
+    df = pd.read_csv(store.path_nodes)
+    assert list(zip(df["latitude"], df["longitude"])) == [(10.1, 20.1), (10.2, 20.2)]
+    assert_index_matches_file(store)
+    assert pd.read_csv(store.path_links).shape[0] == 1
+
+
+def test_index_is_rebuilt_after_external_changes(store):
+    store.upsert(nodes([(10.0, 20.0)]))
+    nodes([(10.5, 20.5)]).to_csv(store.path_nodes, index=False)
+
+    assert store.find(10.5, 20.5) == 0
+    assert store.find(10.0, 20.0) is None
+    assert_index_matches_file(store)
+
+
+def test_added_consumer_only_invalidates_its_cluster(store):
+    store_design(store)
+
+    summary = store.upsert(nodes([(10.01, 20.0004)]))
+
+    assert summary == {"inserted": 1, "updated": 0, "removed": 1}
+    df = pd.read_csv(store.path_nodes)
+    grid_nodes = df[df["node_type"] != "consumer"]
+    assert list(zip(grid_nodes["latitude"], grid_nodes["longitude"])) == [
+        POLE_0,
+        POWER_HOUSE,
+    ]
+    # the links of the pole in the other cluster are kept
+    df_links = pd.read_csv(store.path_links)
+    assert df_links.shape[0] == 3
+    assert set(zip(df_links["lat_from"], df_links["lon_from"])) == {
+        POLE_0,
+        POWER_HOUSE,
+    }
+    assert_index_matches_file(store)
+
+
+def test_changed_and_removed_consumers_invalidate_their_clusters(store):
+    store_design(store)
+
+    store.upsert(nodes([CLUSTER_0[0]], peak_demand=5.0))
+    assert store.find(*POLE_0) is None
+    assert store.find(*POLE_1) is not None
+
+    store.remove(*CLUSTER_1[1])
+    df = pd.read_csv(store.path_nodes)
+    assert list(df["node_type"]) == ["consumer"] * 3 + ["power-house"]
+    assert pd.read_csv(store.path_links).shape[0] == 0
+    assert_index_matches_file(store)
+
+
+def test_consumers_invalidate_the_whole_design_if_clusters_are_unknown(store):
+    store_design(store)
+    store.clusters = None
+
+    store.upsert(nodes([(10.01, 20.0004)]))
+
+    df = pd.read_csv(store.path_nodes)
+    assert (df["node_type"] == "consumer").all()
+    assert pd.read_csv(store.path_links).shape[0] == 0
+    assert_index_matches_file(store)
+
+
+def test_new_design_replaces_the_grid_nodes(store):
+    store_design(store)
+
+    summary = store.upsert(nodes([(10.02, 20.0)], node_type="pole"))
+
+    assert summary == {"inserted": 1, "updated": 0, "removed": 3}
+    df = pd.read_csv(store.path_nodes)
+    assert list(df["node_type"]) == ["consumer"] * 4 + ["pole"]
+    assert pd.read_csv(store.path_links).shape[0] == 0
+
+
+def test_remove_node_within_tolerance(store):
+    store.upsert(nodes([(10.0, 20.0), (10.1, 20.1)]))
+
+    assert store.remove(10.000004, 19.999997) == 1
+
+    df = pd.read_csv(store.path_nodes)
+    assert list(zip(df["latitude"], df["longitude"])) == [(10.1, 20.1)]
+    assert_index_matches_file(store)
+    assert store.find(10.0, 20.0) is None
+
+
+def test_remove_node_not_found(store):
+    store.upsert(nodes([(10.0, 20.0)]))
+    links([((10.0, 20.0), (10.1, 20.1))]).to_csv(store.path_links, index=False)
+    version = store.version
+
+    assert store.remove(10.001, 20.0) == 0
+    assert store.remove(10.000004, 20.0, tolerance=1e-6) == 0
+
+    assert store.version == version
+    assert store.n_rows == 1
+    assert pd.read_csv(store.path_links).shape[0] == 1
+
+
+def test_remove_never_removes_grid_nodes(store):
+    pole = (10.000003, 20.0)
+    store.upsert(nodes([(10.0, 20.0), (10.1, 20.1)]))
+    store.append(nodes([pole], node_type="pole"))
+    # the pole is kept by the removal of a consumer of another cluster
+    store.set_clusters(
+        pd.concat(
+            [
+                nodes([(10.0, 20.0)]).assign(cluster_label=0),
+                nodes([(10.1, 20.1)]).assign(cluster_label=1),
+                nodes([pole], node_type="pole").assign(cluster_label=1),
+            ]
+        )
+    )
+
+    # the click is closer to the pole than to the consumer
+    assert store.remove(10.000003, 20.000001) == 1
+
+    df = pd.read_csv(store.path_nodes)
+    assert list(zip(df["latitude"], df["longitude"], df["node_type"])) == [
+        (10.1, 20.1, "consumer"),
+        (*pole, "pole"),
+    ]
+    assert_index_matches_file(store)
+
+
+def test_find_consumer_at_coordinates_of_pole(store):
+    store.upsert(nodes([(10.0, 20.0), (10.1, 20.1)]))
+    store.append(nodes([(10.0, 20.0)], node_type="pole"))
+
+    # the coordinates alone give the last node stored at them
+    assert store.find(10.0, 20.0) == 2
+    assert store.find(10.0, 20.0, node_types=CONSUMER_NODE_TYPES) == 0
+    assert store.find(10.000003, 20.0, node_types=CONSUMER_NODE_TYPES) == 0
+    assert store.find(10.0, 20.0, node_types=GRID_NODE_TYPES) == 2
+
+
+def test_remove_next_to_grid_node_only(store):
+    store.upsert(nodes([(10.1, 20.1)]))
+    store.append(nodes([(10.0, 20.0)], node_type="power-house"))
+
+    assert store.remove(10.0, 20.0) == 0
+    assert store.find(10.0, 20.0) == 1
+    assert store.n_rows == 2
+
+
+def test_remove_node_from_empty_store(store):
+    assert store.remove(10.0, 20.0) == 0
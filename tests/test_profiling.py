@@ -0,0 +1,156 @@
+"""
+Tests of the timings and memory of the stages (`fastapi_app.tools.profiling`),
+which are exported at `/metrics` and returned by `/optimize_grid/` with
+`?timings=true`.
+"""
+import re
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from fastapi_app.tools import profiling
+
+from villages import settlement
+
+# a sample of the Prometheus text format: name, optional labels and value
+LABEL = r'[a-zA-Z_]+="(?:[^"\\\n]|\\[\\"n])*"'
+SAMPLE = re.compile(
+    rf"^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)(\{{(?P<labels>{LABEL}(,{LABEL})*)\}})?"
+    r" (?P<value>[0-9.eE+-]+|NaN|[+-]Inf)$"
+)
+
+
+def parse_prometheus(text):
+    """
+    Parses metrics in the Prometheus text format and returns the type and
+    the samples of each metric.
+    """
+    assert text.endswith("\n")
+    metrics = {}
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            name = line.split(" ")[2]
+            metrics.setdefault(name, {"type": None, "samples": []})
+        elif line.startswith("# TYPE "):
+            _, _, name, metric_type = line.split(" ")
+            assert metric_type in ["counter", "gauge"]
+            metrics[name]["type"] = metric_type
+        else:
+            match = SAMPLE.match(line)
+            assert match, f"invalid sample: {line}"
+            # every sample belongs to a metric declared before
+            metrics[match["name"]]["samples"].append(
+                (match["labels"], float(match["value"]))
+            )
+    return metrics
+
+
+@pytest.fixture
+def statistics():
+    profiling.reset_statistics()
+    yield
+    profiling.reset_statistics()
+
+
+@pytest.fixture
+def traced():
+    tracemalloc.start()
+    yield
+    tracemalloc.stop()
+
+
+def add_consumers(main, n_consumers=40):
+    buildings = settlement(n_consumers, seed=4)
+    nodes = pd.DataFrame(
+        {
+            "latitude": buildings["latitude"],
+            "longitude": buildings["longitude"],
+            "node_type": "consumer",
+            "consumer_type": "household",
+            "consumer_detail": "default",
+            "surface_area": buildings["surface_area"],
+            "peak_demand": buildings["peak_demand"],
+            "average_consumption": buildings["average_consumption"],
+            "is_connected": True,
+            "how_added": "automatic",
+        }
+    )
+    main.database_add(add_nodes=True, add_links=False, inlet=nodes.to_dict())
+
+
+def test_span_measures_memory_allocated_inside(statistics, traced):
+    before = bytearray(8 * 10**6)
+    with profiling.span("outer"):
+        with profiling.span("inner"):
+            data = bytearray(4 * 10**6)
+            del data
+        data = bytearray(2 * 10**6)
+    del before
+
+    stages = profiling.stage_statistics()
+    # the memory allocated before the span is not counted
+    assert 4 * 10**6 <= stages["inner"]["peak_memory"] < 5 * 10**6
+    assert 4 * 10**6 <= stages["outer"]["peak_memory"] < 5 * 10**6
+    assert stages["outer"]["calls"] == 1
+
+
+def test_span_without_tracing_has_no_memory(statistics):
+    with profiling.span("stage"):
+        pass
+
+    assert profiling.stage_statistics()["stage"]["peak_memory"] is None
+
+
+def test_metrics_are_prometheus_text(main, client, statistics, traced):
+    with profiling.span("grid_optimizer.kmeans_clustering"):
+        pass
+    profiling.add_timings({'stage "quoted"': {"time": 0.5, "calls": 2}})
+
+    response = client("GET", "/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    metrics = parse_prometheus(response.text)
+    prefix = profiling.METRICS_PREFIX
+    assert metrics[f"{prefix}_stage_seconds_total"]["type"] == "counter"
+    calls = dict(metrics[f"{prefix}_stage_calls_total"]["samples"])
+    assert calls['stage="grid_optimizer.kmeans_clustering"'] == 1
+    assert calls['stage="stage \\"quoted\\""'] == 2
+    memory = dict(metrics[f"{prefix}_stage_peak_memory_bytes"]["samples"])
+    assert 'stage="grid_optimizer.kmeans_clustering"' in memory
+    assert metrics[f"{prefix}_process_max_rss_bytes"]["samples"][0][1] > 0
+
+
+def test_optimize_grid_returns_timings(main, client, statistics):
+    add_consumers(main)
+
+    response = client(
+        "POST",
+        "/optimize_grid/",
+        params={"incremental": "false", "assignment": "greedy", "timings": "true"},
+    )
+
+    assert response.status_code == 200
+    timings = response.json()["timings"]
+    for stage in [
+        "optimize_grid",
+        "database.read_nodes",
+        "grid_optimizer.kmeans_clustering",
+    ]:
+        assert timings[stage]["calls"] >= 1
+        assert timings[stage]["time"] >= 0
+    assert timings["optimize_grid"]["calls"] == 1
+    # the stages are part of the whole request
+    assert timings["grid_optimizer.kmeans_clustering"]["time"] <= (
+        timings["optimize_grid"]["time"]
+    )
+
+
+def test_optimize_grid_without_timings(main, client):
+    add_consumers(main)
+
+    response = client("POST", "/optimize_grid/", params={"assignment": "greedy"})
+
+    assert response.status_code == 200
+    assert "timings" not in response.json()
@@ -0,0 +1,85 @@
+"""
+Tests of the segmentation of large settlements, whose poles are designed
+segment by segment (`GridOptimizer.partition_consumers`).
+"""
+import numpy as np
+import pytest
+
+from villages import village
+
+from test_grid_update import optimizer
+from test_grids import empty_grid
+
+
+@pytest.mark.parametrize("layout", ["dispersed", "clustered"])
+@pytest.mark.parametrize("n_consumers, max_segment_size", [(1000, 300), (999, 10)])
+def test_partition_covers_consumers_once(layout, n_consumers, max_segment_size):
+    grid = village(n_consumers, pole_max_connection=0, layout=layout)
+    # consumers with a solar home system are not part of any segment
+    grid.nodes.loc[grid.nodes.index[:5], "is_connected"] = False
+    grid.nodes["segment"] = None
+
+    n_segments = optimizer().partition_consumers(grid, max_segment_size)
+
+    connected = grid.nodes[grid.nodes["is_connected"] == True]
+    assert connected["segment"].notna().all()
+    assert grid.nodes.loc[grid.nodes.index[:5], "segment"].isna().all()
+    sizes = connected["segment"].value_counts()
+    assert sorted(sizes.index, key=int) == [str(s) for s in range(n_segments)]
+    assert sizes.sum() == connected.shape[0]
+    assert sizes.max() <= max_segment_size
+    assert n_segments == int(np.ceil(connected.shape[0] / max_segment_size))
+
+
+def test_partition_into_one_segment():
+    grid = village(50, pole_max_connection=0)
+
+    assert optimizer().partition_consumers(grid, 50) == 1
+    assert (grid.nodes["segment"] == "0").all()
+
+
+class Designed(Exception):
+    pass
+
+
+@pytest.mark.parametrize(
+    "max_segment_size, design",
+    [(None, "design_poles"), (500, "design_segmented_grid")],
+)
+def test_segmentation_is_opt_in(monkeypatch, max_segment_size, design):
+    opt = optimizer()
+    if max_segment_size is not None:
+        opt.max_segment_size = max_segment_size
+    for name in ["design_poles", "design_segmented_grid"]:
+
+        def record(_name=name, **kwargs):
+            raise Designed(_name)
+
+        monkeypatch.setattr(opt, name, record)
+
+    with pytest.raises(Designed, match=design):
+        opt.design_grid(
+            grid=village(600, pole_max_connection=8),
+            connection_cable_max_length=60,
+            distribution_cable_max_length=40,
+        )
+
+
+def test_propagate_segment_to_neighbours():
+    grid = empty_grid()
+    for label, x in zip(["a", "b", "c", "d", "e"], range(5)):
+        grid.add_node(label=label, x=10 * x, y=0, node_type="pole", segment="0")
+    grid.add_links("a", "b")
+    grid.add_links("b", "c")
+    grid.add_links("d", "e")
+
+    optimizer().propagate_segment_to_neighbours(grid, "b", "1")
+
+    # only the nodes connected to the start node are changed
+    assert grid.nodes["segment"].to_dict() == {
+        "a": "1",
+        "b": "1",
+        "c": "1",
+        "d": "0",
+        "e": "0",
+    }
@@ -0,0 +1,106 @@
+"""
+Tests of the repair of voltage drop violations after the grid design
+(`GridOptimizer.repair_voltage_drop`) and of its summary in the response of
+`/optimize_grid/`.
+"""
+import copy
+import json
+
+import pandas as pd
+
+from fastapi_app.tools import workers
+
+from villages import settlement, village
+
+from test_grid_update import (
+    N_CONSUMERS,
+    POLE_MAX_CONNECTION,
+    cached_design,
+    optimizer,
+)
+
+DISTRIBUTION_CABLE_MAX_LENGTH = 40
+
+
+def test_repair_reduces_violations():
+    grid = copy.deepcopy(cached_design())
+    opt = optimizer()
+    n_violations = opt.repair_voltage_drop(
+        grid, DISTRIBUTION_CABLE_MAX_LENGTH, max_iterations=0
+    )["n_violations"]
+    assert n_violations > 0
+
+    summary = opt.repair_voltage_drop(grid, DISTRIBUTION_CABLE_MAX_LENGTH)
+
+    assert summary["n_violations"] < n_violations
+    assert summary["n_upgraded_cables"] + summary["n_feeders"] > 0
+    assert {type(value) for value in summary.values()} <= {int, float}
+    json.dumps(summary)
+
+
+def test_repair_runs_in_design_job():
+    grid = village(N_CONSUMERS, pole_max_connection=POLE_MAX_CONNECTION, seed=1)
+    grid.get_load_centroid()
+    grid.get_nodes_distances_from_load_centroid()
+
+    opt, grid, summary = workers.design_grid(
+        opt=optimizer(),
+        grid=grid,
+        connection_cable_max_length=60,
+        distribution_cable_max_length=DISTRIBUTION_CABLE_MAX_LENGTH,
+        voltage_drop_repair=True,
+    )
+
+    assert summary["n_iterations"] > 0
+    # the summary is taken from the returned grid
+    violations = opt.repair_voltage_drop(
+        grid, DISTRIBUTION_CABLE_MAX_LENGTH, max_iterations=0
+    )["n_violations"]
+    assert violations == summary["n_violations"]
+
+
+def test_optimize_grid_with_repair_is_serialized(main, client, monkeypatch):
+    # the repair is part of the design job, which is sent to the workers
+    design_grid = main.workers.design_grid
+    repairs = []
+
+    def job(**kwargs):
+        opt, grid, summary = design_grid(**kwargs)
+        repairs.append(summary)
+        return opt, grid, summary
+
+    monkeypatch.setattr(main.workers, "design_grid", job)
+
+    buildings = settlement(60, seed=2)
+    nodes = pd.DataFrame(
+        {
+            "latitude": buildings["latitude"],
+            "longitude": buildings["longitude"],
+            "node_type": "consumer",
+            "consumer_type": "household",
+            "consumer_detail": "default",
+            "surface_area": buildings["surface_area"],
+            "peak_demand": buildings["peak_demand"],
+            "average_consumption": buildings["average_consumption"],
+            "is_connected": True,
+            "how_added": "automatic",
+        }
+    )
+    main.database_add(add_nodes=True, add_links=False, inlet=nodes.to_dict())
+
+    response = client(
+        "POST",
+        "/optimize_grid/",
+        params={
+            "incremental": "false",
+            "assignment": "greedy",
+            "voltage_drop_repair": "true",
+        },
+    )
+
+    assert response.status_code == 200
+    repair = response.json()["voltage_drop"]["repair"]
+    assert repair["n_iterations"] > 0
+    assert repairs == [repair]
+    assert isinstance(repair["n_upgraded_cables"], int)
+    assert pd.read_csv(main.full_path_links).shape[0] > 0
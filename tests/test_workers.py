@@ -0,0 +1,155 @@
+"""
+Tests of the pool of worker processes running the optimizations
+(`fastapi_app.tools.workers`).
+"""
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from fastapi_app.tools import workers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def crash():
+    # the worker dies like after running out of memory
+    os._exit(1)
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+@pytest.fixture
+def pool(request):
+    pool = workers.WorkerPool(**request.param)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def wait_until_warmed_up(pool, timeout=120):
+    start = time.time()
+    while time.time() - start < timeout:
+        health = pool.health()
+        if health["status"] != "warming up":
+            return health
+        time.sleep(0.2)
+    raise TimeoutError("the workers did not warm up")
+
+
+@pytest.mark.parametrize("pool", [{"size": 2}], indirect=True)
+def test_start_does_not_wait_for_warm_up(pool):
+    assert pool.health()["status"] in ["warming up", "healthy"]
+
+    health = wait_until_warmed_up(pool)
+
+    assert health["status"] == "healthy"
+    # the workers are known from their answers, and both pings of the warm-up
+    # may be answered by the same worker
+    assert len(health["workers"]) in [1, 2]
+    assert all(worker["n_jobs"] == 0 for worker in health["workers"])
+    assert os.getpid() not in [worker["pid"] for worker in health["workers"]]
+
+
+@pytest.mark.parametrize(
+    "pool", [{"size": 2, "max_jobs_per_worker": 3}], indirect=True
+)
+def test_workers_are_replaced_after_their_jobs(pool):
+    wait_until_warmed_up(pool)
+
+    async def run_jobs():
+        pids = []
+        while pool.n_recycles == 0 and len(pids) < 6:
+            pids.append((await pool.run(workers.ping))["pid"])
+        return pids, await pool.run(workers.ping)
+
+    pids, answer = asyncio.run(run_jobs())
+
+    # the workers are replaced once one of them has done 3 jobs, which is
+    # before the pool has done 6 jobs unless both workers got 3 of them
+    assert pool.n_recycles == 1
+    assert pids.count(pids[-1]) == 3
+    assert max(pids.count(pid) for pid in pids) == 3
+    assert answer["pid"] not in pids
+    assert answer["n_jobs"] == 1
+
+
+@pytest.mark.parametrize("pool", [{"size": 1}], indirect=True)
+def test_busy_pool_is_healthy(pool):
+    wait_until_warmed_up(pool)
+
+    async def check_while_busy():
+        job = asyncio.ensure_future(pool.run(sleep, seconds=2))
+        await asyncio.sleep(0.5)
+        health = pool.health()
+        return health, await job
+
+    health, pid = asyncio.run(check_while_busy())
+
+    assert health["status"] == "healthy"
+    assert health["workers"][0]["pid"] == pid
+    assert pool.n_recycles == 0
+
+
+@pytest.mark.parametrize("pool", [{"size": 1}], indirect=True)
+def test_pool_recovers_from_dead_worker(pool):
+    wait_until_warmed_up(pool)
+    pid = pool.health()["workers"][0]["pid"]
+
+    with pytest.raises(BrokenProcessPool):
+        asyncio.run(pool.run(crash))
+
+    assert pool.n_recycles == 1
+    answer = asyncio.run(pool.run(workers.ping))
+    assert answer["pid"] != pid
+    assert answer["n_jobs"] == 1
+
+
+@pytest.mark.parametrize("pool", [{"size": 1}], indirect=True)
+def test_health_check_replaces_idle_dead_worker(pool):
+    pid = wait_until_warmed_up(pool)["workers"][0]["pid"]
+
+    os.kill(pid, signal.SIGKILL)
+    start = time.time()
+    while pool.n_recycles == 0 and time.time() - start < 30:
+        pool.health()
+        time.sleep(0.2)
+
+    assert pool.n_recycles == 1
+    health = wait_until_warmed_up(pool)
+    assert health["status"] == "healthy"
+    assert pid not in [worker["pid"] for worker in health["workers"]]
+    assert asyncio.run(pool.run(workers.ping))["pid"] != pid
+
+
+def test_no_workers_runs_jobs_in_process():
+    # the size of the pool is read when the module is imported
+    code = (
+        "import asyncio, os\n"
+        "from fastapi_app.tools import workers\n"
+        "pool = workers.WorkerPool()\n"
+        "pool.start()\n"
+        "answer = asyncio.run(pool.run(workers.ping))\n"
+        "print(pool.size, answer['pid'] == os.getpid(), pool.executor,"
+        " pool.health()['status'])\n"
+    )
+    env = dict(os.environ, OFFGRID_PLANNER_WORKERS="0")
+
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    assert output.split() == ["0", "True", "None", "in-process"]
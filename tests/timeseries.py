@@ -0,0 +1,47 @@
+"""
+Seeded synthetic demand and solar series for the tests and the benchmarks.
+
+The demand has a small base load, a morning and a large evening peak, and
+the solar generation follows the daylight hours with a random cloudiness
+on each day.
+"""
+import numpy as np
+import pandas as pd
+
+# hours of a year
+N_HOURS = 8760
+
+# peak demand of the settlement [kW]
+PEAK_DEMAND = 20
+
+
+def demand_and_solar(seed=0):
+    """
+    Creates hourly demand [kW] and solar generation [kW/kWp] for one year.
+
+    Parameters
+    ----------
+    seed (int):
+        seed of the random number generator.
+
+    Output
+    ------
+    (pandas.DataFrame): 'Demand' and 'SolarGen' columns, which are read by
+        `EnergySystemOptimizer.import_data`.
+    """
+    rng = np.random.default_rng(seed)
+    hour = np.arange(N_HOURS) % 24
+    day = np.arange(N_HOURS) // 24
+
+    daily_profile = (
+        0.2
+        + 0.3 * np.exp(-((hour - 7) ** 2) / 4)
+        + 0.8 * np.exp(-((hour - 20) ** 2) / 6)
+    )
+    demand = PEAK_DEMAND * daily_profile * rng.lognormal(0, 0.15, N_HOURS)
+
+    daylight = np.clip(np.sin(np.pi * (hour - 6) / 12), 0, None)
+    cloudiness = rng.uniform(0.3, 1, day[-1] + 1)[day]
+    solar = daylight * cloudiness * rng.uniform(0.9, 1, N_HOURS)
+
+    return pd.DataFrame({"Demand": demand, "SolarGen": solar})
@@ -0,0 +1,99 @@
+"""
+Seeded synthetic settlements for the tests and the benchmarks.
+
+Two layouts are available: `dispersed`, where the buildings are spread
+uniformly with an average spacing of about 40 m, and `clustered`, where
+they are grouped in hamlets of about 200 buildings around randomly placed
+centers. The surface areas of the buildings follow a log-normal
+distribution with a median of 60 m².
+"""
+import numpy as np
+import pandas as pd
+from pyproj import Proj
+
+from fastapi_app.tools.grids import Grid
+
+# average distance between two buildings in dispersed settlements [m]
+BUILDING_SPACING = 40
+
+# number of buildings of each hamlet in clustered settlements
+HAMLET_SIZE = 200
+
+# standard deviation of the distance of the buildings to the center of their
+# hamlet [m]
+HAMLET_RADIUS = 80
+
+# (x,y) coordinates of the center of the settlements in UTM zone 32 [m]
+CENTER = np.array([500000.0, 1160000.0])
+
+
+def settlement(n_buildings, layout="dispersed", seed=0):
+    """
+    Creates the buildings of a synthetic settlement.
+
+    Parameters
+    ----------
+    n_buildings (int):
+        number of buildings.
+    layout (str):
+        'dispersed' or 'clustered'.
+    seed (int):
+        seed of the random number generator.
+
+    Output
+    ------
+    (pandas.DataFrame): (x,y) and (longitude,latitude) coordinates, surface
+        area, peak demand and average consumption of each building.
+    """
+    rng = np.random.default_rng(seed)
+    size = np.sqrt(n_buildings) * BUILDING_SPACING
+
+    if layout == "dispersed":
+        xy = rng.random((n_buildings, 2)) * size
+    elif layout == "clustered":
+        n_hamlets = max(1, n_buildings // HAMLET_SIZE)
+        hamlets = rng.random((n_hamlets, 2)) * size
+        xy = hamlets[rng.integers(n_hamlets, size=n_buildings)] + rng.normal(
+            scale=HAMLET_RADIUS, size=(n_buildings, 2)
+        )
+    else:
+        raise ValueError(f"unknown layout '{layout}'")
+
+    xy += CENTER - size / 2
+    longitude, latitude = Proj(proj="utm", zone=32, ellps="WGS84")(
+        xy[:, 0], xy[:, 1], inverse=True
+    )
+    surface_area = np.clip(rng.lognormal(np.log(60), 0.6, n_buildings), 10, 1000)
+
+    return pd.DataFrame(
+        {
+            "x": xy[:, 0] - CENTER[0],
+            "y": xy[:, 1] - CENTER[1],
+            "longitude": longitude,
+            "latitude": latitude,
+            "surface_area": surface_area,
+            "peak_demand": surface_area * 0.004,
+            "average_consumption": surface_area * 0.04,
+        },
+        index=[str(label) for label in range(n_buildings)],
+    )
+
+
+def village(n_consumers, pole_max_connection, layout="dispersed", seed=0):
+    """
+    Creates a grid containing the buildings of a synthetic settlement as
+    connected consumers.
+    """
+    buildings = settlement(n_consumers, layout=layout, seed=seed)
+    nodes = Grid().nodes.iloc[0:0].reindex(buildings.index)
+    nodes[buildings.columns] = buildings
+    nodes["node_type"] = "consumer"
+    nodes["is_connected"] = True
+    nodes["type_fixed"] = False
+
+    return Grid(
+        nodes=nodes,
+        links=Grid().links.iloc[0:0].copy(),
+        ref_node=CENTER.copy(),
+        pole_max_connection=pole_max_connection,
+    )